@@ -0,0 +1,99 @@
+"""
+Compares tail latency of the channel selection strategies against a local server.
+
+Each connection on the server is given a small amount of concurrency and a
+fraction of requests are slow, so piling streams onto a busy connection
+shows up as queueing in the tail::
+
+    python -m benchmarks.channel_selection
+"""
+import asyncio
+import random
+import time
+
+from grpc_test_monkey_v1.monkey_grpc import ApeServiceBase, ApeServiceStub
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest, ApeResponse
+
+from insanic.conf import settings
+
+from interstellar.client.channels import ChannelPool, CHANNEL_SELECTION_STRATEGIES
+
+from benchmarks.utils import configure, get_loop, percentiles, print_table, start_server, stop_server
+
+CONNECTION_CONCURRENCY = 4
+FAST_SECONDS = 0.002
+SLOW_SECONDS = 0.040
+SLOW_RATIO = 0.05
+
+BURSTS = 40
+BURST_SIZE = 100
+BURST_INTERVAL = 0.05
+
+
+class QueueingApes(ApeServiceBase):
+    """
+    Emulates a backend that can only work on a few requests per connection at once.
+    """
+
+    def __init__(self):
+        self.semaphores = {}
+
+    async def GetChimpanzee(self, stream):
+        request = await stream.recv_message()
+
+        connection = id(stream._stream._connection)
+        if connection not in self.semaphores:
+            self.semaphores[connection] = asyncio.Semaphore(CONNECTION_CONCURRENCY)
+
+        async with self.semaphores[connection]:
+            await asyncio.sleep(SLOW_SECONDS if random.random() < SLOW_RATIO else FAST_SECONDS)
+
+        await stream.send_message(ApeResponse(id=int(request.id), extra="ok"))
+
+    async def GetGorilla(self, stream):
+        raise NotImplementedError
+
+
+async def timed_call(host, port, latencies):
+    channel = ChannelPool.get_channel("benchmark", host, port)
+    stub = ApeServiceStub(channel)
+
+    start = time.perf_counter()
+    await stub.GetChimpanzee(ApeRequest(id="1"))
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_strategy(strategy, host, port):
+    settings.INTERSTELLAR_CLIENT_CHANNEL_SELECTION = strategy
+    ChannelPool.reset()
+    random.seed(0)
+
+    latencies = []
+    tasks = []
+    for _ in range(BURSTS):
+        tasks.extend(asyncio.ensure_future(timed_call(host, port, latencies)) for _ in range(BURST_SIZE))
+        await asyncio.sleep(BURST_INTERVAL)
+    await asyncio.gather(*tasks)
+
+    ChannelPool.close()
+
+    return percentiles(latencies)
+
+
+async def main():
+    server, host, port = await start_server([QueueingApes()])
+
+    rows = []
+    try:
+        for strategy in CHANNEL_SELECTION_STRATEGIES:
+            rows.append((strategy, await run_strategy(strategy, host, port)))
+    finally:
+        await stop_server(server)
+
+    print_table(f"Channel selection latency (ms), {BURSTS} bursts of {BURST_SIZE} calls", rows)
+
+
+if __name__ == "__main__":
+    # keep the pool at a fixed size so only the selection strategy differs
+    configure(INTERSTELLAR_CLIENT_CHANNEL_COUNT=10, INTERSTELLAR_CLIENT_CHANNEL_MIN_COUNT=10)
+    get_loop().run_until_complete(main())
@@ -0,0 +1,51 @@
+"""
+Compares decoding a report with many rows to dicts with the columnar
+message mode, with NumPy and with :mod:`array`, including summing a column::
+
+    python -m benchmarks.columnar
+"""
+from interstellar.client import columnar
+from interstellar.client.columnar import message_to_columns
+from interstellar.client.converters import message_to_dict
+
+from benchmarks.messages import make_report
+from benchmarks.utils import print_table, timeit
+
+
+def sum_dict_rows(message):
+    return sum(row['ratio'] for row in message_to_dict(message)['rows'])
+
+
+def sum_columns(message):
+    return sum(message_to_columns(message)['rows']['ratio'])
+
+
+def sum_numpy_columns(message):
+    return message_to_columns(message)['rows']['ratio'].sum()
+
+
+def main():
+    numpy = columnar.get_numpy()
+    rows = []
+
+    for size, number in ((10, 2000), (1000, 50), (10000, 5)):
+        report = make_report(size)
+        timings = {"dict (us)": timeit(sum_dict_rows, report, number=number)}
+
+        if numpy is not None:
+            columnar.schemas.clear()
+            timings["numpy (us)"] = timeit(sum_numpy_columns, report, number=number)
+
+        columnar.numpy = None
+        columnar.schemas.clear()
+        timings["array (us)"] = timeit(sum_columns, report, number=number)
+        columnar.numpy = numpy
+        columnar.schemas.clear()
+
+        rows.append((f"{size} rows", timings))
+
+    print_table("Decode a report and sum a column, best time per message", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Compares the precompiled message converters with the previous
+``dir()`` based conversion on flat and deeply nested messages::
+
+    python -m benchmarks.message_conversion
+"""
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.message import Message
+
+from interstellar.client.converters import message_to_dict
+
+from benchmarks.messages import make_flat, make_nested
+from benchmarks.utils import print_table, timeit
+
+
+def legacy_message_to_dict(message):
+    """
+    The conversion ``convert_message_to_dict`` used to do for every message.
+    """
+    if not isinstance(message, Message):
+        return None
+
+    converted_data = {}
+    for item in dir(message):
+        field = getattr(type(message), item)
+        if hasattr(field, 'DESCRIPTOR') and isinstance(field.DESCRIPTOR, FieldDescriptor):
+            attribute = getattr(message, field.DESCRIPTOR.name)
+
+            if not isinstance(attribute, Message):
+                converted_data[item] = attribute
+            else:
+                converted_data[item] = legacy_message_to_dict(attribute)
+
+    return converted_data
+
+
+def main():
+    rows = []
+    for label, message, number in (("flat", make_flat(), 20000), ("nested", make_nested(), 2000)):
+        legacy = timeit(legacy_message_to_dict, message, number=number)
+        compiled = timeit(message_to_dict, message, number=number)
+        rows.append((label, {"legacy (us)": legacy, "compiled (us)": compiled, "speedup": legacy / compiled}))
+
+    print_table("Message to dict conversion, best time per message", rows)
+
+
+if __name__ == "__main__":
+    main()
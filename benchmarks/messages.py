@@ -0,0 +1,112 @@
+"""
+Message types used by the conversion benchmarks, built at runtime so no
+generated code is needed.
+"""
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+F = descriptor_pb2.FieldDescriptorProto
+
+DEPTH = 5
+
+
+def _field(name, number, type, label=F.LABEL_OPTIONAL, type_name=None):
+    field = F(name=name, number=number, type=type, label=label)
+    if type_name:
+        field.type_name = type_name
+    return field
+
+
+def _scalar_fields():
+    return [
+        _field("id", 1, F.TYPE_INT64),
+        _field("name", 2, F.TYPE_STRING),
+        _field("count", 3, F.TYPE_INT32),
+        _field("ratio", 4, F.TYPE_DOUBLE),
+        _field("score", 5, F.TYPE_FLOAT),
+        _field("active", 6, F.TYPE_BOOL),
+        _field("payload", 7, F.TYPE_BYTES),
+        _field("kind", 8, F.TYPE_ENUM, type_name=".benchmark.Kind"),
+    ]
+
+
+def _build_file():
+    file = descriptor_pb2.FileDescriptorProto(name="benchmark.proto", package="benchmark", syntax="proto3")
+
+    kind = file.enum_type.add(name="Kind")
+    kind.value.add(name="UNKNOWN", number=0)
+    kind.value.add(name="SMALL", number=1)
+    kind.value.add(name="LARGE", number=2)
+
+    flat = file.message_type.add(name="Flat")
+    flat.field.extend(_scalar_fields())
+
+    # Level0 -> Level1 -> ... -> Level{DEPTH - 1}, each holding scalars and a few leaves
+    for level in reversed(range(DEPTH)):
+        message = file.message_type.add(name=f"Level{level}")
+        message.field.extend(_scalar_fields())
+        message.field.add(name="leaves", number=9, type=F.TYPE_MESSAGE, label=F.LABEL_REPEATED,
+                          type_name=".benchmark.Flat")
+        message.field.add(name="tags", number=10, type=F.TYPE_INT32, label=F.LABEL_REPEATED)
+        if level < DEPTH - 1:
+            message.field.add(name="child", number=11, type=F.TYPE_MESSAGE, type_name=f".benchmark.Level{level + 1}")
+
+    # a report of many rows made of scalar fields
+    row = file.message_type.add(name="Row")
+    row.field.extend(_scalar_fields()[:6])
+    report = file.message_type.add(name="Report")
+    report.field.add(name="title", number=1, type=F.TYPE_STRING)
+    report.field.add(name="rows", number=2, type=F.TYPE_MESSAGE, label=F.LABEL_REPEATED, type_name=".benchmark.Row")
+    return file
+
+
+def _get_classes():
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(_build_file())
+
+    def message_class(name):
+        descriptor = pool.FindMessageTypeByName(f"benchmark.{name}")
+        try:
+            return message_factory.GetMessageClass(descriptor)
+        except AttributeError:
+            return message_factory.MessageFactory(pool).GetPrototype(descriptor)
+
+    return {name: message_class(name) for name in ["Flat", "Row", "Report"] + [f"Level{i}" for i in range(DEPTH)]}
+
+
+classes = _get_classes()
+
+
+def fill_scalars(message, i=1):
+    message.id = i
+    message.name = f"name-{i}"
+    message.count = i * 2
+    message.ratio = i / 3
+    message.score = i / 7
+    message.active = bool(i % 2)
+    if hasattr(message, "payload"):
+        message.payload = b"x" * 16
+        message.kind = 1 + i % 2
+    return message
+
+
+def make_flat():
+    return fill_scalars(classes["Flat"]())
+
+
+def make_nested(leaves=3):
+    root = message = classes["Level0"]()
+    for level in range(DEPTH):
+        fill_scalars(message, level)
+        message.tags.extend(range(10))
+        for i in range(leaves):
+            fill_scalars(message.leaves.add(), i)
+        if level < DEPTH - 1:
+            message = message.child
+    return root
+
+
+def make_report(rows=1000):
+    report = classes["Report"](title="report")
+    for i in range(rows):
+        fill_scalars(report.rows.add(), i)
+    return report
@@ -0,0 +1,113 @@
+"""
+Times the ``RecvRequest`` hook that authenticates every incoming request,
+parsing and validating the identity headers every time like it used to and
+with the identity cache. Both build a ``User`` and a ``RequestService`` for
+every request, the cache only saves parsing and validating the headers and
+costs more than it saves when most users miss it::
+
+    python -m benchmarks.server_events
+"""
+import time
+
+from functools import partial
+
+from grpclib.events import RecvRequest
+from grpclib.exceptions import GRPCError
+from multidict import MultiDict
+
+from insanic.conf import settings
+from insanic.models import User, RequestService
+
+from interstellar.server import InterstellarServer, authentication, config as server_config
+from interstellar.server.authentication import GRPCAuthentication
+from interstellar.server.events import interstellar_server_event_recv_request, raise_grpc_error
+
+from benchmarks.utils import configure, get_loop, print_table
+
+
+def legacy_authenticate(self):
+    """
+    What ``GRPCAuthentication.authenticate`` used to do for every request.
+    """
+    user_params = self.get_user()
+    if user_params is None:
+        self._raise("Request user not found in request.")
+
+    user = User(**user_params)
+
+    service_params = self.get_service()
+    if service_params is None:
+        self._raise("Request service not found in request.")
+
+    try:
+        service = RequestService(is_authenticated=True, **service_params)
+    except TypeError:
+        self._raise("Invalid service payload.")
+
+    if not service.is_valid:
+        self._raise(f"Invalid request to {settings.SERVICE_NAME}")
+
+    return user, service
+
+
+async def legacy_recv_request(event):
+    authentication = GRPCAuthentication(event.metadata)
+    try:
+        user, service = legacy_authenticate(authentication)
+    except GRPCError as e:
+        event.method_func = partial(raise_grpc_error, e=e)
+        event.interrupt()
+    else:
+        event.metadata.update({"request_user": user})
+        event.metadata.update({"request_service": service})
+
+
+def make_metadata(users):
+    """
+    metadata of requests from one service on behalf of ``users`` users
+    """
+    service = f"source=caller;aud={settings.SERVICE_NAME};source_ip=10.0.0.1;destination_version=0.0.1"
+    return [MultiDict({
+        settings.INTERNAL_REQUEST_USER_HEADER: f"id={i % users};level=1;is_authenticated=1",
+        settings.INTERNAL_REQUEST_SERVICE_HEADER: service,
+        settings.REQUEST_ID_HEADER_FIELD: "benchmark",
+    }) for i in range(users * 20)]
+
+
+async def time_hook(hook, metadata, repeat=5):
+    """
+    Best time per request in microseconds.
+    """
+    best = None
+
+    for _ in range(repeat):
+        authentication.reset()
+        events = [RecvRequest(metadata=m.copy(), method_name="/test.v1.ApeService/GetChimpanzee",
+                              method_func=None, deadline=None, content_type="application/grpc+proto")
+                  for m in metadata]
+        start = time.perf_counter()
+        for event in events:
+            await hook(event)
+        elapsed = (time.perf_counter() - start) / len(events) * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    configure()
+    InterstellarServer._load_config(settings, server_config)
+    loop = get_loop()
+
+    rows = []
+    for users in (1, 100, 5000):
+        metadata = make_metadata(users)
+        legacy = loop.run_until_complete(time_hook(legacy_recv_request, metadata))
+        cached = loop.run_until_complete(time_hook(interstellar_server_event_recv_request, metadata))
+        rows.append((f"{users} users", {"legacy (us)": legacy, "cached (us)": cached, "speedup": legacy / cached}))
+    loop.close()
+
+    print_table("RecvRequest authentication hook, best time per request", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measures package discovery the way a worker pays for it at start up,
+importing the discovery machinery and finding the packages of every
+``SERVICE_CONNECTIONS`` entry in a new interpreter. Compares the previous
+``pkg_resources`` scan per service with the single ``importlib.metadata``
+scan of :class:`StubRegistry`::
+
+    python -m benchmarks.startup
+"""
+import subprocess
+import sys
+
+from benchmarks.utils import print_table
+
+SERVICE_COUNTS = (1, 10, 30, 100)
+
+# imported before timing starts, both ways need them
+PRELUDE = "import time, grpclib.client, insanic.exceptions\n"
+
+LEGACY = """
+start = time.perf_counter()
+import pkg_resources
+for service_name in services:
+    all_grpc_client_packages = [p.key for p in pkg_resources.working_set if p.key.startswith('grpc-')]
+    search_for = "-".join(['grpc', service_name, ''])
+    [p for p in all_grpc_client_packages if p.startswith(search_for)]
+print(time.perf_counter() - start)
+"""
+
+INDEXED = """
+start = time.perf_counter()
+from interstellar.client.registry import StubRegistry
+registry = StubRegistry()
+for service_name in services:
+    registry.scan_grpc_packages(service_name)
+print(time.perf_counter() - start)
+"""
+
+
+def run(code, services, repeat=5):
+    """
+    Best time in milliseconds reported by a new interpreter running the code.
+    """
+    source = PRELUDE + f"services = {services!r}\n" + code
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", source], check=True, stdout=subprocess.PIPE)
+        elapsed = float(output.stdout) * 1e3
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    rows = []
+    for count in SERVICE_COUNTS:
+        services = ["test"] + [f"service{i}" for i in range(count - 1)]
+        legacy = run(LEGACY, services)
+        indexed = run(INDEXED, services)
+        rows.append((f"{count} services", {"pkg_resources (ms)": legacy, "indexed (ms)": indexed,
+                                           "speedup": legacy / indexed}))
+
+    print_table("Import and discover grpc packages in a new process, best of 5", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks need the test dependencies (``grpc-test-monkey-v1``) to be
+installed and are meant to be run from the repository root, for example::
+
+    python -m benchmarks.channel_selection
+"""
+import asyncio
+import statistics
+import time
+
+import aiotask_context
+
+from insanic.conf import settings
+
+from interstellar import config as interstellar_common_config
+from interstellar.client import InterstellarClient
+from interstellar.client import config as client_config
+from interstellar.server.server import GRPCServer
+
+
+def configure(**overrides):
+    """
+    Configures insanic settings the way ``InterstellarClient.init_app`` would,
+    without needing an application.
+    """
+    if not settings.configured:
+        settings.configure(MMT_ENV="test", SERVICE_NAME="benchmark")
+
+    InterstellarClient._load_config(settings, interstellar_common_config)
+    InterstellarClient._load_config(settings, client_config)
+
+    for k, v in overrides.items():
+        setattr(settings, k, v)
+
+
+def get_loop():
+    loop = asyncio.new_event_loop()
+    loop.set_task_factory(aiotask_context.chainmap_task_factory)
+    asyncio.set_event_loop(loop)
+    return loop
+
+
+async def start_server(servicers, host="127.0.0.1"):
+    server = GRPCServer(servicers)
+    await server.start(host=host, port=0)
+    port = server._server.sockets[0].getsockname()[1]
+    return server, host, port
+
+
+async def stop_server(server):
+    server.close()
+    await server.wait_closed()
+
+
+def timeit(func, *args, number=10000, repeat=5):
+    """
+    Returns the best time per call in microseconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        elapsed = (time.perf_counter() - start) / number * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    ordered = sorted(samples)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+    result['mean'] = statistics.mean(ordered)
+    result['max'] = ordered[-1]
+    return result
+
+
+def print_table(title, rows):
+    """
+    :param title: heading of the table
+    :param rows: list of (label, dict of column -> float) tuples
+    """
+    print(title)
+    print("=" * len(title))
+    columns = list(rows[0][1].keys())
+    widths = [max(12, len(c) + 2) for c in columns]
+    print(f"{'':<24}" + "".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for label, values in rows:
+        print(f"{label:<24}" + "".join(f"{values[c]:>{w}.3f}" for c, w in zip(columns, widths)))
+    print()
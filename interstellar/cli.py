@@ -4,11 +4,9 @@
 import sys
 import click
 import logging
-import pkg_resources
 
 from interstellar.client.registry import StubRegistry
-
-from grpclib.reflection.service import ServerReflection
+from interstellar.client.utils import import_string
 
 
 @click.group()
@@ -19,10 +17,14 @@ def cli():
 
 @cli.command()
 @click.argument('package_name', nargs=-1)
-def reflection(package_name=None):
+@click.option('--manifest', default=None, help="Stub registry manifest to read from and update.")
+def reflection(package_name=None, manifest=None):
     """This describes the services installed in the environment."""
 
     registry = StubRegistry()
+    if manifest:
+        registry.load_manifest(manifest)
+
     if package_name == ():
         click.echo("Installed Packages")
         click.echo("==================")
@@ -31,31 +33,21 @@ def reflection(package_name=None):
         packages = registry.scan_grpc_packages()
 
         for i, p in enumerate(sorted(packages)):
-            version = _get_package_version(p)
+            version = registry.packages[p]
             click.echo(f"{i + 1}. {p}=={version}")
     else:
         # get reflection on packages defined
         click.echo("Reflecting")
 
-        reflection = ServerReflection(_service_names=[])
         for p in package_name:
-            packs = registry._load_package(p)
-
-        for service_name, namespace_dict in registry.stubs.items():
-            for namespace, stub_dict in namespace_dict.items():
-                for stub_name, stub in stub_dict.items():
-                    init_stub = stub(None)
-
-                    for sm in registry.service_methods[(service_name, namespace, stub.__name__)]:
-                        service_method = getattr(init_stub, sm)
-                        click.echo(service_method.reply_type.DESCRIPTOR.file.serialized_pb)
-                        click.echo(service_method.request_type.DESCRIPTOR.file.serialized_pb)
+            registry._load_package(p)
 
-
-from grpclib.reflection.service import ServerReflection
-
-
-def _get_package_version(package_name):
-    for p in pkg_resources.working_set:
-        if p.key == package_name:
-            return p.version
+        for p in package_name:
+            for stub_name, methods in registry.manifest[p]["stubs"].items():
+                for sm in methods:
+                    method_info = registry.get_method_info(p, stub_name, sm)
+                    click.echo(import_string(method_info["reply_type"]).DESCRIPTOR.file.serialized_pb)
+                    click.echo(import_string(method_info["request_type"]).DESCRIPTOR.file.serialized_pb)
+
+        if manifest:
+            registry.save_manifest(manifest)
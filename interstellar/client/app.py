@@ -1,4 +1,4 @@
-from functools import partialmethod
+from grpclib.metadata import Deadline
 
 from insanic import Insanic
 from insanic.conf import settings
@@ -8,11 +8,19 @@ from interstellar import config as interstellar_common_config
 from interstellar.abstracts import AbstractPlugin
 from interstellar.client import config as client_config
 from interstellar.client.registry import StubRegistry
-from interstellar.client.services import grpc_interface
+from interstellar.client.services import GRPCInterface
+from interstellar.utils import set_context_deadline
 
 BIND_INTERFACE = "grpc"
 
 
+async def set_request_deadline(request):
+    """
+    Gives the http request a deadline, its grpc calls have to complete before it.
+    """
+    set_context_deadline(Deadline.from_timeout(settings.INTERSTELLAR_CLIENT_HTTP_DEADLINE))
+
+
 class InterstellarClient(AbstractPlugin):
     plugin_name = "INTERSTELLAR_CLIENT"
     app = None
@@ -34,19 +42,29 @@ class InterstellarClient(AbstractPlugin):
         cls.load_config(settings, client_config)
         cls.bind_grpc_interface()
         cls.client_registration()
+
+        if settings.INTERSTELLAR_CLIENT_HTTP_DEADLINE is not None:
+            app.middleware('request')(set_request_deadline)
         super().init_app(app)
 
     @classmethod
     def client_registration(cls):
+        manifest = settings.INTERSTELLAR_CLIENT_REGISTRY_MANIFEST
+
+        if manifest:
+            cls.registry.load_manifest(manifest)
+
         for service in settings.SERVICE_CONNECTIONS:
             packages = cls.registry.scan_grpc_packages(service)
             #     attach stubs to service object
-            cls.registry.register(packages)
+            cls.registry.register(packages, lazy=settings.INTERSTELLAR_CLIENT_LAZY_REGISTRATION)
+
+        if manifest:
+            cls.registry.save_manifest(manifest)
 
     @classmethod
     def bind_grpc_interface(cls):
-        # setattr(Service, BIND_INTERFACE, partial(grpc_interface, registry=cls.registry))
-        Service.grpc = partialmethod(grpc_interface, registry=cls.registry)
+        setattr(Service, BIND_INTERFACE, GRPCInterface(cls.registry))
 
     @classmethod
     def unbind_grpc_interface(cls):
@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+from collections import deque
+
+from grpclib.const import Status
+from grpclib.exceptions import GRPCError, ProtocolError, StreamTerminatedError
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.exceptions import UnavailableError
+
+# service_name -> CircuitBreaker of the service, None when it is disabled for the service
+breakers = {}
+
+# statuses that mean the service is struggling, other statuses are answers
+FAILURE_STATUSES = frozenset((
+    Status.UNAVAILABLE,
+    Status.DEADLINE_EXCEEDED,
+    Status.RESOURCE_EXHAUSTED,
+    Status.INTERNAL,
+))
+
+
+def is_failure(error) -> bool:
+    if error is None:
+        return False
+    if isinstance(error, GRPCError):
+        return error.status in FAILURE_STATUSES
+    return isinstance(error, (asyncio.TimeoutError, OSError, StreamTerminatedError, ProtocolError))
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service while too many of its calls fail.
+
+    Opens when at least ``failure_rate`` of the calls of the last ``window``
+    seconds failed, once there were ``min_calls`` of them. Calls fail with
+    :class:`UnavailableError` while open. After ``reset_timeout`` seconds it
+    lets ``half_open_calls`` calls through and closes if they all succeed,
+    opening again as soon as one of them fails.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    __slots__ = ('service_name', 'failure_rate', 'min_calls', 'window', 'reset_timeout', 'half_open_calls',
+                 'state', 'calls', 'failures', 'opened_at', 'probes', 'probe_successes', 'rejected')
+
+    def __init__(self, service_name: str, failure_rate: float = 0.5, min_calls: int = 20, window: float = 10,
+                 reset_timeout: float = 30, half_open_calls: int = 3):
+        self.service_name = service_name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self.state = self.CLOSED
+        # (completed at, failed) of the calls in the window
+        self.calls = deque()
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.probe_successes = 0
+        # calls failed without being sent
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """
+        :raises UnavailableError: if the call should not be made
+        """
+        if self.state == self.CLOSED:
+            return
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.reject()
+            self.state = self.HALF_OPEN
+            self.probes = 0
+            self.probe_successes = 0
+
+        if self.probes >= self.half_open_calls:
+            self.reject()
+        self.probes += 1
+
+    def reject(self):
+        self.rejected += 1
+        raise UnavailableError(message=f"Calls to {self.service_name} are failing. Not calling it for now.")
+
+    def record(self, error) -> None:
+        """
+        :param error: what the call raised, None if it succeeded
+        """
+        if isinstance(error, asyncio.CancelledError):
+            self.cancel()
+            return
+
+        failed = is_failure(error)
+        now = time.monotonic()
+
+        if self.state == self.HALF_OPEN:
+            if failed:
+                self.open(now)
+            else:
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_calls:
+                    self.close()
+            return
+        elif self.state == self.OPEN:
+            # started before the breaker opened
+            return
+
+        calls = self.calls
+        calls.append((now, failed))
+        self.failures += failed
+
+        while calls[0][0] <= now - self.window:
+            _, expired_failure = calls.popleft()
+            self.failures -= expired_failure
+
+        if len(calls) >= self.min_calls and self.failures >= self.failure_rate * len(calls):
+            self.open(now)
+
+    def cancel(self) -> None:
+        """
+        A call that was let through was not made.
+        """
+        if self.state == self.HALF_OPEN:
+            self.probes -= 1
+
+    def open(self, now: float) -> None:
+        self.state = self.OPEN
+        self.opened_at = now
+        self.calls.clear()
+        self.failures = 0
+
+    def close(self) -> None:
+        self.state = self.CLOSED
+        self.opened_at = None
+
+
+def get_breaker(service_name: str):
+    """
+    Circuit breaker options are ``INTERSTELLAR_CLIENT_CIRCUIT_BREAKER`` updated with
+    the ones of the service in ``INTERSTELLAR_CLIENT_CIRCUIT_BREAKER_OPTIONS``.
+
+    :return: the CircuitBreaker of the service, None if it is not enabled for the service
+    """
+    try:
+        return breakers[service_name]
+    except KeyError:
+        options = dict(settings.INTERSTELLAR_CLIENT_CIRCUIT_BREAKER)
+        options.update(settings.INTERSTELLAR_CLIENT_CIRCUIT_BREAKER_OPTIONS.get(service_name, {}))
+
+        if options.pop('enabled', False):
+            try:
+                breaker = CircuitBreaker(service_name, **options)
+            except TypeError:
+                raise ImproperlyConfigured(f"Unknown circuit breaker options for {service_name}: "
+                                           f"{', '.join(options.keys())}.")
+        else:
+            breaker = None
+
+        breakers[service_name] = breaker
+        return breaker
+
+
+def breaker_stats():
+    """
+    :return: dict of service_name -> dict with the state, calls and failures in the window and rejected calls
+    """
+    return {
+        service_name: {
+            "state": breaker.state,
+            "calls": len(breaker.calls),
+            "failures": breaker.failures,
+            "rejected": breaker.rejected,
+        }
+        for service_name, breaker in breakers.items() if breaker is not None
+    }
+
+
+def reset():
+    breakers.clear()
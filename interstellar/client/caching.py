@@ -0,0 +1,134 @@
+import time
+
+from collections import OrderedDict
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.client.utils import format_method_key, parse_method_key
+
+# method key -> ResponseCache of the method, None when the method is not cached
+caches = {}
+
+
+class ResponseCache:
+    """
+    Replies of a method by request, kept for ``ttl`` seconds. Replies are
+    stored serialized so every hit gets its own message, and the least
+    recently used ones are evicted past ``max_entries`` or ``max_bytes``.
+    """
+    __slots__ = ('ttl', 'max_entries', 'max_bytes', 'entries', 'size',
+                 'hits', 'misses', 'evictions', 'expirations')
+
+    def __init__(self, ttl: float, max_entries: int = 1024, max_bytes: int = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires at, reply type, serialized reply)
+        self.entries = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        :return: the cached reply or None
+        """
+        try:
+            expires_at, reply_type, data = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            self.expirations += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return reply_type.FromString(data)
+
+    def set(self, key, reply) -> None:
+        now = time.monotonic()
+
+        try:
+            expires_at, _, _ = self.entries[key]
+        except KeyError:
+            pass
+        else:
+            if expires_at > now:
+                # already cached by a call that completed first
+                return
+            self._remove(key)
+
+        data = reply.SerializeToString()
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            return
+
+        self.entries[key] = (now + self.ttl, type(reply), data)
+        self.size += len(data)
+
+        while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.size > self.max_bytes):
+            _, (_, _, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, data = self.entries.pop(key)
+        self.size -= len(data)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+def get_cache(method_key):
+    """
+    :param method_key: (service_name, namespace, version, stub_name, service_method_name)
+    :return: the ResponseCache of the method if it is in ``INTERSTELLAR_CLIENT_CACHED_METHODS``
+    """
+    try:
+        return caches[method_key]
+    except KeyError:
+        cache = None
+
+        for method, options in settings.INTERSTELLAR_CLIENT_CACHED_METHODS.items():
+            if parse_method_key(method) == method_key:
+                try:
+                    cache = ResponseCache(**options)
+                except TypeError:
+                    raise ImproperlyConfigured(f"Cache options for {method} must be ttl and optionally "
+                                               f"max_entries and max_bytes.")
+                break
+
+        caches[method_key] = cache
+        return cache
+
+
+def cache_stats():
+    """
+    :return: dict of method -> dict with hits, misses, evictions, expirations, entries and bytes
+    """
+    return {
+        format_method_key(method_key): {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "evictions": cache.evictions,
+            "expirations": cache.expirations,
+            "entries": len(cache),
+            "bytes": cache.size,
+        }
+        for method_key, cache in caches.items() if cache is not None
+    }
+
+
+def reset():
+    caches.clear()
@@ -1,79 +1,362 @@
 import random
-from functools import wraps
+import time
+from operator import attrgetter
 
 from typing import Optional, Type, Dict
 
-from grpclib.client import Channel, Stream, MultiDict, cast
+import grpclib
+
+from grpclib.client import Channel, Stream, MultiDict, USER_AGENT, cast
 from grpclib.const import Cardinality
-from grpclib.exceptions import GRPCError
+from grpclib.encoding.base import GRPC_CONTENT_TYPE
+from grpclib.exceptions import GRPCError, ProtocolError
 from grpclib.stream import _RecvType, _SendType
-from grpclib.metadata import Deadline, _MetadataLike, _Metadata
+from grpclib.metadata import Deadline, _MetadataLike, _Metadata, encode_metadata, encode_timeout
 
 from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.client.breakers import CircuitBreaker, get_breaker
+from interstellar.client.columnar import message_to_columns
+from interstellar.client.converters import message_to_dict, message_to_mapping
 from interstellar.client.events import attach_events
-from interstellar.exceptions import InterstellarError
+from interstellar.client.limiting import AdaptiveLimiter, get_limiter
+from interstellar.client.resolver import Resolver
+from interstellar.compression import ACCEPT_ENCODING, GZIP, get_threshold, recv_message, send_message
+from interstellar.exceptions import DeadlineExceededError, InterstellarError
+from interstellar.utils import get_context_deadline
 
-from google.protobuf.descriptor import FieldDescriptor
-from google.protobuf.message import Message
-import time
+
+# the grpclib version InterstellarStream.send_request was copied from
+GRPCLIB_VERSION = "0.3.0"
+if grpclib.__version__ != GRPCLIB_VERSION:
+    raise ImportError(f"InterstellarStream.send_request is a copy of grpclib {GRPCLIB_VERSION}, "
+                      f"not {grpclib.__version__}.")
+
+
+def select_random(channels):
+    """
+    Picks any channel regardless of how busy it is.
+    """
+    return random.choice(channels)
+
+
+def select_least_in_flight(channels):
+    """
+    Picks the channel with the fewest open streams.
+    """
+    return min(channels, key=attrgetter('in_flight'))
+
+
+def select_power_of_two(channels):
+    """
+    Samples two channels and picks the one with fewer open streams.
+    Nearly as good as least in flight without scanning every channel and
+    without herding every caller onto the same idle channel.
+    """
+    if len(channels) < 2:
+        return channels[0]
+
+    first, second = random.sample(channels, 2)
+    return first if first.in_flight <= second.in_flight else second
+
+
+CHANNEL_SELECTION_STRATEGIES = {
+    "random": select_random,
+    "least_in_flight": select_least_in_flight,
+    "power_of_two": select_power_of_two,
+}
+
+
+def get_pool_options(service_name):
+    """
+    Options for the channels of a service. Defaults can be
+    overridden per service with ``INTERSTELLAR_CLIENT_CHANNEL_POOL_OPTIONS``.
+
+    :param service_name:
+    :return: dict with min_count, max_count, stream_threshold, idle_timeout and message_mode
+    """
+    options = {
+        "min_count": settings.INTERSTELLAR_CLIENT_CHANNEL_MIN_COUNT,
+        "max_count": settings.INTERSTELLAR_CLIENT_CHANNEL_COUNT,
+        "stream_threshold": settings.INTERSTELLAR_CLIENT_CHANNEL_STREAM_THRESHOLD,
+        "idle_timeout": settings.INTERSTELLAR_CLIENT_CHANNEL_IDLE_TIMEOUT,
+        "message_mode": settings.INTERSTELLAR_CLIENT_MESSAGE_MODE,
+    }
+    options.update(settings.INTERSTELLAR_CLIENT_CHANNEL_POOL_OPTIONS.get(service_name, {}))
+
+    if options['min_count'] < 1 or options['min_count'] > options['max_count']:
+        raise ImproperlyConfigured(f"Channel pool for {service_name} must have "
+                                   f"1 <= min_count <= max_count.")
+    return options
+
+
+class ChannelGroup:
+    """
+    The channels opened to one endpoint of a service. Grows while every channel it picks is
+    near its stream limit and shrinks back by closing channels that have been
+    idle for longer than ``idle_timeout``.
+    """
+    __slots__ = ('service_name', 'host', 'port', 'channels', 'min_count', 'max_count',
+                 'stream_threshold', 'idle_timeout', 'message_mode', 'last_sweep')
+
+    # how often, in seconds, idle channels are looked for
+    sweep_interval = 1.0
+
+    def __init__(self, service_name, host, port):
+        self.service_name = service_name
+        self.host = host
+        self.port = port
+        self.channels = []
+        self.last_sweep = time.monotonic()
+
+        options = get_pool_options(service_name)
+        self.min_count = options['min_count']
+        self.max_count = options['max_count']
+        self.stream_threshold = options['stream_threshold']
+        self.idle_timeout = options['idle_timeout']
+        self.message_mode = options['message_mode']
+
+    def __len__(self):
+        return len(self.channels)
+
+    @property
+    def in_flight(self):
+        return sum(channel.in_flight for channel in self.channels)
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def open_channel(self):
+        channel = InterstellarChannel(host=self.host, port=self.port, message_mode=self.message_mode,
+                                      service_name=self.service_name)
+        attach_events(channel, self.service_name)
+        self.channels.append(channel)
+        return channel
+
+    def is_saturated(self, channel):
+        threshold = self.stream_threshold
+        max_concurrent_streams = channel.max_concurrent_streams
+
+        if max_concurrent_streams is not None and max_concurrent_streams < threshold:
+            threshold = max_concurrent_streams
+        return channel.in_flight >= threshold
+
+    def get_channel(self, select, exclude=None):
+        """
+        :param exclude: channel not to pick unless it is the only one the group can have
+        """
+        now = time.monotonic()
+        if now - self.last_sweep >= self.sweep_interval:
+            self.sweep(now)
+
+        if len(self.channels) < self.min_count:
+            return self.open_channel()
+
+        channels = self.channels
+        if exclude is not None and exclude in channels:
+            channels = [channel for channel in channels if channel is not exclude]
+
+            if not channels:
+                return self.open_channel() if len(self.channels) < self.max_count else exclude
+
+        channel = select(channels)
+
+        if len(self.channels) < self.max_count and self.is_saturated(channel):
+            return self.open_channel()
+        return channel
+
+    def sweep(self, now):
+        """
+        Closes channels that have not been used for ``idle_timeout`` seconds,
+        keeping at least ``min_count`` channels open.
+        """
+        self.last_sweep = now
+
+        for channel in list(self.channels):
+            if len(self.channels) <= self.min_count:
+                break
+
+            if channel.in_flight == 0 and now - channel.last_used >= self.idle_timeout:
+                self.channels.remove(channel)
+                channel.close()
+
+    def drain(self):
+        """
+        Closes every channel without open streams.
+
+        :return: True if all channels have been closed
+        """
+        for channel in list(self.channels):
+            if channel.in_flight == 0:
+                self.channels.remove(channel)
+                channel.close()
+        return not self.channels
+
+    def close(self):
+        for channel in self.channels:
+            channel.close()
+        self.channels = []
 
 
 class ChannelPool:
+    """
+    Channels keyed by resolved endpoint, ``(service_name, address, port)``.
+
+    The host of a service is resolved to all of its addresses and calls are
+    spread across a :class:`ChannelGroup` per address. When the addresses
+    (or the host and port) of a service change, groups for endpoints that
+    went away are retired and closed as soon as they have no open streams.
+    """
     channels = {}
+    # service_name -> (host, port, addresses, groups)
+    services = {}
+    retired = []
+    resolver = None
 
     @classmethod
-    def get_channel(cls, service_name, host, port):
-        if len(cls.channels.get(service_name, [])) < settings.INTERSTELLAR_CLIENT_CHANNEL_COUNT:
-            if service_name not in cls.channels:
-                cls.channels[service_name] = []
-            channel = InterstellarChannel(host=host, port=port)
-            attach_events(channel, service_name)
-            cls.channels[service_name].append(channel)
-            return channel
-        return random.choice(cls.channels[service_name])
+    def get_channel(cls, service_name, host, port, exclude=None):
+        """
+        :param exclude: channel to avoid, another endpoint is preferred over
+            another channel to the same endpoint
+        """
+        select = cls.get_strategy()
+
+        if cls.retired:
+            cls.drain_retired()
+
+        groups = cls.get_groups(service_name, host, port)
+
+        if exclude is not None and len(groups) > 1:
+            groups = [group for group in groups if exclude not in group.channels] or groups
+
+        if len(groups) == 1:
+            group = groups[0]
+        else:
+            group = select(groups)
+
+        return group.get_channel(select, exclude)
+
+    @classmethod
+    def get_groups(cls, service_name, host, port):
+        if cls.resolver is None:
+            cls.resolver = Resolver(settings.INTERSTELLAR_CLIENT_DNS_TTL)
+
+        addresses = cls.resolver.resolve(host, port)
+
+        try:
+            current_host, current_port, current_addresses, groups = cls.services[service_name]
+        except KeyError:
+            pass
+        else:
+            if current_addresses is addresses and current_host == host and current_port == port:
+                return groups
+
+        groups = []
+        for address in addresses:
+            key = (service_name, address, port)
+            try:
+                group = cls.channels[key]
+            except KeyError:
+                group = cls.channels[key] = ChannelGroup(service_name, address, port)
+            groups.append(group)
+
+        for key, group in list(cls.channels.items()):
+            if key[0] == service_name and group not in groups:
+                del cls.channels[key]
+                cls.retired.append(group)
+
+        cls.services[service_name] = (host, port, addresses, groups)
+        return groups
+
+    @classmethod
+    def drain_retired(cls):
+        cls.retired = [group for group in cls.retired if not group.drain()]
+
+    @classmethod
+    def get_strategy(cls):
+        try:
+            return CHANNEL_SELECTION_STRATEGIES[settings.INTERSTELLAR_CLIENT_CHANNEL_SELECTION]
+        except KeyError:
+            raise ImproperlyConfigured(f"Unknown channel selection strategy: "
+                                       f"{settings.INTERSTELLAR_CLIENT_CHANNEL_SELECTION}. "
+                                       f"Must be one of {', '.join(CHANNEL_SELECTION_STRATEGIES.keys())}.")
+
+    @classmethod
+    def close(cls):
+        for group in list(cls.channels.values()) + cls.retired:
+            group.close()
 
     @classmethod
     def reset(cls):
         cls.channels = {}
+        cls.services = {}
+        cls.retired = []
+        cls.resolver = None
 
 
-def convert_message_to_dict(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        def get_json_response_from_protobuf_message(message):
-            """
+MESSAGE_DECODERS = {
+    # dict of the whole message
+    "dict": message_to_dict,
+    # the protobuf message as received
+    "raw": lambda message: message,
+    # read only mapping that converts fields when they are accessed
+    "lazy": message_to_mapping,
+    # dict where repeated fields are column arrays
+    "columnar": message_to_columns,
+}
 
-            :param message: protobuf message object
-            :type message: Message
-            :return: dict
-            """
 
-            if not isinstance(message, Message):
-                # TODO: discuss which one is better between None and empty dict. or raise error?
-                return None
+def get_message_decoder(message_mode):
+    try:
+        return MESSAGE_DECODERS[message_mode]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown message mode: {message_mode}. "
+                                   f"Must be one of {', '.join(MESSAGE_DECODERS.keys())}.")
 
-            converted_data = {}
-            for item in dir(message):
-                field = getattr(type(message), item)
-                if hasattr(field, 'DESCRIPTOR') and isinstance(field.DESCRIPTOR, FieldDescriptor):
-                    attribute = getattr(message, field.DESCRIPTOR.name)
 
-                    if not isinstance(attribute, Message):
-                        converted_data[item] = attribute
-                    else:
-                        converted_data[item] = get_json_response_from_protobuf_message(attribute)
+class InterstellarStream(Stream):
+
+    def __init__(self, *args, decode=message_to_dict, breaker: CircuitBreaker = None,
+                 limiter: AdaptiveLimiter = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._decode = decode
+        self._breaker = breaker
+        self._limiter = limiter
+        self._started_at = None
+        # requests at least this many bytes long are gzip compressed
+        self._compress_threshold = get_threshold(self._method_name)
 
-            return converted_data
+    async def __aenter__(self):
+        if self._limiter is not None:
+            try:
+                await self._limiter.acquire(self._deadline.time_remaining() if self._deadline is not None else None)
+            except BaseException:
+                if self._breaker is not None:
+                    self._breaker.cancel()
+                raise
+            self._started_at = time.monotonic()
 
-        reslut = await func(*args, **kwargs)
-        start = time.time()
-        result = get_json_response_from_protobuf_message(reslut)
-        print(time.time() - start)
+        result = await super().__aenter__()
+        self._channel.in_flight += 1
+        self._channel.last_used = time.monotonic()
         return result
-    return wrapper
 
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        error = exc_val
+        try:
+            return await super().__aexit__(exc_type, exc_val, exc_tb)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._channel.in_flight -= 1
+            self._channel.last_used = time.monotonic()
 
-class InterstellarStream(Stream):
+            if self._breaker is not None:
+                self._breaker.record(error)
+            if self._limiter is not None:
+                self._limiter.release(time.monotonic() - self._started_at, error)
 
     async def recv_initial_metadata(self) -> None:
 
@@ -91,12 +374,143 @@ class InterstellarStream(Stream):
         except GRPCError as e:
             raise InterstellarError(status=e.status, message=e.message)
 
-    @convert_message_to_dict
+    async def send_request(self, *, end: bool = False) -> None:
+        """
+        :meth:`grpclib.client.Stream.send_request` with the grpc-encoding
+        and grpc-accept-encoding headers.
+
+        A copy of the grpclib method, the headers can not be added by the
+        send_request event since metadata starting with ``grpc-`` is rejected.
+        It has to be compared with grpclib again when upgrading, see ``GRPCLIB_VERSION``.
+        """
+        if self._send_request_done:
+            raise ProtocolError('Request is already sent')
+
+        if end and not self._cardinality.client_streaming:
+            raise ProtocolError('Unary request requires a message to be sent '
+                                'before ending outgoing stream')
+
+        with self._wrapper:
+            protocol = await self._channel.__connect__()
+            stream = protocol.processor.connection.create_stream(wrapper=self._wrapper)
+
+            headers = [
+                (':method', 'POST'),
+                (':scheme', self._channel._scheme),
+                (':path', self._method_name),
+                (':authority', self._channel._authority),
+            ]
+            if self._deadline is not None:
+                timeout = self._deadline.time_remaining()
+                headers.append(('grpc-timeout', encode_timeout(timeout)))
+            content_type = GRPC_CONTENT_TYPE + '+' + self._codec.__content_subtype__
+            headers.extend((
+                ('te', 'trailers'),
+                ('content-type', content_type),
+                ('user-agent', USER_AGENT),
+                ('grpc-accept-encoding', ACCEPT_ENCODING),
+            ))
+            if self._compress_threshold is not None:
+                headers.append(('grpc-encoding', GZIP))
+
+            metadata, = await self._dispatch.send_request(
+                self._metadata,
+                method_name=self._method_name,
+                deadline=self._deadline,
+                content_type=content_type,
+            )
+            headers.extend(encode_metadata(metadata))
+            release_stream = await stream.send_request(
+                headers, end_stream=end, _processor=protocol.processor,
+            )
+            self._stream = stream
+            self._release_stream = release_stream
+            self._send_request_done = True
+            if end:
+                self._end_done = True
+
+    async def send_message(self, message: _SendType, *, end: bool = False) -> None:
+        """
+        :meth:`grpclib.client.Stream.send_message` that compresses large requests
+        of methods in ``INTERSTELLAR_COMPRESSED_METHODS``.
+        """
+        if not self._send_request_done:
+            await self.send_request()
+
+        end_stream = end
+        if not self._cardinality.client_streaming:
+            if self._send_message_done:
+                raise ProtocolError('Message was already sent')
+            else:
+                end_stream = True
+
+        if self._end_done:
+            raise ProtocolError('Stream is ended')
+
+        with self._wrapper:
+            message, = await self._dispatch.send_message(message)
+            await send_message(self._stream, self._codec, message, self._send_type, end=end_stream,
+                               threshold=self._compress_threshold)
+            self._send_message_done = True
+            if end:
+                self._end_done = True
+
     async def recv_message(self):
-        return await super().recv_message()
+        """
+        :meth:`grpclib.client.Stream.recv_message` that decompresses replies
+        and returns them in the message mode of the stream.
+        """
+        if not self._recv_initial_metadata_done:
+            await self.recv_initial_metadata()
+
+        with self._wrapper:
+            message = await recv_message(self._stream, self._codec, self._recv_type,
+                                         dict(self._stream.headers).get('grpc-encoding'))
+
+            if message is not None:
+                message, = await self._dispatch.recv_message(message)
+        return self._decode(message)
 
 
 class InterstellarChannel(Channel):
+    # number of streams currently open on this channel
+    in_flight = 0
+
+    def __init__(self, *args, message_mode: Optional[str] = None, service_name: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+        self.message_mode = message_mode
+        self.service_name = service_name
+        self.breaker = get_breaker(service_name) if service_name is not None else None
+        self.limiter = get_limiter(service_name) if service_name is not None else None
+        # (stub class, message_mode) -> stub bound to this channel
+        self.stubs = {}
+
+    def get_stub(self, stub_class, message_mode: Optional[str] = None):
+        """
+        Returns an instance of the stub bound to this channel, created on first use.
+        Instances go away with the channel when it is closed.
+        """
+        try:
+            return self.stubs[(stub_class, message_mode)]
+        except KeyError:
+            channel = self if message_mode is None else ChannelView(self, message_mode=message_mode)
+            stub = self.stubs[(stub_class, message_mode)] = stub_class(channel)
+            return stub
+
+    def close(self) -> None:
+        self.stubs = {}
+        super().close()
+
+    @property
+    def max_concurrent_streams(self) -> Optional[int]:
+        """
+        SETTINGS_MAX_CONCURRENT_STREAMS advertised by the server,
+        None if not connected yet.
+        """
+        if self._protocol is None:
+            return None
+        return self._protocol.processor.connection._connection.remote_settings.max_concurrent_streams
 
     def request(
             self,
@@ -108,14 +522,55 @@ class InterstellarChannel(Channel):
             timeout: Optional[float] = None,
             deadline: Optional[Deadline] = None,
             metadata: Optional[_MetadataLike] = None,
+            message_mode: Optional[str] = None,
     ) -> Stream[_SendType, _RecvType]:
+        """
+        :param message_mode: how received messages are returned, see ``MESSAGE_DECODERS``.
+            Falls back to the mode of the channel and then ``INTERSTELLAR_CLIENT_MESSAGE_MODE``.
+        """
+        decode = get_message_decoder(message_mode or self.message_mode or settings.INTERSTELLAR_CLIENT_MESSAGE_MODE)
+
         if timeout is not None and deadline is None:
             deadline = Deadline.from_timeout(timeout)
         elif timeout is not None and deadline is not None:
             deadline = min(Deadline.from_timeout(timeout), deadline)
 
+        context_deadline = get_context_deadline()
+
+        if context_deadline is not None:
+            # what is left of the request being handled, less a margin for sending the reply
+            remaining = context_deadline.time_remaining() - settings.INTERSTELLAR_CLIENT_DEADLINE_MARGIN
+
+            if remaining <= 0:
+                raise DeadlineExceededError(message=f"No time left to call {name}.")
+
+            context_deadline = Deadline.from_timeout(remaining)
+            deadline = context_deadline if deadline is None else min(deadline, context_deadline)
+
+        if self.breaker is not None:
+            self.breaker.before_call()
+
         metadata = cast(_Metadata, MultiDict(metadata or ()))
 
         return InterstellarStream(self, name, metadata, cardinality,
                                   request_type, reply_type, codec=self._codec,
-                                  dispatch=self.__dispatch__, deadline=deadline)
+                                  dispatch=self.__dispatch__, deadline=deadline, decode=decode,
+                                  breaker=self.breaker, limiter=self.limiter)
+
+
+class ChannelView:
+    """
+    A channel with options that are applied to every request made through it.
+    Lets a stub be bound with per call options while sharing the pooled channel.
+    """
+    __slots__ = ('channel', 'options')
+
+    def __init__(self, channel: InterstellarChannel, **options):
+        self.channel = channel
+        self.options = options
+
+    def request(self, *args, **kwargs):
+        return self.channel.request(*args, **self.options, **kwargs)
+
+    def __getattr__(self, item):
+        return getattr(self.channel, item)
@@ -0,0 +1,107 @@
+import asyncio
+
+from functools import partial
+
+from insanic.conf import settings
+
+from interstellar.client.utils import format_method_key, parse_method_key
+from interstellar.exceptions import DeadlineExceededError
+from interstellar.utils import detach_context_deadline
+
+# method key -> SingleFlight of the method, None when the method is not coalesced
+flights = {}
+
+
+class SingleFlight:
+    """
+    Shares one in flight call between every caller asking for the same key
+    until it completes. The call runs in its own task, without the deadline of
+    the caller that happened to start it, so a caller giving up does not fail
+    or cancel it for the others. Each caller waits as long as its own timeout
+    allows and the call is cancelled once every caller has given up.
+    """
+    __slots__ = ('calls', 'waiting', 'started', 'coalesced')
+
+    def __init__(self):
+        self.calls = {}
+        # call -> number of callers waiting for it
+        self.waiting = {}
+        # calls that were actually made
+        self.started = 0
+        # calls that waited for the result of another call
+        self.coalesced = 0
+
+    async def do(self, key, func, timeout: float = None):
+        """
+        :param func: makes the call, it should not limit it with a timeout of its own
+        :param timeout: seconds this caller waits for the call, whether it made it or joined it
+        :raises DeadlineExceededError: if the call does not complete in time, it keeps
+            running for the other callers
+        """
+        try:
+            future = self.calls[key]
+        except KeyError:
+            future = self.calls[key] = asyncio.ensure_future(func())
+            detach_context_deadline(future)
+            future.add_done_callback(partial(self._forget, key))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        self.waiting[future] = self.waiting.get(future, 0) + 1
+        try:
+            if timeout is None:
+                return await asyncio.shield(future)
+
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                if future.done():
+                    # raised by the call itself
+                    raise
+                raise DeadlineExceededError(message="Deadline expired waiting for a coalesced call.")
+        finally:
+            self._leave(key, future)
+
+    def _leave(self, key, future):
+        waiting = self.waiting.pop(future) - 1
+
+        if waiting:
+            self.waiting[future] = waiting
+        elif not future.done():
+            # nobody is left to use the reply, callers from now on make a new call
+            future.cancel()
+            self._forget(key, future)
+
+    def _forget(self, key, future):
+        if self.calls.get(key) is future:
+            del self.calls[key]
+
+        if future.done() and not future.cancelled():
+            # retrieve it so it is not logged when every caller has given up
+            future.exception()
+
+
+def get_flight(method_key):
+    """
+    :param method_key: (service_name, namespace, version, stub_name, service_method_name)
+    :return: the SingleFlight of the method if it is in ``INTERSTELLAR_CLIENT_COALESCED_METHODS``
+    """
+    try:
+        return flights[method_key]
+    except KeyError:
+        coalesced = {parse_method_key(method) for method in settings.INTERSTELLAR_CLIENT_COALESCED_METHODS}
+        flight = flights[method_key] = SingleFlight() if method_key in coalesced else None
+        return flight
+
+
+def coalescing_stats():
+    """
+    :return: dict of method -> dict with the number of calls ``started`` and ``coalesced`` into them
+    """
+    return {format_method_key(method_key): {"started": flight.started, "coalesced": flight.coalesced}
+            for method_key, flight in flights.items() if flight is not None}
+
+
+def reset():
+    flights.clear()
@@ -0,0 +1,190 @@
+import array
+
+from operator import attrgetter
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.message import Message
+
+from interstellar.client.converters import _RecursiveField, _is_map, _is_repeated, get_converter
+
+_NOT_IMPORTED = object()
+
+# imported when the first column is made because it is slow to import,
+# None if it is not installed
+numpy = _NOT_IMPORTED
+
+# field type -> (array.array typecode, numpy dtype)
+# strings and bytes have no typecode and are kept as lists (numpy object arrays)
+COLUMN_TYPES = {
+    FieldDescriptor.TYPE_DOUBLE: ('d', 'float64'),
+    FieldDescriptor.TYPE_FLOAT: ('f', 'float32'),
+    FieldDescriptor.TYPE_INT64: ('q', 'int64'),
+    FieldDescriptor.TYPE_SINT64: ('q', 'int64'),
+    FieldDescriptor.TYPE_SFIXED64: ('q', 'int64'),
+    FieldDescriptor.TYPE_UINT64: ('Q', 'uint64'),
+    FieldDescriptor.TYPE_FIXED64: ('Q', 'uint64'),
+    FieldDescriptor.TYPE_INT32: ('i', 'int32'),
+    FieldDescriptor.TYPE_SINT32: ('i', 'int32'),
+    FieldDescriptor.TYPE_SFIXED32: ('i', 'int32'),
+    FieldDescriptor.TYPE_ENUM: ('i', 'int32'),
+    FieldDescriptor.TYPE_UINT32: ('I', 'uint32'),
+    FieldDescriptor.TYPE_FIXED32: ('I', 'uint32'),
+    FieldDescriptor.TYPE_BOOL: ('B', 'bool'),
+}
+
+# descriptor -> ColumnarSchema
+schemas = {}
+
+
+def get_schema(descriptor):
+    """
+    Returns the columnar schema for a message descriptor, building it on first use.
+
+    :param descriptor: protobuf message descriptor
+    :rtype: ColumnarSchema
+    """
+    try:
+        return schemas[descriptor]
+    except KeyError:
+        schema = schemas[descriptor] = ColumnarSchema(descriptor)
+        schema.compile()
+        return schema
+
+
+def get_numpy():
+    global numpy
+
+    if numpy is _NOT_IMPORTED:
+        try:
+            import numpy as _numpy
+        except ImportError:  # pragma: no cover
+            _numpy = None
+        numpy = _numpy
+    return numpy
+
+
+def message_to_columns(message):
+    """
+    Converts a protobuf message to a dict where repeated fields are columns.
+
+    :param message: protobuf message object
+    :type message: Message
+    :return: dict
+    """
+    if not isinstance(message, Message):
+        return None
+
+    return get_schema(message.DESCRIPTOR)(message)
+
+
+def _make_column(field):
+    """
+    :return: function that builds a column from a sequence of values of the field
+    """
+    typecode, dtype = COLUMN_TYPES.get(field.type, (None, object))
+    numpy = get_numpy()
+
+    if numpy is not None:
+        return lambda values: numpy.array(values, dtype=dtype)
+    if typecode is None:
+        return list
+    return lambda values: array.array(typecode, values)
+
+
+def _is_flat(descriptor):
+    """
+    A message that only has singular scalar fields, so each field can become a column.
+    """
+    return all(field.type != FieldDescriptor.TYPE_MESSAGE and not _is_repeated(field)
+               for field in descriptor.fields)
+
+
+class ColumnarSchema:
+    """
+    Converts messages of one type to a dict of columns.
+
+    Repeated scalar fields become a single column and repeated messages made
+    only of scalar fields become a dict with a column per field, using NumPy
+    arrays when it is installed and :class:`array.array` (lists for strings
+    and bytes) otherwise. Singular messages are converted the same way and
+    everything else is converted like it would be to a dict.
+    """
+    __slots__ = ('descriptor', 'fields', 'compiling')
+
+    def __init__(self, descriptor):
+        self.descriptor = descriptor
+        self.fields = ()
+        self.compiling = False
+
+    def compile(self):
+        self.compiling = True
+        fields = []
+
+        for field in self.descriptor.fields:
+            oneof = field.containing_oneof.name if field.containing_oneof is not None else None
+            fields.append((field.name, oneof) + self.field_converter(field))
+
+        self.fields = tuple(fields)
+        self.compiling = False
+
+    def field_converter(self, field):
+        """
+        :return: (function that converts the value, whether that function is given the message instead)
+        """
+        if _is_repeated(field) and not _is_map(field):
+            if field.type != FieldDescriptor.TYPE_MESSAGE:
+                return _make_column(field), False
+
+            if _is_flat(field.message_type):
+                return self.table_converter(field.message_type), False
+
+        elif field.type == FieldDescriptor.TYPE_MESSAGE and not _is_map(field):
+            schema = get_schema(field.message_type)
+
+            if not schema.compiling:
+                return schema, False
+
+        convert = get_converter(self.descriptor).field_converter(field)
+        return convert, isinstance(convert, _RecursiveField)
+
+    @staticmethod
+    def table_converter(descriptor):
+        names = tuple(field.name for field in descriptor.fields)
+        columns = tuple(_make_column(field) for field in descriptor.fields)
+
+        if not names:
+            # a message without fields has no columns
+            def convert(rows):
+                return {}
+        elif len(names) == 1:
+            get_row = attrgetter(names[0])
+
+            def convert(rows):
+                return {names[0]: columns[0]([get_row(row) for row in rows])}
+        else:
+            get_row = attrgetter(*names)
+
+            def convert(rows):
+                if not rows:
+                    return {name: column([]) for name, column in zip(names, columns)}
+
+                # transpose rows of values into a sequence of values per field
+                values = zip(*map(get_row, rows))
+                return {name: column(v) for name, column, v in zip(names, columns, values)}
+        return convert
+
+    def __call__(self, message):
+        result = {}
+
+        for name, oneof, convert, takes_message in self.fields:
+            if oneof is not None and message.WhichOneof(oneof) != name:
+                continue
+
+            if takes_message:
+                result[name] = convert(message)
+            elif convert is None:
+                result[name] = getattr(message, name)
+            else:
+                result[name] = convert(getattr(message, name))
+
+        return result
@@ -1,3 +1,96 @@
 # deprecate when insanic==0.8.3
 TASK_CONTEXT_REMOTE_ADDR = "remote_addr"
+# upper bound of channels opened to a single service
 INTERSTELLAR_CLIENT_CHANNEL_COUNT = 10
+# channels kept open to a service even when idle
+INTERSTELLAR_CLIENT_CHANNEL_MIN_COUNT = 1
+# open another channel when the chosen one has this many streams open.
+# lowered to the server's SETTINGS_MAX_CONCURRENT_STREAMS when that is smaller
+INTERSTELLAR_CLIENT_CHANNEL_STREAM_THRESHOLD = 100
+# seconds a channel can stay unused before it is closed
+INTERSTELLAR_CLIENT_CHANNEL_IDLE_TIMEOUT = 300
+# per service overrides of the above and of INTERSTELLAR_CLIENT_MESSAGE_MODE. for example
+# {"userip": {"min_count": 2, "max_count": 20, "stream_threshold": 50, "idle_timeout": 60, "message_mode": "raw"}}
+INTERSTELLAR_CLIENT_CHANNEL_POOL_OPTIONS = {}
+
+# only record installed grpc packages at start up and import each one
+# the first time one of its stubs is used
+INTERSTELLAR_CLIENT_LAZY_REGISTRATION = False
+# path of a file where the stubs and service methods of installed grpc packages
+# are kept between restarts, so they are only introspected after a package changes
+INTERSTELLAR_CLIENT_REGISTRY_MANIFEST = None
+
+# unary methods where concurrent identical calls share one request, as
+# "service.namespace.version.Stub.Method", e.g. "userip.userip.v1.UserIpService.GetUserIp".
+# calls are identical when the request, user and metadata are the same, each caller waits
+# for the shared call within its own timeout and converts the reply with its own message mode
+INTERSTELLAR_CLIENT_COALESCED_METHODS = []
+# idempotent unary methods whose replies are cached by request, call metadata and user,
+# with their ttl in seconds and optionally max_entries (1024) and max_bytes.
+# e.g. {"artist.artist.v1.ArtistService.GetArtist": {"ttl": 60, "max_entries": 10000}}
+INTERSTELLAR_CLIENT_CACHED_METHODS = {}
+# idempotent unary methods that send a second copy of a call on another channel when
+# there is no reply after "delay" seconds, or the "percentile" (95) of observed latencies
+# without a delay, for at most "budget" (0.1) of the calls.
+# e.g. {"venue.venue.v1.VenueService.GetVenue": {"delay": 0.05, "budget": 0.05}}
+INTERSTELLAR_CLIENT_HEDGED_METHODS = {}
+
+# seconds taken off the remaining time of the request being handled
+# for the deadline of calls made while handling it
+INTERSTELLAR_CLIENT_DEADLINE_MARGIN = 0.01
+# seconds from the start of an insanic http request its calls have to complete in,
+# for example the same as RESPONSE_TIMEOUT. None to not give http requests a deadline
+INTERSTELLAR_CLIENT_HTTP_DEADLINE = None
+
+# calls GRPCBindContext.map makes at the same time when not given a concurrency
+INTERSTELLAR_CLIENT_MAP_CONCURRENCY = 20
+
+# stops calling a service for reset_timeout seconds when failure_rate of its calls in the last
+# window seconds failed, after at least min_calls. then half_open_calls calls are let through to test it
+INTERSTELLAR_CLIENT_CIRCUIT_BREAKER = {
+    "enabled": False,
+    "failure_rate": 0.5,
+    "min_calls": 20,
+    "window": 10,
+    "reset_timeout": 30,
+    "half_open_calls": 3,
+}
+# per service overrides of the above, e.g. {"userip": {"enabled": True, "reset_timeout": 10}}
+INTERSTELLAR_CLIENT_CIRCUIT_BREAKER_OPTIONS = {}
+
+# limits the calls made to a service at the same time, starting at initial_limit. the limit grows by one
+# per limit calls completing within latency_tolerance times the lowest latency of the last window calls,
+# and is multiplied by backoff when they are slower or the service is overloaded.
+# calls over the limit wait, at most max_queue of them, the others fail with ResourceExhaustedError
+INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT = {
+    "enabled": False,
+    "initial_limit": 20,
+    "min_limit": 1,
+    "max_limit": 200,
+    "max_queue": 50,
+    "backoff": 0.9,
+    "latency_tolerance": 2.0,
+    "window": 100,
+}
+# per service overrides of the above, e.g. {"userip": {"enabled": True, "max_queue": 10}}
+INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT_OPTIONS = {}
+
+# how ChannelPool picks a channel once the pool is full.
+# one of "random", "least_in_flight", "power_of_two"
+INTERSTELLAR_CLIENT_CHANNEL_SELECTION = "power_of_two"
+
+# seconds resolved addresses of a service host are cached for
+INTERSTELLAR_CLIENT_DNS_TTL = 30
+
+# how received messages are returned. one of
+# "dict": converted to a dict, "raw": the protobuf message,
+# "lazy": a read only mapping that converts fields on access,
+# "columnar": a dict where repeated fields are column arrays (numpy if installed)
+INTERSTELLAR_CLIENT_MESSAGE_MODE = "dict"
+
+# replies of streaming calls received ahead of the ones being used by
+# GRPCMethod.iterate, more wait on the server with http2 flow control
+INTERSTELLAR_CLIENT_STREAM_PREFETCH = 16
+
+# seconds service tokens are valid for, a new one is signed when a third of it is left
+INTERSTELLAR_CLIENT_SERVICE_TOKEN_LIFETIME = 300
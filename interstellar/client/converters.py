@@ -0,0 +1,279 @@
+from collections.abc import Mapping
+from operator import attrgetter
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.message import Message
+
+# descriptor -> MessageConverter
+converters = {}
+
+
+def get_converter(descriptor):
+    """
+    Returns the converter for a message descriptor, building it on first use.
+
+    :param descriptor: protobuf message descriptor
+    :rtype: MessageConverter
+    """
+    try:
+        return converters[descriptor]
+    except KeyError:
+        converter = converters[descriptor] = MessageConverter(descriptor)
+        converter.compile()
+        return converter
+
+
+def message_to_dict(message):
+    """
+    Converts a protobuf message to a dict.
+
+    :param message: protobuf message object
+    :type message: Message
+    :return: dict, None if it is not a message, like the None received at the end of a stream,
+        so it can be told apart from a message with every field unset
+    """
+    if not isinstance(message, Message):
+        return None
+
+    return get_converter(message.DESCRIPTOR)(message)
+
+
+def message_to_mapping(message):
+    """
+    Wraps a protobuf message in a read only mapping that converts fields on access.
+
+    :param message: protobuf message object
+    :type message: Message
+    :rtype: MessageMapping
+    """
+    if not isinstance(message, Message):
+        return None
+
+    return MessageMapping(message)
+
+
+def _is_map(field):
+    return field.type == FieldDescriptor.TYPE_MESSAGE and field.message_type.GetOptions().map_entry
+
+
+def _is_repeated(field):
+    try:
+        return field.is_repeated
+    except AttributeError:
+        # protobuf releases before is_repeated only have label, which newer releases removed
+        return field.label == FieldDescriptor.LABEL_REPEATED
+
+
+def _convert_repeated_scalar(value):
+    return list(value)
+
+
+def _convert_map_scalar(value):
+    return dict(value)
+
+
+class MessageConverter:
+    """
+    Converts messages of one type to dicts.
+
+    What to do with every field is worked out once from the descriptor, so
+    converting a message only reads its fields. Scalar and enum fields are
+    copied as is, repeated fields become lists, maps become dicts and
+    nested messages are converted recursively. Only the member of a oneof
+    that is set is included.
+    """
+    __slots__ = ('descriptor', 'scalar_names', 'get_scalars', 'fields', 'oneofs', 'compiling', 'lazy_fields')
+
+    def __init__(self, descriptor):
+        self.descriptor = descriptor
+        self.scalar_names = ()
+        self.get_scalars = None
+        self.fields = ()
+        self.oneofs = ()
+        self.compiling = False
+        self.lazy_fields = None
+
+    def compile(self):
+        self.compiling = True
+
+        scalar_names = []
+        fields = []
+        oneofs = {}
+
+        for field in self.descriptor.fields:
+            convert = self.field_converter(field)
+
+            if field.containing_oneof is not None:
+                if isinstance(convert, _RecursiveField):
+                    # a oneof member is only converted when it is set
+                    convert = convert.converter
+                oneofs.setdefault(field.containing_oneof.name, {})[field.name] = convert
+            elif convert is None:
+                scalar_names.append(field.name)
+            else:
+                fields.append((field.name, convert, isinstance(convert, _RecursiveField)))
+
+        if len(scalar_names) > 1:
+            self.scalar_names = tuple(scalar_names)
+            self.get_scalars = attrgetter(*scalar_names)
+        elif scalar_names:
+            # attrgetter only returns a tuple for more than one attribute
+            name = scalar_names[0]
+            self.scalar_names = (name,)
+            self.get_scalars = lambda message: (getattr(message, name),)
+
+        self.fields = tuple(fields)
+        self.oneofs = tuple((name, members) for name, members in oneofs.items())
+        self.compiling = False
+
+    def field_converter(self, field):
+        """
+        :return: function that converts the value of the field, None if the value can be used as is
+        """
+        if _is_map(field):
+            value_field = field.message_type.fields_by_name['value']
+
+            if value_field.type == FieldDescriptor.TYPE_MESSAGE:
+                convert = get_converter(value_field.message_type)
+                return lambda value: {k: convert(v) for k, v in value.items()}
+            return _convert_map_scalar
+
+        if field.type == FieldDescriptor.TYPE_MESSAGE:
+            converter = get_converter(field.message_type)
+
+            if _is_repeated(field):
+                return lambda value: [converter(v) for v in value]
+
+            if converter.compiling:
+                # the message contains itself. unset fields are None instead of
+                # a dict of defaults so converting does not recurse forever.
+                return _RecursiveField(field.name, converter)
+            return converter
+
+        if _is_repeated(field):
+            return _convert_repeated_scalar
+        return None
+
+    def __call__(self, message):
+        if self.get_scalars is not None:
+            result = dict(zip(self.scalar_names, self.get_scalars(message)))
+        else:
+            result = {}
+
+        for name, convert, takes_message in self.fields:
+            if takes_message:
+                result[name] = convert(message)
+            else:
+                result[name] = convert(getattr(message, name))
+
+        for oneof, members in self.oneofs:
+            name = message.WhichOneof(oneof)
+            if name is not None:
+                convert = members[name]
+                value = getattr(message, name)
+                result[name] = value if convert is None else convert(value)
+
+        return result
+
+    def compile_lazy(self):
+        """
+        Works out how each field is read by a :class:`MessageMapping`.
+        Nested messages are wrapped instead of converted.
+        """
+        lazy_fields = {}
+
+        for field in self.descriptor.fields:
+            oneof = field.containing_oneof.name if field.containing_oneof is not None else None
+            lazy_fields[field.name] = (oneof, self.lazy_field_converter(field))
+
+        self.lazy_fields = lazy_fields
+        return lazy_fields
+
+    @staticmethod
+    def lazy_field_converter(field):
+        if _is_map(field):
+            if field.message_type.fields_by_name['value'].type == FieldDescriptor.TYPE_MESSAGE:
+                return lambda value: {k: MessageMapping(v) for k, v in value.items()}
+            return _convert_map_scalar
+
+        if field.type == FieldDescriptor.TYPE_MESSAGE:
+            if _is_repeated(field):
+                return lambda value: [MessageMapping(v) for v in value]
+            return MessageMapping
+
+        if _is_repeated(field):
+            return _convert_repeated_scalar
+        return None
+
+
+class _RecursiveField:
+    __slots__ = ('name', 'converter')
+
+    def __init__(self, name, converter):
+        self.name = name
+        self.converter = converter
+
+    def __call__(self, message):
+        if message.HasField(self.name):
+            return self.converter(getattr(message, self.name))
+        return None
+
+
+class MessageMapping(Mapping):
+    """
+    A read only view of a message. Fields are converted the first time they
+    are looked up, so reading a few fields of a large message does not pay
+    for converting all of it.
+
+    Nested messages are returned as mappings as well. :meth:`to_dict`
+    converts the whole message.
+    """
+    __slots__ = ('_message', '_converter', '_values')
+
+    def __init__(self, message):
+        self._message = message
+        self._converter = get_converter(message.DESCRIPTOR)
+        self._values = {}
+
+    @property
+    def message(self):
+        return self._message
+
+    def _get_lazy_fields(self):
+        lazy_fields = self._converter.lazy_fields
+        if lazy_fields is None:
+            lazy_fields = self._converter.compile_lazy()
+        return lazy_fields
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+
+        oneof, convert = self._get_lazy_fields()[key]
+
+        if oneof is not None and self._message.WhichOneof(oneof) != key:
+            raise KeyError(key)
+
+        value = getattr(self._message, key)
+        if convert is not None:
+            value = convert(value)
+
+        self._values[key] = value
+        return value
+
+    def __iter__(self):
+        message = self._message
+        for name, (oneof, _) in self._get_lazy_fields().items():
+            if oneof is None or message.WhichOneof(oneof) == name:
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._message.DESCRIPTOR.full_name})"
+
+    def to_dict(self):
+        return self._converter(self._message)
@@ -1,17 +1,95 @@
 import aiotask_context
+import time
 
+from datetime import datetime, timezone
 from functools import partial
 from grpclib.events import listen, SendMessage, RecvMessage, SendRequest, RecvInitialMetadata, RecvTrailingMetadata
 
 from insanic.conf import settings
 from insanic.models import to_header_value, RequestService
 from insanic.services.utils import context_user, context_correlation_id
-from insanic.utils.datetime import get_utc_datetime
 
 from insanic.scopes import get_my_ip
 
+from interstellar.tokens import encode_service_token
 
-async def interstellar_client_event_send_request(event: SendRequest, service_name: str) -> None:
+
+# strftime format of the date header
+DATE_HEADER_FORMAT = "%a, %d %b %y %T %z"
+
+# (second, formatted date header of that second)
+_date_header = (None, None)
+
+
+def get_date_header() -> str:
+    """
+    The date header, formatted at most once a second.
+    """
+    global _date_header
+
+    second = int(time.time())
+    if _date_header[0] != second:
+        _date_header = (second, datetime.fromtimestamp(second, timezone.utc).strftime(DATE_HEADER_FORMAT))
+    return _date_header[1]
+
+
+class OutboundMetadata:
+    """
+    Metadata sent with each request on a channel. Header names and the service
+    header only depend on the process and the target service, so they are
+    computed once when the channel is opened and only the user, correlation id,
+    date and remote address are read for each request. The service token is
+    signed again when a third of its lifetime is left.
+    """
+    __slots__ = ('service_name', 'user_header', 'service_header', 'service_value', 'request_id_header',
+                 'remote_addr_key', 'authorization', 'authorization_refresh_at')
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.user_header = settings.INTERNAL_REQUEST_USER_HEADER.lower()
+        self.service_header = settings.INTERNAL_REQUEST_SERVICE_HEADER.lower()
+        self.service_value = to_header_value(dict(
+            source=settings.SERVICE_NAME,
+            aud=service_name,
+            source_ip=get_my_ip(),
+            destination_version="0.0.1",
+        ))
+        self.request_id_header = settings.REQUEST_ID_HEADER_FIELD.lower()
+        self.remote_addr_key = settings.TASK_CONTEXT_REMOTE_ADDR
+        self.authorization = None
+        self.authorization_refresh_at = 0
+
+    def get_authorization(self) -> str:
+        """
+        The authorization header with a service token for the service.
+        """
+        now = time.time()
+        if now >= self.authorization_refresh_at:
+            lifetime = settings.INTERSTELLAR_CLIENT_SERVICE_TOKEN_LIFETIME
+            token, exp = encode_service_token(settings.SERVICE_NAME, self.service_name, lifetime, now)
+            self.authorization = f"{settings.JWT_SERVICE_AUTH['JWT_AUTH_HEADER_PREFIX']} {token}"
+            self.authorization_refresh_at = exp - lifetime / 3
+        return self.authorization
+
+    def render(self) -> dict:
+        metadata = {
+            # inject user information to request headers
+            self.user_header: to_header_value(context_user()),
+            self.service_header: self.service_value,
+            # inject correlation_id to headers
+            self.request_id_header: context_correlation_id(),
+            "date": get_date_header(),
+            # inject ip
+            "ip": aiotask_context.get(self.remote_addr_key, "unknown"),
+        }
+
+        if settings.INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY is not None:
+            metadata["authorization"] = self.get_authorization()
+        return metadata
+
+
+async def interstellar_client_event_send_request(event: SendRequest, service_name: str,
+                                                 template: OutboundMetadata = None) -> None:
     """
     https://grpclib.readthedocs.io/en/latest/events.html#grpclib.events.SendRequest
 
@@ -20,32 +98,14 @@ async def interstellar_client_event_send_request(event: SendRequest, service_nam
     :param event.method_name: (read_only) - RPC's method name
     :param event.deadline: (read-only) - request's Deadline
     :param event.content_type: (read-only) - request's content type
+    :param service_name: service the request is sent to
+    :param template: metadata of the channel, made for the request when not given
     :return:
     """
-    # inject user information to request headers
-    user = context_user()
-    event.metadata.update({settings.INTERNAL_REQUEST_USER_HEADER.lower(): to_header_value(user)})
-
-    service = dict(
-        source=settings.SERVICE_NAME,
-        aud=service_name,
-        source_ip=get_my_ip(),
-        destination_version="0.0.1",
-    )
-
-    service = to_header_value(service)
-
-    event.metadata.update({settings.INTERNAL_REQUEST_SERVICE_HEADER.lower(): service})
-
-    # inject correlation_id to headers
-    correlation_id = context_correlation_id()
-    event.metadata.update({settings.REQUEST_ID_HEADER_FIELD.lower(): correlation_id})
-
-    event.metadata.update({"date": get_utc_datetime().strftime("%a, %d %b %y %T %z")})
+    if template is None:
+        template = OutboundMetadata(service_name)
 
-    # inject ip
-    remote_addr = aiotask_context.get(settings.TASK_CONTEXT_REMOTE_ADDR, "unknown")
-    event.metadata.update({"ip": remote_addr})
+    event.metadata.update(template.render())
 
 
 # async def interstellar_client_event_send_message(event: SendMessage) -> None:
@@ -100,7 +160,8 @@ def attach_events(channel, service_name=""):
     # listen(channel, SendMessage, interstellar_client_event_send_message)
     # listen(channel, RecvMessage, interstellar_client_event_recv_message)
     # client side events
-    listen(channel, SendRequest, partial(interstellar_client_event_send_request, service_name=service_name))
+    listen(channel, SendRequest, partial(interstellar_client_event_send_request, service_name=service_name,
+                                         template=OutboundMetadata(service_name)))
     # listen(channel, RecvInitialMetadata, interstellar_client_event_recv_initial_metadata)
     # listen(channel, RecvTrailingMetadata, interstellar_client_event_recv_trailing_metadata)
 
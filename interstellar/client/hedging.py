@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+from collections import deque
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.client.utils import format_method_key, parse_method_key
+
+# method key -> Hedge of the method, None when the method is not hedged
+hedges = {}
+
+
+class Hedge:
+    """
+    Sends a second copy of a call when the first has not replied after
+    ``delay`` seconds, or after the ``percentile`` of the latencies observed
+    for the method when no delay is given. The first reply wins and the
+    other call is cancelled. At most ``budget`` of the calls are hedged.
+    """
+    __slots__ = ('delay', 'percentile', 'budget', 'latencies', 'min_samples', 'observed_delay', 'recorded',
+                 'calls', 'hedged', 'hedge_wins')
+
+    # how many latencies are recorded before the observed delay is computed again
+    refresh_interval = 50
+
+    def __init__(self, delay: float = None, percentile: float = 95, budget: float = 0.1, window: int = 1000,
+                 min_samples: int = 20):
+        self.delay = delay
+        self.percentile = percentile
+        self.budget = budget
+        self.latencies = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.observed_delay = None
+        self.recorded = 0
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def get_delay(self):
+        """
+        :return: seconds to wait before hedging, None if there are not enough latencies observed yet
+        """
+        if self.delay is not None:
+            return self.delay
+        return self.observed_delay
+
+    def record(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.recorded += 1
+
+        if len(self.latencies) >= self.min_samples and (self.observed_delay is None
+                                                        or self.recorded % self.refresh_interval == 0):
+            ordered = sorted(self.latencies)
+            self.observed_delay = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def can_hedge(self) -> bool:
+        return self.hedged < self.budget * self.calls
+
+    async def call(self, attempt):
+        """
+        :param attempt: function that makes the call and returns an awaitable of the reply,
+            called again for the hedge
+        """
+        self.calls += 1
+        start = time.monotonic()
+        delay = self.get_delay()
+        first = asyncio.ensure_future(attempt())
+        attempts = [first]
+
+        def record_first(future):
+            # the latencies of the first attempts, hedged or not, so the percentile is not
+            # only of the replies that were fast enough to win
+            if not future.cancelled() and future.exception() is None:
+                self.record(time.monotonic() - start)
+
+        first.add_done_callback(record_first)
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+
+                if not done and self.can_hedge():
+                    self.hedged += 1
+                    attempts.append(asyncio.ensure_future(attempt()))
+
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for future in done:
+                    if future.exception() is None:
+                        if future is not first:
+                            self.hedge_wins += 1
+
+                            if not first.done():
+                                # the first is cancelled, it took at least this long
+                                self.record(time.monotonic() - start)
+                        return future.result()
+
+            # every attempt failed, raise what the first one raised
+            return first.result()
+        finally:
+            for future in attempts:
+                if not future.done():
+                    future.cancel()
+
+
+def get_hedge(method_key):
+    """
+    :param method_key: (service_name, namespace, version, stub_name, service_method_name)
+    :return: the Hedge of the method if it is in ``INTERSTELLAR_CLIENT_HEDGED_METHODS``
+    """
+    try:
+        return hedges[method_key]
+    except KeyError:
+        hedge = None
+
+        for method, options in settings.INTERSTELLAR_CLIENT_HEDGED_METHODS.items():
+            if parse_method_key(method) == method_key:
+                try:
+                    hedge = Hedge(**options)
+                except TypeError:
+                    raise ImproperlyConfigured(f"Hedging options for {method} can only be delay, percentile, "
+                                               f"budget, window and min_samples.")
+                break
+
+        hedges[method_key] = hedge
+        return hedge
+
+
+def hedging_stats():
+    """
+    :return: dict of method -> dict with calls, hedged, hedge_wins and the current delay
+    """
+    return {
+        format_method_key(method_key): {
+            "calls": hedge.calls,
+            "hedged": hedge.hedged,
+            "hedge_wins": hedge.hedge_wins,
+            "delay": hedge.get_delay(),
+        }
+        for method_key, hedge in hedges.items() if hedge is not None
+    }
+
+
+def reset():
+    hedges.clear()
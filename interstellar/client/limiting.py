@@ -0,0 +1,168 @@
+import asyncio
+
+from collections import deque
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.client.breakers import is_failure
+from interstellar.exceptions import DeadlineExceededError, ResourceExhaustedError
+
+# service_name -> AdaptiveLimiter of the service, None when it is disabled for the service
+limiters = {}
+
+
+class AdaptiveLimiter:
+    """
+    Limits the calls made to a service at the same time, adjusting the limit
+    to the round trip times of the calls (additive increase, multiplicative decrease).
+
+    The limit grows by one for every ``limit`` calls that complete within
+    ``latency_tolerance`` times the lowest round trip time of the previous
+    ``window`` calls, and is multiplied by ``backoff`` when a call is slower
+    or fails because the service is overloaded. Calls over the limit wait
+    in a queue of ``max_queue``, past which they fail with
+    :class:`ResourceExhaustedError` without being sent.
+    """
+    __slots__ = ('service_name', 'limit', 'min_limit', 'max_limit', 'max_queue', 'backoff', 'latency_tolerance',
+                 'window', 'in_flight', 'waiters', 'samples', 'window_min_rtt', 'min_rtt', 'rejected')
+
+    def __init__(self, service_name: str, initial_limit: int = 20, min_limit: int = 1, max_limit: int = 200,
+                 max_queue: int = 50, backoff: float = 0.9, latency_tolerance: float = 2.0, window: int = 100):
+        if not min_limit <= initial_limit <= max_limit:
+            raise ValueError("initial_limit must be between min_limit and max_limit.")
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1.")
+
+        self.service_name = service_name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.window = window
+
+        self.in_flight = 0
+        self.waiters = deque()
+        # round trip times seen in the current window and the lowest one of them
+        self.samples = 0
+        self.window_min_rtt = None
+        # the lowest round trip time of the previous window, what latencies are compared to
+        self.min_rtt = None
+        # calls failed without being sent
+        self.rejected = 0
+
+    async def acquire(self, timeout: float = None) -> None:
+        """
+        Waits for the call to be allowed.
+
+        :param timeout: seconds left to the deadline of the call
+        :raises ResourceExhaustedError: if the queue is full
+        :raises DeadlineExceededError: if the deadline expires while waiting
+        """
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            return
+
+        if len(self.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise ResourceExhaustedError(message=f"Too many calls to {self.service_name} waiting.")
+
+        waiter = asyncio.get_event_loop().create_future()
+        self.waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise DeadlineExceededError(message=f"Deadline expired waiting to call {self.service_name}.")
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter) -> None:
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            if waiter.done() and not waiter.cancelled():
+                # the call was let through when it stopped waiting
+                self.release()
+
+    def release(self, rtt: float = None, error=None) -> None:
+        """
+        :param rtt: seconds the call took, None to not adjust the limit
+        :param error: what the call raised, None if it succeeded
+        """
+        self.in_flight -= 1
+
+        if rtt is not None and not isinstance(error, asyncio.CancelledError):
+            self.update(rtt, is_failure(error))
+
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def update(self, rtt: float, failed: bool) -> None:
+        if self.window_min_rtt is None or rtt < self.window_min_rtt:
+            self.window_min_rtt = rtt
+
+        self.samples += 1
+        if self.samples >= self.window:
+            self.min_rtt = self.window_min_rtt
+            self.samples = 0
+            self.window_min_rtt = None
+
+        min_rtt = self.min_rtt if self.min_rtt is not None else self.window_min_rtt
+
+        if failed or rtt > min_rtt * self.latency_tolerance:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+def get_limiter(service_name: str):
+    """
+    Limiter options are ``INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT`` updated with
+    the ones of the service in ``INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT_OPTIONS``.
+
+    :return: the AdaptiveLimiter of the service, None if it is not enabled for the service
+    """
+    try:
+        return limiters[service_name]
+    except KeyError:
+        options = dict(settings.INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT)
+        options.update(settings.INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT_OPTIONS.get(service_name, {}))
+
+        if options.pop('enabled', False):
+            try:
+                limiter = AdaptiveLimiter(service_name, **options)
+            except (TypeError, ValueError) as e:
+                raise ImproperlyConfigured(f"Invalid concurrency limit options for {service_name}: {e}")
+        else:
+            limiter = None
+
+        limiters[service_name] = limiter
+        return limiter
+
+
+def limiter_stats():
+    """
+    :return: dict of service_name -> dict with the current limit, calls in flight and waiting, and rejected calls
+    """
+    return {
+        service_name: {
+            "limit": int(limiter.limit),
+            "in_flight": limiter.in_flight,
+            "queued": len(limiter.waiters),
+            "rejected": limiter.rejected,
+        }
+        for service_name, limiter in limiters.items() if limiter is not None
+    }
+
+
+def reset():
+    limiters.clear()
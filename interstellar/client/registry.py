@@ -1,65 +1,199 @@
 import importlib
 import inspect
-import pkg_resources
+import json
+import os
+import re
 
 from typing import Collection
 
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # pragma: no cover
+    # python < 3.8
+    import importlib_metadata
+
 from insanic.exceptions import ImproperlyConfigured
+from insanic.log import error_logger
 
 from interstellar.client.utils import is_grpc_module, is_service_method, is_stub
 
 
+def normalize_package_name(name: str) -> str:
+    """
+    The same key ``pkg_resources`` used for a distribution, e.g. ``grpc_test_monkey_v1`` -> ``grpc-test-monkey-v1``.
+    """
+    return re.sub(r'[^A-Za-z0-9.]+', '-', name).lower()
+
+
+def read_package_info(distribution):
+    """
+    Name and version of a distribution from the headers of its metadata.
+    Only the headers are parsed, ``distribution.metadata`` parses the whole
+    file which makes scanning every installed distribution slow.
+
+    :return: (name, version), name is None if the metadata could not be read
+    """
+    text = distribution.read_text('METADATA') or distribution.read_text('PKG-INFO') or ''
+    name = version = None
+
+    for line in text.split('\n\n', 1)[0].splitlines():
+        if line.startswith('Name:'):
+            name = line[5:].strip()
+        elif line.startswith('Version:'):
+            version = line[8:].strip()
+    return name, version
+
+
+def find_grpc_packages():
+    """
+    Installed distributions that start with ``grpc-``, in the order they are found on the path.
+
+    :return: dict of package name -> version
+    """
+    packages = {}
+    for distribution in importlib_metadata.distributions():
+        name, version = read_package_info(distribution)
+
+        if name is None:
+            continue
+
+        key = normalize_package_name(name)
+        if key.startswith('grpc-') and key not in packages:
+            packages[key] = version
+    return packages
+
+
+# bumped when what is written to the manifest changes
+MANIFEST_FORMAT = 1
+
+
+def type_path(cls) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def describe_stub(StubClass) -> dict:
+    """
+    :return: service method name -> dict with the name, cardinality, request_type and reply_type
+    """
+    return {
+        stub_name: {
+            "name": service_method.name,
+            "cardinality": service_method._cardinality.name,
+            "request_type": type_path(service_method.request_type),
+            "reply_type": type_path(service_method.reply_type),
+        }
+        for stub_name, service_method in inspect.getmembers(StubClass(None), is_service_method)
+    }
+
+
+def parse_package_name(package_name: str):
+    """
+    ``grpc-<service>[-<namespace>]-<version>``, the namespace defaults to the service.
+
+    :return: (service, namespace, version)
+    """
+    package_info, version = package_name.rsplit('-', 1)
+    package_info = package_info.split('-')
+    service = package_info[1]
+    namespace = package_info[2] if len(package_info) > 2 else service
+    return service, namespace, version
+
+
 class StubRegistry():
 
     def __init__(self):
         self.stubs = {}
         self.service_methods = {}
+        # (service_name, namespace, version, stub_name, service_method_name) -> stub class
+        self.resolved = {}
+        # installed grpc package name -> distribution version, scanned once
+        self.packages = None
+        # service_name -> installed grpc package names of the service
+        self.service_packages = {}
+        # (service_name, namespace, version) -> package name registered but not imported yet
+        self.deferred = {}
+        # package name -> grpc module, stubs and service methods of the package, see save_manifest
+        self.manifest = {}
+        self.manifest_changed = False
 
     def scan_grpc_packages(self, service_name=None):
-
-        all_grpc_client_packages = [p.key for p in pkg_resources.working_set if p.key.startswith('grpc-')]
+        """
+        Installed ``grpc-`` packages, all of them or the ones for a service.
+        The installed distributions are only scanned on the first call, use
+        :meth:`rescan_grpc_packages` to pick up packages installed afterwards.
+        """
+        if self.packages is None:
+            self.packages = find_grpc_packages()
 
         if service_name:
-            # to include extra '-' at the end
-            search_packages = ['grpc', service_name, '']
-            search_for = "-".join(search_packages)
-            return [p for p in all_grpc_client_packages if p.startswith(search_for)]
+            try:
+                return list(self.service_packages[service_name])
+            except KeyError:
+                # to include extra '-' at the end
+                search_packages = ['grpc', service_name, '']
+                search_for = "-".join(search_packages)
+                packages = self.service_packages[service_name] = [p for p in self.packages
+                                                                  if p.startswith(search_for)]
+                return list(packages)
         else:
-            return all_grpc_client_packages
+            return list(self.packages)
 
-    def register(self, packages: Collection[str]):
+    def rescan_grpc_packages(self, service_name=None):
+        self.packages = None
+        self.service_packages = {}
+        return self.scan_grpc_packages(service_name)
+
+    def register(self, packages: Collection[str], lazy: bool = False):
         """
         Loads stubs from modules
 
-        :param namespace:
         :param packages:
+        :param lazy: only record the packages, each one is imported the first
+            time a stub of its service, namespace and version is asked for
         :return:
         """
         for package_name in packages:
-            self._load_package(package_name)
+            if lazy:
+                self.deferred[parse_package_name(package_name)] = package_name
+            else:
+                self._load_package(package_name)
 
     def _load_package(self, package_name: str) -> None:
         """
-        loads the package name
+        loads the package name, from the manifest when it has an entry
+        for the installed version of the package
 
         :param package_name:
         :return: returns loaded package with stub_name: and method class
         """
 
-        package_info, version = package_name.rsplit('-', 1)
-        package_info = package_info.split('-')
-        service = package_info[1]
-        namespace = package_info[2] if len(package_info) > 2 else service
-
-        gp = importlib.import_module(package_name.replace('-', '_'))
+        service, namespace, version = parse_package_name(package_name)
+        self.deferred.pop((service, namespace, version), None)
+
+        entry = self.get_manifest_entry(package_name)
+
+        if entry is None:
+            gp = importlib.import_module(package_name.replace('-', '_'))
+
+            try:
+                _, module = inspect.getmembers(gp, is_grpc_module)[0]
+            except KeyError:
+                raise RuntimeError(f'Error while loading {package_name}. '
+                                   f'Could not find module ending with "_grpc".')
+            except IndexError as e:
+                raise e
+
+            entry = self.manifest[package_name] = {
+                "distribution_version": self.get_installed_version(package_name),
+                "module": module.__name__,
+                "stubs": {class_name: describe_stub(StubClass)
+                          for class_name, StubClass in inspect.getmembers(module, is_stub)},
+            }
+            self.manifest_changed = True
+        else:
+            module = importlib.import_module(entry['module'])
 
-        try:
-            _, module = inspect.getmembers(gp, is_grpc_module)[0]
-        except KeyError:
-            raise RuntimeError(f'Error while loading {package_name}. '
-                               f'Could not find module ending with "_grpc".')
-        except IndexError as e:
-            raise e
+        self.resolved.clear()
 
         if service not in self.stubs:
             self.stubs[service] = {}
@@ -70,17 +204,76 @@ class StubRegistry():
         if version not in self.stubs[service][namespace]:
             self.stubs[service][namespace][version] = {}
 
-        for class_name, StubClass in inspect.getmembers(module, is_stub):
+        for class_name, methods in entry['stubs'].items():
+            self.stubs[service][namespace][version].update({class_name: getattr(module, class_name)})
+            self.service_methods[(service, namespace, version, class_name)] = list(methods)
+
+    def get_installed_version(self, package_name: str):
+        self.scan_grpc_packages()
+        return self.packages.get(package_name)
+
+    def get_manifest_entry(self, package_name: str):
+        """
+        :return: the manifest entry of the package if it was made for the installed version
+        """
+        entry = self.manifest.get(package_name)
+
+        if entry is None:
+            return None
+
+        installed_version = self.get_installed_version(package_name)
+        if installed_version is None or entry.get("distribution_version") != installed_version:
+            return None
+        return entry
 
-            self.stubs[service][namespace][version].update({class_name: StubClass})
+    def get_method_info(self, package_name: str, stub_name: str, service_method_name: str):
+        """
+        :return: dict with the name, cardinality, request_type and reply_type
+            of a service method of a loaded package
+        """
+        return self.manifest[package_name]["stubs"][stub_name][service_method_name]
 
-            for stub_name, service_method in inspect.getmembers(StubClass(None), is_service_method):
-                composite_key = (service, namespace, version, class_name)
+    def load_manifest(self, path: str) -> None:
+        """
+        Reads stubs and service methods written by :meth:`save_manifest`
+        so loading packages does not need to introspect them. Entries made
+        for other versions of a package than the installed one are ignored.
+        """
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            error_logger.warning(f"Could not read the stub registry manifest {path}. Ignoring it.")
+            return
 
-                if composite_key not in self.service_methods:
-                    self.service_methods[composite_key] = []
+        if not isinstance(manifest, dict) or manifest.get("format") != MANIFEST_FORMAT:
+            return
 
-                self.service_methods[composite_key].append(stub_name)
+        for package_name, entry in manifest.get("packages", {}).items():
+            self.manifest.setdefault(package_name, entry)
+
+    def save_manifest(self, path: str) -> None:
+        """
+        Writes the stubs and service methods of loaded packages, if any were introspected since
+        the manifest was loaded.
+        """
+        if not self.manifest_changed:
+            return
+
+        packages = {package_name: entry for package_name, entry in self.manifest.items()
+                    if self.get_manifest_entry(package_name) is not None}
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            with open(temporary_path, "w") as f:
+                json.dump({"format": MANIFEST_FORMAT, "packages": packages}, f, indent=2, sort_keys=True)
+            os.replace(temporary_path, path)
+        except OSError:
+            error_logger.warning(f"Could not write the stub registry manifest {path}.")
+        else:
+            self.manifest_changed = False
 
     def get_stub(self, service_name: str, namespace: str, version: str, stub_name: str, service_method_name: str = None):
         """
@@ -91,6 +284,23 @@ class StubRegistry():
         :param service_method_name:
         :return:
         """
+        try:
+            return self.resolved[(service_name, namespace, version, stub_name, service_method_name)]
+        except KeyError:
+            pass
+
+        stub_class = self._resolve_stub(service_name, namespace, version, stub_name, service_method_name)
+        self.resolved[(service_name, namespace, version, stub_name, service_method_name)] = stub_class
+        return stub_class
+
+    def _resolve_stub(self, service_name: str, namespace: str, version: str, stub_name: str,
+                      service_method_name: str = None):
+        if self.deferred:
+            package_name = self.deferred.get((service_name, namespace, version))
+
+            if package_name is not None:
+                self._load_package(package_name)
+
         if not service_name in self.stubs:
             raise ImproperlyConfigured(f"No packages have been installed for service {service_name}.")
 
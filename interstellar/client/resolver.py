@@ -0,0 +1,110 @@
+import asyncio
+import ipaddress
+import socket
+import time
+
+from insanic.log import error_logger
+
+
+class Resolver:
+    """
+    Resolves a host to all of its addresses and caches the result for ``ttl`` seconds.
+
+    Hosts are resolved in the background when the event loop is running so
+    calls are never held up by DNS. Until the first resolution of a host
+    completes it is connected to by name, and once an entry has expired the
+    stale addresses are still returned while they are refreshed.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._cache = {}
+        self._refreshing = set()
+
+    def resolve(self, host: str, port: int) -> tuple:
+        """
+
+        :param host:
+        :param port:
+        :return: tuple of addresses, the same object for as long as the addresses do not change
+        """
+        key = (host, port)
+
+        try:
+            expires, addresses = self._cache[key]
+        except KeyError:
+            if self._is_ip_address(host):
+                addresses = (host,)
+                self._cache[key] = (float('inf'), addresses)
+            elif asyncio.get_event_loop().is_running():
+                # expired from the start, so it is replaced when the refresh completes
+                addresses = (host,)
+                self._cache[key] = (0, addresses)
+                self._schedule_refresh(key)
+            else:
+                addresses = self._store(key, self._getaddrinfo(host, port))
+            return addresses
+
+        if expires <= time.monotonic() and key not in self._refreshing:
+            self._schedule_refresh(key)
+        return addresses
+
+    def reset(self):
+        self._cache = {}
+        self._refreshing = set()
+
+    @staticmethod
+    def _is_ip_address(host):
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return True
+
+    @staticmethod
+    def _addresses(infos):
+        # getaddrinfo returns an entry per family and protocol, keep the order but drop duplicates
+        return tuple(dict.fromkeys(info[4][0] for info in infos))
+
+    def _getaddrinfo(self, host, port):
+        try:
+            return self._addresses(socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+        except OSError:
+            error_logger.warning(f"Could not resolve {host}. Connecting to it without resolving.")
+            return (host,)
+
+    def _store(self, key, addresses):
+        try:
+            _, previous = self._cache[key]
+        except KeyError:
+            pass
+        else:
+            if set(previous) == set(addresses):
+                addresses = previous
+
+        self._cache[key] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    def _schedule_refresh(self, key):
+        loop = asyncio.get_event_loop()
+
+        if loop.is_running():
+            self._refreshing.add(key)
+            loop.create_task(self._refresh(key, loop))
+        else:
+            self._store(key, self._getaddrinfo(*key))
+
+    async def _refresh(self, key, loop):
+        host, port = key
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            # keep serving the addresses we know about until dns recovers
+            _, addresses = self._cache[key]
+            error_logger.warning(f"Could not refresh addresses for {host}. Using the previous addresses.")
+        else:
+            addresses = self._addresses(infos)
+        finally:
+            self._refreshing.discard(key)
+
+        self._store(key, addresses)
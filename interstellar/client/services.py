@@ -1,8 +1,30 @@
+import asyncio
 import os
+import weakref
 
-from interstellar.client.channels import ChannelPool
+from functools import partial
+from typing import Iterable, TYPE_CHECKING
 
-def grpc_interface(self, namespace, version, stub_name, service_method_name=None, *, registry):
+from grpclib.metadata import Deadline
+from multidict import MultiDict
+
+from insanic.conf import settings
+from insanic.models import to_header_value
+from insanic.services.utils import context_user
+
+from interstellar.client.channels import ChannelPool, get_message_decoder, get_pool_options
+from interstellar.client.caching import get_cache
+from interstellar.client.coalescing import get_flight
+from interstellar.client.hedging import get_hedge
+from interstellar.client.streaming import iterate_replies
+from interstellar.exceptions import DeadlineExceededError
+from interstellar.utils import get_context_deadline
+
+if TYPE_CHECKING:
+    from insanic.services import Service  # noqa
+
+
+def grpc_interface(self, namespace, version, stub_name, service_method_name=None, *, registry, message_mode=None):
     if not stub_name.endswith('Stub'):
         stub_name = f"{stub_name}Stub"
 
@@ -13,25 +35,68 @@ def grpc_interface(self, namespace, version, stub_name, service_method_name=None
         version,
         stub_name,
         service_method_name,
+        message_mode=message_mode,
     )
 
+
+def get_service_channel(service: 'Service', exclude=None):
+    host = "0.0.0.0" if os.environ.get('MMT_ENV') == 'local' else service.host
+    port = service.port + 1000
+    return ChannelPool.get_channel(service.service_name, host, port, exclude)
+
+
+def get_time_remaining(timeout: float = None):
+    """
+    :return: seconds left for a call with the timeout, within the deadline of the
+        request being handled, None if neither limits it
+    """
+    context_deadline = get_context_deadline()
+
+    if context_deadline is not None:
+        remaining = context_deadline.time_remaining() - settings.INTERSTELLAR_CLIENT_DEADLINE_MARGIN
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+
+def has_call_policies(method_key):
+    """
+    Whether calls to the method are cached, coalesced or hedged.
+    """
+    return get_cache(method_key) is not None or get_flight(method_key) is not None or \
+        get_hedge(method_key) is not None
+
+
 class GRPCBindContext:
-    __slots__ = ('registry', 'service', 'namespace', 'stub_name', 'service_method_name', 'stub_class', 'stub',)
+    __slots__ = ('registry', 'service', 'namespace', 'version', 'stub_name', 'service_method_name', 'stub_class',
+                 'stub', 'message_mode',)
 
-    def __init__(self, registry, service: 'Service', namespace: str, version: str, stub_name: str, service_method_name: str = None):
+    def __init__(self, registry, service: 'Service', namespace: str, version: str, stub_name: str,
+                 service_method_name: str = None, *, message_mode: str = None):
         self.registry = registry
         self.stub_name = stub_name
         self.service = service
         self.namespace = namespace
+        self.version = version
         self.service_method_name = service_method_name
+        self.message_mode = message_mode
+
+        if message_mode is not None:
+            # fail when binding instead of when the first message is received
+            get_message_decoder(message_mode)
+
         self.stub_class = registry.get_stub(service.service_name, namespace, version, stub_name, service_method_name)
 
     def __enter__(self):
-        host = "0.0.0.0" if os.environ.get('MMT_ENV') == 'local' else self.service.host
-        port = self.service.port + 1000
-        channel = ChannelPool.get_channel(self.service.service_name, host, port)
+        if self.service_method_name:
+            method_key = (self.service.service_name, self.namespace, self.version, self.stub_name,
+                          self.service_method_name)
+
+            if has_call_policies(method_key):
+                # the channel is picked when the call is made, if the reply is not cached
+                return GRPCMethod(self.service, self.stub_class, self.service_method_name, method_key,
+                                  message_mode=self.message_mode)
 
-        self.stub = self.stub_class(channel)
+        self.stub = get_service_channel(self.service).get_stub(self.stub_class, self.message_mode)
 
         if self.service_method_name:
             return getattr(self.stub, self.service_method_name)
@@ -40,3 +105,238 @@ class GRPCBindContext:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
+
+    def iterate(self, message=None, **kwargs):
+        """
+        Async iterator over the replies of a streaming service method, see :meth:`GRPCMethod.iterate`.
+        """
+        if not self.service_method_name:
+            raise TypeError("iterate needs a service method to call.")
+
+        method = GRPCMethod(self.service, self.stub_class, self.service_method_name, message_mode=self.message_mode)
+        return method.iterate(message, **kwargs)
+
+    async def map(self, requests: Iterable, *, concurrency: int = None, timeout: float = None, metadata=None):
+        """
+        Calls the service method with every request, at most ``concurrency`` at a time,
+        each call on a channel picked from the pool.
+
+        :param requests: request messages
+        :param concurrency: defaults to ``INTERSTELLAR_CLIENT_MAP_CONCURRENCY``
+        :raises ValueError: if the concurrency is less than 1
+        :param timeout: seconds all of the calls have to complete in
+        :param metadata: sent with every call
+        :return: list of the replies in the order of the requests, with the exception
+            raised instead of the reply for requests that failed
+        """
+        if not self.service_method_name:
+            raise TypeError("map needs a service method to call.")
+        if concurrency is not None and concurrency < 1:
+            raise ValueError(f"map needs a concurrency of at least 1, not {concurrency}.")
+
+        method = GRPCMethod(self.service, self.stub_class, self.service_method_name,
+                            (self.service.service_name, self.namespace, self.version, self.stub_name,
+                             self.service_method_name),
+                            message_mode=self.message_mode)
+        deadline = Deadline.from_timeout(timeout) if timeout is not None else None
+
+        requests = list(requests)
+        results = [None] * len(requests)
+        pending = iter(enumerate(requests))
+
+        async def call_pending():
+            for index, request in pending:
+                kwargs = {}
+
+                if deadline is not None:
+                    kwargs['timeout'] = deadline.time_remaining()
+
+                    if kwargs['timeout'] <= 0:
+                        results[index] = DeadlineExceededError()
+                        continue
+                try:
+                    results[index] = await method(request, metadata=metadata, **kwargs)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    results[index] = e
+
+        if concurrency is None:
+            concurrency = settings.INTERSTELLAR_CLIENT_MAP_CONCURRENCY
+        await asyncio.gather(*[call_pending() for _ in range(min(concurrency, len(requests)))])
+        return results
+
+
+class GRPCInterface:
+    """
+    Bound to ``Service.grpc``. Calling it binds a stub with :class:`GRPCBindContext`
+    and its attributes resolve service methods once, for example
+    ``service.grpc.monkey.v1.ApeService.GetChimpanzee``.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        # Service -> (namespace, version, stub_name, service_method_name) -> GRPCMethod bound to the service
+        self.methods = weakref.WeakKeyDictionary()
+
+    def __get__(self, service, owner):
+        if service is None:
+            return self
+        return GRPCPath(self, service, ())
+
+
+class GRPCPath:
+    """
+    ``namespace.version.stub_name.service_method_name`` of a service,
+    built one attribute at a time.
+    """
+    __slots__ = ('interface', 'service', 'parts')
+
+    def __init__(self, interface: GRPCInterface, service: 'Service', parts: tuple):
+        self.interface = interface
+        self.service = service
+        self.parts = parts
+
+    def __call__(self, *args, **kwargs):
+        return grpc_interface(self.service, *self.parts, *args, registry=self.interface.registry, **kwargs)
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+
+        parts = self.parts + (item,)
+
+        if len(parts) < 4:
+            return GRPCPath(self.interface, self.service, parts)
+
+        namespace, version, stub_name, service_method_name = parts
+        if not stub_name.endswith('Stub'):
+            stub_name = f"{stub_name}Stub"
+
+        try:
+            methods = self.interface.methods[self.service]
+        except KeyError:
+            methods = self.interface.methods[self.service] = {}
+
+        path = (namespace, version, stub_name, service_method_name)
+        try:
+            return methods[path]
+        except KeyError:
+            key = (self.service.service_name,) + path
+            stub_class = self.interface.registry.get_stub(*key)
+            method = methods[path] = GRPCMethod(self.service, stub_class, service_method_name, key)
+            return method
+
+
+class GRPCMethod:
+    """
+    A service method that can be called like a :class:`grpclib.client.ServiceMethod`.
+    Every call picks a channel from the pool and uses the stub bound to it.
+
+    Replies of methods in ``INTERSTELLAR_CLIENT_CACHED_METHODS`` are looked up
+    before a channel is picked, concurrent identical calls to methods in
+    ``INTERSTELLAR_CLIENT_COALESCED_METHODS`` share one request and slow calls
+    to methods in ``INTERSTELLAR_CLIENT_HEDGED_METHODS`` are sent again. Each
+    caller gets its own converted reply, except in the "raw" message mode
+    where a coalesced reply is shared.
+    """
+    __slots__ = ('service', 'stub_class', 'name', 'message_mode', 'flight', 'cache', 'hedge', 'unbound')
+
+    def __init__(self, service: 'Service', stub_class, name: str, method_key: tuple = None, *,
+                 message_mode: str = None):
+        # service method of a stub without a channel, made when its attributes are first read
+        self.unbound = None
+        self.service = service
+        self.stub_class = stub_class
+        self.name = name
+        self.message_mode = message_mode
+        self.flight = get_flight(method_key) if method_key is not None else None
+        self.cache = get_cache(method_key) if method_key is not None else None
+        self.hedge = get_hedge(method_key) if method_key is not None else None
+
+    def get_method(self, message_mode: str = None):
+        """
+        :return: the :class:`grpclib.client.ServiceMethod` of a pooled channel
+        """
+        if message_mode is not None:
+            get_message_decoder(message_mode)
+        return getattr(get_service_channel(self.service).get_stub(self.stub_class, message_mode), self.name)
+
+    def __call__(self, message, *, message_mode: str = None, **kwargs):
+        message_mode = message_mode or self.message_mode
+
+        if self.flight is None and self.cache is None and self.hedge is None:
+            return self.get_method(message_mode)(message, **kwargs)
+        return self.call_with_policies(message, message_mode, **kwargs)
+
+    async def call_with_policies(self, message, message_mode: str = None, *, timeout=None, metadata=None):
+        decode = get_message_decoder(message_mode or get_pool_options(self.service.service_name)['message_mode'])
+        # replies can depend on the user, so calls of different users are never shared
+        key = (message.SerializeToString(deterministic=True), tuple(sorted(MultiDict(metadata or ()).items())),
+               to_header_value(context_user()))
+
+        if self.cache is not None:
+            reply = self.cache.get(key)
+
+            if reply is not None:
+                return decode(reply)
+
+        # a coalesced call is shared by callers with their own timeouts, each of them waits for it as
+        # long as its timeout allows and the call is only limited by the longest of them
+        call_timeout = timeout if self.flight is None else None
+
+        if self.hedge is None:
+            call = partial(self.get_method("raw"), message, timeout=call_timeout, metadata=metadata)
+        else:
+            deadline = Deadline.from_timeout(call_timeout) if call_timeout is not None else None
+            channels = []
+
+            def attempt():
+                # the hedge is sent on another channel than the first attempt,
+                # to another endpoint when the service has more than one
+                channel = get_service_channel(self.service, exclude=channels[0] if channels else None)
+                channels.append(channel)
+                method = getattr(channel.get_stub(self.stub_class, "raw"), self.name)
+                return method(message, metadata=metadata,
+                              timeout=deadline.time_remaining() if deadline is not None else None)
+
+            call = partial(self.hedge.call, attempt)
+
+        if self.flight is None:
+            reply = await call()
+        else:
+            reply = await self.flight.do(key, call, timeout=get_time_remaining(timeout))
+
+        if self.cache is not None:
+            self.cache.set(key, reply)
+        return decode(reply)
+
+    def open(self, *, message_mode: str = None, **kwargs):
+        return self.get_method(message_mode or self.message_mode).open(**kwargs)
+
+    def iterate(self, message=None, *, requests=None, prefetch: int = None, batch_size: int = None,
+                message_mode: str = None, timeout: float = None, metadata=None):
+        """
+        Calls a streaming method, for example ``async for reply in method.iterate(request)``.
+        Replies are received into a buffer of ``prefetch`` and converted as they are yielded.
+
+        :param message: request of server streaming methods
+        :param requests: iterable or async iterable of requests for client streaming
+            and bidirectional methods
+        :param prefetch: defaults to ``INTERSTELLAR_CLIENT_STREAM_PREFETCH``
+        :param batch_size: yield lists of this many replies
+        """
+        decode = get_message_decoder(message_mode or self.message_mode or
+                                     get_pool_options(self.service.service_name)['message_mode'])
+
+        return iterate_replies(partial(self.open, message_mode="raw", timeout=timeout, metadata=metadata),
+                               message, requests=requests,
+                               prefetch=prefetch or settings.INTERSTELLAR_CLIENT_STREAM_PREFETCH,
+                               batch_size=batch_size, decode=decode)
+
+    def __getattr__(self, item):
+        # request_type, reply_type and the rest of the service method, read
+        # from the stub class without picking a channel
+        if self.unbound is None:
+            self.unbound = getattr(self.stub_class(None), self.name)
+        return getattr(self.unbound, item)
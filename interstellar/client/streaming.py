@@ -0,0 +1,104 @@
+import asyncio
+
+from typing import Callable, Optional
+
+# put in the buffer after the last reply
+END = object()
+
+
+async def send_requests(stream, requests) -> None:
+    """
+    Sends requests from an iterable or an async iterable and ends the stream.
+    """
+    if hasattr(requests, '__aiter__'):
+        async for request in requests:
+            await stream.send_message(request)
+    else:
+        for request in requests:
+            await stream.send_message(request)
+    await stream.end()
+
+
+async def receive_replies(open_stream: Callable, buffer: asyncio.Queue, request=None, requests=None) -> None:
+    """
+    Makes the call and puts its replies in the buffer, waiting while it is full
+    so replies are not read from the connection faster than they are used.
+    Puts what the call raised or :data:`END` once it is done.
+    """
+    try:
+        async with open_stream() as stream:
+            await stream.send_request()
+
+            if requests is None:
+                await stream.send_message(request, end=True)
+                sender = None
+            else:
+                # bidirectional streams keep sending while replies are received
+                sender = asyncio.ensure_future(send_requests(stream, requests))
+
+            try:
+                async for reply in stream:
+                    await buffer.put(reply)
+
+                if sender is not None:
+                    await sender
+            finally:
+                if sender is not None and not sender.done():
+                    sender.cancel()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await buffer.put(e)
+    else:
+        await buffer.put(END)
+
+
+async def iterate_replies(open_stream: Callable, request=None, *, requests=None, prefetch: int = 16,
+                          batch_size: Optional[int] = None, decode: Callable = None):
+    """
+    Async iterator over the replies of a streaming call.
+
+    :param open_stream: returns the stream of the call
+    :param request: sent as the only request
+    :param requests: iterable or async iterable of the requests to send instead of request
+    :param prefetch: replies received ahead of the ones being used
+    :param batch_size: yield lists of this many replies, the last list can be shorter
+    :param decode: applied to each reply as it is yielded
+    """
+    if prefetch < 1:
+        raise ValueError("prefetch must be at least 1.")
+    if batch_size is not None and batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+
+    buffer = asyncio.Queue(maxsize=prefetch)
+    receiver = asyncio.ensure_future(receive_replies(open_stream, buffer, request, requests))
+    batch = []
+
+    try:
+        while True:
+            reply = await buffer.get()
+
+            if reply is END:
+                break
+            elif isinstance(reply, Exception):
+                raise reply
+
+            if decode is not None:
+                reply = decode(reply)
+
+            if batch_size is None:
+                yield reply
+            else:
+                batch.append(reply)
+
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+        if batch:
+            yield batch
+    finally:
+        if not receiver.done():
+            # stopped before the end, the stream is reset
+            receiver.cancel()
+            await asyncio.wait([receiver])
@@ -1,3 +1,4 @@
+import importlib
 import inspect
 
 from grpclib.client import ServiceMethod
@@ -13,3 +14,30 @@ def is_stub(m):
 
 def is_service_method(m):
     return isinstance(m, ServiceMethod)
+
+
+def import_string(path):
+    """
+    Imports ``module:qualified.name``.
+    """
+    module_name, _, qualname = path.partition(':')
+    obj = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def parse_method_key(method):
+    """
+    ``service.namespace.version.Stub.Method`` to the key of a service method,
+    ``(service_name, namespace, version, stub_name, service_method_name)``.
+    """
+    service_name, namespace, version, stub_name, service_method_name = method.split('.')
+
+    if not stub_name.endswith('Stub'):
+        stub_name = f"{stub_name}Stub"
+    return service_name, namespace, version, stub_name, service_method_name
+
+
+def format_method_key(method_key):
+    return ".".join(method_key)
@@ -0,0 +1,139 @@
+import asyncio
+import struct
+import zlib
+
+from typing import Optional, Type
+
+from grpclib.const import Status
+from grpclib.encoding.base import CodecBase
+from grpclib.stream import _RecvType, _SendType
+
+from insanic.conf import settings
+
+from interstellar.exceptions import InterstellarError
+
+GZIP = "gzip"
+IDENTITY = "identity"
+# encodings messages can be received in, sent as grpc-accept-encoding
+ACCEPT_ENCODING = f"{GZIP},{IDENTITY}"
+
+# grpc method name -> minimum size of the messages that are compressed, None when they are not
+thresholds = {}
+
+
+def get_threshold(method_name: str) -> Optional[int]:
+    """
+    :param method_name: as in the :path header, e.g. "/userip.v1.UserIpService/GetUserIp"
+    :return: messages of the method at least this many bytes long are compressed,
+        None if the method is not in ``INTERSTELLAR_COMPRESSED_METHODS``
+    """
+    try:
+        return thresholds[method_name]
+    except KeyError:
+        threshold = thresholds[method_name] = settings.INTERSTELLAR_COMPRESSED_METHODS.get(method_name)
+        return threshold
+
+
+def accepts(accept_encoding: Optional[str], encoding: str = GZIP) -> bool:
+    """
+    Whether the value of a grpc-accept-encoding header includes the encoding.
+    """
+    if not accept_encoding:
+        return False
+    return encoding in (e.strip() for e in accept_encoding.split(','))
+
+
+def gzip_compress(data: bytes) -> bytes:
+    compressor = zlib.compressobj(settings.INTERSTELLAR_COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gzip_decompress(data: bytes) -> bytes:
+    """
+    :raises InterstellarError: with RESOURCE_EXHAUSTED if the data decompresses to more than
+        ``INTERSTELLAR_COMPRESSION_MAX_MESSAGE_SIZE`` bytes, it stops decompressing there
+    """
+    max_size = settings.INTERSTELLAR_COMPRESSION_MAX_MESSAGE_SIZE
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    if max_size is None:
+        decompressed = decompressor.decompress(data)
+    else:
+        # one byte more than allowed so a message of exactly max_size still reads the gzip trailer
+        decompressed = decompressor.decompress(data, max_size + 1)
+
+        if decompressor.unconsumed_tail or len(decompressed) > max_size:
+            raise InterstellarError(status=Status.RESOURCE_EXHAUSTED,
+                                    message=f'Decompressed message is larger than {max_size} bytes.')
+
+    if not decompressor.eof:
+        raise zlib.error("Incomplete gzip data.")
+    return decompressed
+
+
+async def run_sized(func, data: bytes) -> bytes:
+    """
+    Runs func with the data in the default executor when the data is at least
+    ``INTERSTELLAR_COMPRESSION_EXECUTOR_THRESHOLD`` bytes, zlib releases the GIL
+    while it works so the event loop is not blocked.
+    """
+    if len(data) < settings.INTERSTELLAR_COMPRESSION_EXECUTOR_THRESHOLD:
+        return func(data)
+    return await asyncio.get_event_loop().run_in_executor(None, func, data)
+
+
+async def send_message(
+        stream,
+        codec: CodecBase,
+        message: _SendType,
+        message_type: Type[_SendType],
+        *,
+        end: bool = False,
+        threshold: Optional[int] = None,
+) -> None:
+    """
+    :func:`grpclib.stream.send_message` that gzip compresses messages
+    at least ``threshold`` bytes long. Give a threshold only when the
+    headers of the stream had "grpc-encoding: gzip".
+    """
+    data = codec.encode(message, message_type)
+    compressed = threshold is not None and len(data) >= threshold
+
+    if compressed:
+        data = await run_sized(gzip_compress, data)
+
+    await stream.send_data(struct.pack('>?I', compressed, len(data)) + data, end_stream=end)
+
+
+async def recv_message(
+        stream,
+        codec: CodecBase,
+        message_type: Type[_RecvType],
+        encoding: Optional[str] = None,
+) -> Optional[_RecvType]:
+    """
+    :func:`grpclib.stream.recv_message` that decompresses messages
+
+    :param encoding: value of the grpc-encoding header of the stream
+    :raises InterstellarError: with UNIMPLEMENTED if a message is compressed with an encoding other than gzip,
+        with RESOURCE_EXHAUSTED if it decompresses to more than ``INTERSTELLAR_COMPRESSION_MAX_MESSAGE_SIZE`` bytes
+    """
+    meta = await stream.recv_data(5)
+    if not meta:
+        return None
+
+    compressed, message_len = struct.unpack('>?I', meta)
+    data = await stream.recv_data(message_len)
+    assert len(data) == message_len, f'{len(data)} != {message_len}'
+
+    if compressed:
+        if encoding != GZIP:
+            raise InterstellarError(status=Status.UNIMPLEMENTED,
+                                    message=f'Compression with {encoding} is not supported.')
+        data = await run_sized(gzip_decompress, data)
+
+    return codec.decode(data, message_type)
+
+
+def reset():
+    thresholds.clear()
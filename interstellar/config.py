@@ -1,2 +1,24 @@
 INTERSTELLAR_INSANIC_ERROR_CODE_HEADER = 'grpc-error-code'
-INTERNAL_REQUEST_SERVICE_HEADER = "x-insanic-request-service"
\ No newline at end of file
+INTERNAL_REQUEST_SERVICE_HEADER = "x-insanic-request-service"
+# task context key of the deadline of the request being handled
+TASK_CONTEXT_DEADLINE = "interstellar_deadline"
+
+# grpc methods whose messages are gzip compressed when they are at least the given number of bytes,
+# e.g. {"/userip.v1.UserIpService/GetUserIp": 1024}. clients compress the requests they send and
+# servers compress the replies sent to clients that accept gzip. compressed messages are always received
+INTERSTELLAR_COMPRESSED_METHODS = {}
+# gzip compression level, 1 is fastest and 9 compresses most
+INTERSTELLAR_COMPRESSION_LEVEL = 6
+# messages of at least this many bytes are compressed and decompressed in the default executor
+INTERSTELLAR_COMPRESSION_EXECUTOR_THRESHOLD = 65536
+# compressed messages that decompress to more than this many bytes are rejected with RESOURCE_EXHAUSTED,
+# 4 MiB like the default maximum message size of grpc. None to not limit them
+INTERSTELLAR_COMPRESSION_MAX_MESSAGE_SIZE = 4 * 1024 * 1024
+
+# key service tokens are signed with when calling other services, the private key for RS256 or ES256.
+# tokens are sent as "authorization: <JWT_SERVICE_AUTH['JWT_AUTH_HEADER_PREFIX']> <token>". None to not send them
+INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY = None
+# key service tokens are verified with by servers that verify them, the public key for RS256 or ES256.
+# with HS256 both keys are the same shared secret, so any service holding it can sign tokens for any source
+INTERSTELLAR_SERVICE_TOKEN_VERIFYING_KEY = None
+INTERSTELLAR_SERVICE_TOKEN_ALGORITHM = "HS256"
@@ -1,7 +1,10 @@
+import copy
 import logging  # pragma: no cover
+import queue
 import sys
+import threading
 
-from insanic.log import get_log_level, get_log_queue
+from insanic.log import get_log_level
 from insanic.log.formatters import JSONFormatter
 
 from insanic.scopes import is_docker
@@ -41,21 +44,127 @@ def get_formatter(type='json'):
     return default_formatter
 
 
+# formats the tracebacks of records of handlers without a formatter
+traceback_formatter = logging.Formatter()
+
+
+class BatchingStreamHandler(logging.StreamHandler):
+    """
+    Stream handler that formats and writes records in a background thread,
+    flushing the stream once per batch of up to ``batch_size`` records.
+    Records that come when ``max_queue`` are waiting are dropped and counted
+    in ``dropped`` so logging never blocks the event loop.
+    """
+    # put in the queue to stop the thread
+    STOP = None
+
+    def __init__(self, stream=None, *, max_queue: int = 10000, batch_size: int = 256):
+        super().__init__(stream)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.thread = None
+        self.thread_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.thread is None:
+            self.start()
+
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Copy of the record with the message merged with its arguments and the traceback
+        formatted, the objects they refer to can change before the record is written.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.formatter or traceback_formatter).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def start(self) -> None:
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.write_batches, name="interstellar-access-log",
+                                               daemon=True)
+                self.thread.start()
+
+    def write_batches(self) -> None:
+        while True:
+            # stop puts STOP in the queue, so there is no need to wake up to check for it
+            record = self.queue.get()
+
+            batch = [record]
+            while record is not self.STOP and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(record)
+
+            self.write(batch)
+
+            if batch[-1] is self.STOP:
+                return
+
+    def write(self, records) -> None:
+        lines = []
+        for record in records:
+            if record is self.STOP:
+                continue
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+
+        if lines:
+            try:
+                self.stream.write(self.terminator.join(lines) + self.terminator)
+                self.stream.flush()
+            except Exception:
+                self.handleError(records[0])
+
+    def stop(self) -> None:
+        """
+        Writes the records waiting and stops the thread, it is started again on the next record.
+        """
+        with self.thread_lock:
+            if self.thread is not None:
+                self.queue.put(self.STOP)
+                self.thread.join()
+                self.thread = None
+
+    def close(self) -> None:
+        self.stop()
+        super().close()
+
+
 def get_handler():
-    return logging.StreamHandler(sys.stdout)
+    return BatchingStreamHandler(sys.stdout)
 
 
-# def get_queue_handler(*handlers):
-#     from insanic.log.handlers import QueueListenerHandler
-#     return QueueListenerHandler(handlers, queue=get_log_queue('interstellar'))
+def access_log_stats():
+    """
+    :return: dict with the records waiting to be written and the ones dropped
+    """
+    return {
+        "queued": handler.queue.qsize(),
+        "dropped": handler.dropped,
+    }
 
 
 handler = get_handler()
 handler.setFormatter(get_formatter("json" if is_docker else "generic"))
-# queue_handler = get_queue_handler(handler)
 
 interstellar_access_log = logging.getLogger('interstellar.access')  # pragma: no cover
 interstellar_access_log.setLevel(get_log_level())
-# interstellar_access_log.addHandler(queue_handler)
 
 interstellar_access_log.addHandler(handler)
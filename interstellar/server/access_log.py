@@ -0,0 +1,92 @@
+import random
+import time
+
+from grpclib.const import Status
+
+from insanic.conf import settings
+
+# (grpc status, method name) -> TokenBucket for logging tracebacks
+buckets = {}
+# records not logged because they were sampled out,
+# and errors logged without their traceback because of rate limits
+suppressed = {"sampled": 0, "tracebacks": 0}
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` events a second on average, and bursts of up to ``burst``.
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def should_log(grpc_status, duration: float) -> bool:
+    """
+    Errors and requests slower than ``INTERSTELLAR_SERVER_ACCESS_LOG_SLOW_THRESHOLD``
+    are always logged, ``INTERSTELLAR_SERVER_ACCESS_LOG_SAMPLE_RATE`` of the others.
+    """
+    sample_rate = settings.INTERSTELLAR_SERVER_ACCESS_LOG_SAMPLE_RATE
+
+    if sample_rate >= 1 or grpc_status not in (Status.OK, Status.OK.value):
+        return True
+
+    slow_threshold = settings.INTERSTELLAR_SERVER_ACCESS_LOG_SLOW_THRESHOLD
+    if slow_threshold is not None and duration >= slow_threshold:
+        return True
+
+    if random.random() < sample_rate:
+        return True
+
+    suppressed["sampled"] += 1
+    return False
+
+
+def allow_traceback(grpc_status, method_name: str) -> bool:
+    """
+    Whether an error of the method can be logged with its traceback, limited per status
+    and method by ``INTERSTELLAR_SERVER_ACCESS_LOG_TRACEBACK_RATE``.
+    """
+    limit = settings.INTERSTELLAR_SERVER_ACCESS_LOG_TRACEBACK_RATE
+
+    if limit is None:
+        return True
+
+    key = (grpc_status, method_name)
+    try:
+        bucket = buckets[key]
+    except KeyError:
+        bucket = buckets[key] = TokenBucket(limit["rate"], limit.get("burst", limit["rate"]))
+
+    if bucket.take():
+        return True
+
+    suppressed["tracebacks"] += 1
+    return False
+
+
+def access_log_suppressed():
+    """
+    :return: dict with the number of records sampled out and of tracebacks not logged
+    """
+    return dict(suppressed)
+
+
+def reset():
+    buckets.clear()
+    suppressed["sampled"] = 0
+    suppressed["tracebacks"] = 0
@@ -1,8 +1,117 @@
+from collections import OrderedDict
+
+import jwt
+
 from grpclib.exceptions import GRPCError, Status
 
 from insanic.conf import settings
 from insanic.models import User, RequestService
 
+from interstellar.tokens import get_verifier
+
+# kind of identity header -> IdentityCache
+identity_caches = {}
+
+
+def parse_header(value: str, defaults: dict = None) -> dict:
+    """
+    ``k1=v1;k2=v2`` to a dict, updating the defaults.
+    """
+    params = dict(defaults or {})
+
+    for f in value.split(';'):
+        if f:
+            k, v = f.split('=')
+            params[k] = v
+    return params
+
+
+def user_identity(request_user: str):
+    """
+    :return: (parsed header as a tuple of items, error message), the params are None if they are not valid
+    """
+    try:
+        params = parse_header(request_user, {"id": "", "level": -1})
+        User(**params)
+    except (TypeError, ValueError):
+        return None, "Invalid user payload."
+    return tuple(params.items()), None
+
+
+def service_identity(request_service: str):
+    """
+    :return: (parsed header as a tuple of items, error message), the params are None if they are not valid
+    """
+    try:
+        params = parse_header(request_service)
+        service = RequestService(is_authenticated=True, **params)
+    except (TypeError, ValueError):
+        return None, "Invalid service payload."
+
+    if not service.is_valid:
+        return None, f"Invalid request to {settings.SERVICE_NAME}"
+    return tuple(params.items()), None
+
+
+class IdentityCache:
+    """
+    LRU of raw header values to what they identify, including invalid values.
+    Entries are immutable, every request builds its own identity from them
+    because ``User`` and ``RequestService`` are mutable and are handed to the
+    request handler, so sharing them would let one request change another's.
+    Only parsing and validating the headers is saved.
+    """
+
+    def __init__(self, resolve, max_entries: int = 1024):
+        self.resolve = resolve
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, value: str):
+        """
+        :return: (identity, error message) of the header value
+        """
+        try:
+            entry = self.entries[value]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.entries.move_to_end(value)
+            self.hits += 1
+            return entry
+
+        entry = self.resolve(value)
+
+        if self.max_entries:
+            self.entries[value] = entry
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+
+def get_identity_cache(kind: str, resolve):
+    try:
+        return identity_caches[kind]
+    except KeyError:
+        cache = identity_caches[kind] = IdentityCache(resolve, settings.INTERSTELLAR_SERVER_IDENTITY_CACHE_SIZE)
+        return cache
+
+
+def identity_cache_stats():
+    """
+    :return: dict of kind of identity -> dict with the entries, hits and misses
+    """
+    return {
+        kind: {"entries": len(cache.entries), "hits": cache.hits, "misses": cache.misses}
+        for kind, cache in identity_caches.items()
+    }
+
+
+def reset():
+    identity_caches.clear()
+
 
 class GRPCAuthentication:
 
@@ -24,13 +133,7 @@ class GRPCAuthentication:
         except KeyError:
             return None
         else:
-            service_params = {}
-
-            for f in request_service.split(';'):
-                if f:
-                    k, v = f.split('=')
-                    service_params.update({k: v})
-            return service_params
+            return parse_header(request_service)
 
     def get_user(self):
 
@@ -39,31 +142,53 @@ class GRPCAuthentication:
         except KeyError:
             return None
         else:
-            user_params = {"id": "", "level": -1}
-            for f in request_user.split(';'):
-                if f:
-                    k, v = f.split('=')
-                    user_params.update({k: v})
-            return user_params
+            return parse_header(request_user, {"id": "", "level": -1})
 
-    def authenticate(self):
+    def get_service_token(self):
+        try:
+            authorization = self.metadata["authorization"]
+        except KeyError:
+            return None
+        else:
+            prefix, _, token = authorization.partition(' ')
+            return token if prefix.lower() == self.auth_header_prefix else None
 
-        user_params = self.get_user()
-        if user_params is None:
+    def verify_service_token(self, service):
+        """
+        Checks the service token was signed for this service and for the service making the request.
+        """
+        token = self.get_service_token()
+        if not token:
+            self._raise("Service token not found in request.")
+
+        try:
+            claims = get_verifier().verify(token)
+        except jwt.InvalidTokenError:
+            self._raise("Invalid service token.")
+
+        if claims.get("source") != service.source:
+            self._raise("Service token was not issued to the request service.")
+
+    def authenticate(self):
+        request_user = self.metadata.get(settings.INTERNAL_REQUEST_USER_HEADER.lower())
+        if request_user is None:
             self._raise("Request user not found in request.")
 
-        user = User(**user_params)
+        user, error_message = get_identity_cache("user", user_identity).get(request_user)
+        if error_message is not None:
+            self._raise(error_message)
+        user = User(**dict(user))
 
-        service_params = self.get_service()
-        if service_params is None:
+        request_service = self.metadata.get(settings.INTERNAL_REQUEST_SERVICE_HEADER.lower())
+        if request_service is None:
             self._raise("Request service not found in request.")
 
-        try:
-            service = RequestService(is_authenticated=True, **service_params)
-        except TypeError:
-            self._raise("Invalid service payload.")
+        service, error_message = get_identity_cache("service", service_identity).get(request_service)
+        if error_message is not None:
+            self._raise(error_message)
+        service = RequestService(is_authenticated=True, **dict(service))
 
-        if not service.is_valid:
-            self._raise(f"Invalid request to {settings.SERVICE_NAME}")
+        if settings.INTERSTELLAR_SERVER_VERIFY_SERVICE_TOKEN:
+            self.verify_service_token(service)
 
         return user, service
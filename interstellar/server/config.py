@@ -8,3 +8,27 @@ INTERSTELLAR_SERVERS = []
 
 INTERSTELLAR_SERVER_METADATA_USER = "request_user"
 INTERSTELLAR_SERVER_METADATA_SERVICE = "request_service"
+
+# fraction of the successful requests written to the access log, errors are always logged
+INTERSTELLAR_SERVER_ACCESS_LOG_SAMPLE_RATE = 1.0
+# seconds after which successful requests are always logged, None to sample them like the others
+INTERSTELLAR_SERVER_ACCESS_LOG_SLOW_THRESHOLD = None
+# tracebacks logged per grpc status and method, e.g. {"rate": 1, "burst": 10} for one a second
+# with bursts of 10. errors over the limit are logged without their traceback. None to not limit
+INTERSTELLAR_SERVER_ACCESS_LOG_TRACEBACK_RATE = None
+
+# user and service header values whose parsed and validated identities are kept, 0 to not keep them
+INTERSTELLAR_SERVER_IDENTITY_CACHE_SIZE = 1024
+
+# reject requests without a service token for this service that verifies with INTERSTELLAR_SERVICE_TOKEN_VERIFYING_KEY
+INTERSTELLAR_SERVER_VERIFY_SERVICE_TOKEN = False
+# verified service tokens whose claims are kept until they expire
+INTERSTELLAR_SERVER_SERVICE_TOKEN_CACHE_SIZE = 4096
+
+# requests handled at the same time, more are rejected with RESOURCE_EXHAUSTED. None to not limit
+INTERSTELLAR_SERVER_MAX_IN_FLIGHT = None
+# seconds requests can wait for the event loop to start handling them. when every request waited
+# longer for INTERSTELLAR_SERVER_QUEUE_DELAY_INTERVAL seconds, requests are rejected with
+# RESOURCE_EXHAUSTED until one waits less. None to not limit
+INTERSTELLAR_SERVER_QUEUE_DELAY_TARGET = None
+INTERSTELLAR_SERVER_QUEUE_DELAY_INTERVAL = 0.1
@@ -4,6 +4,7 @@ from grpclib.events import RecvRequest, SendInitialMetadata, SendTrailingMetadat
 from grpclib.exceptions import GRPCError, Status
 
 from interstellar.server.authentication import GRPCAuthentication
+from interstellar.utils import set_context_deadline
 
 
 async def raise_grpc_error(stream, e):
@@ -11,6 +12,10 @@ async def raise_grpc_error(stream, e):
 
 
 async def interstellar_server_event_recv_request(event: RecvRequest):
+    if event.deadline is not None:
+        # calls made by the handler have to complete before the caller gives up
+        set_context_deadline(event.deadline)
+
     authentication = GRPCAuthentication(event.metadata)
     try:
         user, service = authentication.authenticate()
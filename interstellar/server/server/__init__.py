@@ -3,6 +3,8 @@ from typing import TYPE_CHECKING, Callable, Any
 from grpclib.protocol import H2Protocol
 from grpclib.server import Handler, Server, _Headers
 
+from interstellar.server.shedding import get_shedder
+
 from .handlers import RequestHandler
 
 if TYPE_CHECKING:
@@ -18,12 +20,18 @@ class InterstellarHandler(Handler):
             release_stream: Callable[[], Any],
     ) -> None:
         self.__gc_step__()
+        shedder = get_shedder()
+        # decided now, streams read together are all accepted before any of them starts
+        shed = shedder.accept() if shedder is not None else None
         handler = RequestHandler(self.mapping, stream, headers, self.codec,
-                                 self.dispatch, release_stream)
-        self._tasks[stream] = self.loop.create_task(
+                                 self.dispatch, release_stream, shedder=shedder, shed=shed)
+        task = self._tasks[stream] = self.loop.create_task(
             handler.handle()
         )
 
+        if shedder is not None and shed is None:
+            task.add_done_callback(shedder.done)
+
 
 class GRPCServer(Server):
 
@@ -1,5 +1,6 @@
 import asyncio
-from typing import Dict, Callable, Any, Optional, TYPE_CHECKING, Type
+import time
+from typing import Dict, Callable, Any, Optional, TYPE_CHECKING, Type, cast
 
 from aiohttp.web_protocol import RequestHandler
 from grpclib.compat import nullcontext
@@ -8,19 +9,24 @@ from grpclib.encoding.base import CodecBase, GRPC_CONTENT_TYPE
 from grpclib.encoding.proto import ProtoCodec
 from grpclib.events import _DispatchServerEvents
 from grpclib.exceptions import StreamTerminatedError, ProtocolError
-from grpclib.metadata import Deadline, decode_metadata, _MetadataLike
+from grpclib.metadata import Deadline, decode_metadata, encode_metadata, _MetadataLike, _Metadata
 from grpclib.server import Stream, _Headers
 from grpclib.stream import _RecvType, _SendType
 from grpclib.utils import DeadlineWrapper, Wrapper
+from multidict import MultiDict
 
 from insanic import status as http_status
 from insanic.conf import settings
 from insanic.exceptions import APIException
 from insanic.log import error_logger
 
+from interstellar.compression import ACCEPT_ENCODING, GZIP, IDENTITY, accepts, get_threshold, recv_message, \
+    send_message
 from interstellar.exceptions import InterstellarError
 from interstellar.logging import interstellar_access_log
+from interstellar.server.access_log import allow_traceback, should_log
 from interstellar.server.exceptions import InterstellarAbort
+from interstellar.server.shedding import LoadShedder
 
 if TYPE_CHECKING:
     from grpclib import const, protocol  # noqa
@@ -60,6 +66,61 @@ class InterstellarServerStream(Stream):
             dispatch=dispatch,
             deadline=deadline
         )
+        # replies at least this many bytes long are gzip compressed, if the client accepts them
+        self._compress_threshold = get_threshold(method_name) \
+            if accepts(request_handler.headers_map.get('grpc-accept-encoding')) else None
+
+    async def recv_message(self) -> Optional[_RecvType]:
+        """
+        :meth:`grpclib.server.Stream.recv_message` that decompresses requests
+        """
+        message = await recv_message(self._stream, self._codec, self._recv_type,
+                                     self.request_handler.headers_map.get('grpc-encoding'))
+        if message is not None:
+            message, = await self._dispatch.recv_message(message)
+            return message
+        else:
+            return None
+
+    async def send_initial_metadata(self, *, metadata: Optional[_MetadataLike] = None) -> None:
+        """
+        :meth:`grpclib.server.Stream.send_initial_metadata` with the grpc-encoding header
+        when replies are compressed.
+        """
+        if self._send_initial_metadata_done:
+            raise ProtocolError('Initial metadata was already sent')
+
+        headers = [
+            (':status', '200'),
+            ('content-type', self._content_type),
+            ('grpc-accept-encoding', ACCEPT_ENCODING),
+        ]
+        if self._compress_threshold is not None:
+            headers.append(('grpc-encoding', GZIP))
+
+        metadata = MultiDict(metadata or ())
+        metadata, = await self._dispatch.send_initial_metadata(metadata)
+        headers.extend(encode_metadata(cast(_Metadata, metadata)))
+
+        await self._stream.send_headers(headers)
+        self._send_initial_metadata_done = True
+
+    async def send_message(self, message: _SendType) -> None:
+        """
+        :meth:`grpclib.server.Stream.send_message` that compresses large replies
+        of methods in ``INTERSTELLAR_COMPRESSED_METHODS``.
+        """
+        if not self._send_initial_metadata_done:
+            await self.send_initial_metadata()
+
+        if not self._cardinality.server_streaming:
+            if self._send_message_done:
+                raise ProtocolError('Message was already sent')
+
+        message, = await self._dispatch.send_message(message)
+        await send_message(self._stream, self._codec, message, self._send_type,
+                           threshold=self._compress_threshold)
+        self._send_message_done = True
 
     async def send_trailing_metadata(
             self,
@@ -75,11 +136,24 @@ class InterstellarServerStream(Stream):
         self.request_handler._log_access(status_message)
 
 
+def access_log_template(headers_map: Dict[str, str], stream_id: int) -> dict:
+    """
+    The parts of the access log extra of a stream known from its headers,
+    the statuses are added when the stream is logged.
+    """
+    log_extra = {k[1:]: v for k, v in headers_map.items() if k.startswith(":")}
+    log_extra["host"] = log_extra.get('authority', '?')
+    log_extra["request_service"] = headers_map.get(settings.INTERNAL_REQUEST_SERVICE_HEADER, "?")
+    log_extra["correlation_id"] = headers_map.get(settings.REQUEST_ID_HEADER_FIELD, "?")
+    log_extra["stream_id"] = stream_id
+    return log_extra
+
+
 class RequestHandler:
     __slots__ = ('mapping', 'h2_stream', 'headers', 'headers_map',
                  'codec', 'dispatch', 'release_stream', 'metadata',
                  'deadline', 'method_name', 'method', 'content_type',
-                 'h2_status', 'grpc_status', 'message')
+                 'h2_status', 'grpc_status', 'message', 'log_extra', 'started_at', 'shedder', 'shed')
 
     def __init__(self,
                  mapping: Dict[str, 'const.Handler'],
@@ -87,7 +161,10 @@ class RequestHandler:
                  headers: _Headers,
                  codec: CodecBase,
                  dispatch: _DispatchServerEvents,
-                 release_stream: Callable[[], Any]) -> None:
+                 release_stream: Callable[[], Any],
+                 *,
+                 shedder: Optional[LoadShedder] = None,
+                 shed: Optional[InterstellarAbort] = None) -> None:
 
         self.mapping = mapping
         self.h2_stream = _stream
@@ -106,10 +183,22 @@ class RequestHandler:
         self.h2_status = None
         self.grpc_status = None
         self.message = ''
+        self.log_extra = access_log_template(self.headers_map, _stream.id)
+        # when the request was accepted, before waiting for the event loop
+        self.started_at = time.monotonic()
+        self.shedder = shedder
+        # the abort to respond with when the request was shed as it was accepted
+        self.shed = shed
 
     async def handle(self):
 
         try:
+            # before anything else is done with the request
+            if self.shed is not None:
+                raise self.shed
+            if self.shedder is not None:
+                self.shedder.admit(self.started_at)
+
             self._verify_protocol()
             self.metadata = decode_metadata(self.headers)
             await self._handle_request(self.metadata)
@@ -133,33 +222,25 @@ class RequestHandler:
             self.release_stream()
 
     def _log_access(self, message: Optional[str] = "", exc_info: Optional[Exception] = None):
-        log_extra = {}
-        for k, v in self.headers_map.items():
-            if k.startswith(":"):
-                log_extra.update({k[1:]: v})
-
-        log_extra.update({"host": log_extra.get('authority', '?')})
-
-        log_extra.update({"status": self.h2_status or http_status.HTTP_500_INTERNAL_SERVER_ERROR})
+        log_extra = self.log_extra
+        log_extra["status"] = self.h2_status or http_status.HTTP_500_INTERNAL_SERVER_ERROR
 
         grpc_status = self.grpc_status or Status.UNKNOWN
 
         if isinstance(grpc_status, Status):
             grpc_status = grpc_status.value
 
-        log_extra.update({"grpc_status": grpc_status})
+        if not should_log(grpc_status, time.monotonic() - self.started_at):
+            return
 
-        log_extra.update({"request_service": self.headers_map.get(settings.INTERNAL_REQUEST_SERVICE_HEADER, "?")})
-        log_extra.update({"correlation_id": self.headers_map.get(settings.REQUEST_ID_HEADER_FIELD, "?")})
-        log_extra.update({"stream_id": self.h2_stream.id})
-        try:
-            log_extra.update({"deadline": self.deadline})
-        except AttributeError:
-            log_extra.update({"deadline": "0"})
+        log_extra["grpc_status"] = grpc_status
+        log_extra["deadline"] = self.deadline
 
         message = message or self.message
 
         if exc_info:
+            if not allow_traceback(grpc_status, self.method_name):
+                exc_info = None
             interstellar_access_log.error(message, extra=log_extra, exc_info=exc_info)
         else:
             interstellar_access_log.info(message, extra=log_extra)
@@ -170,6 +251,9 @@ class RequestHandler:
                      grpc_message: Optional[str] = None, ) -> None:
 
         headers = [(':status', str(h2_status))]
+        if h2_status == 200:
+            # a grpc response, clients check its content type before its status
+            headers.append(('content-type', f"{GRPC_CONTENT_TYPE}+{self.codec.__content_subtype__}"))
         if grpc_status is not None:
             headers.append(('grpc-status', str(grpc_status.value)))
         if grpc_message is not None:
@@ -197,6 +281,10 @@ class RequestHandler:
             raise InterstellarAbort(415, Status.UNKNOWN,
                                     'Unacceptable content-type header')
 
+        if self.headers_map.get('grpc-encoding', IDENTITY) not in (IDENTITY, GZIP):
+            raise InterstellarAbort(200, Status.UNIMPLEMENTED,
+                                    f'Unsupported grpc-encoding, supported encodings are {ACCEPT_ENCODING}')
+
         if self.headers_map.get('te') != 'trailers':
             raise InterstellarAbort(400, Status.UNKNOWN,
                                     'Required "te: trailers" header is missing')
@@ -0,0 +1,106 @@
+import time
+
+from typing import Optional
+
+from grpclib.const import Status
+
+from insanic.conf import settings
+
+from interstellar.server.exceptions import InterstellarAbort
+
+# LoadShedder of the server, made on first use. False when shedding is not configured
+shedder = None
+
+
+class LoadShedder:
+    """
+    Rejects requests before they are handled when the server is overloaded:
+    when more than ``max_in_flight`` requests are being handled, or when the
+    time requests waited for the event loop to start handling them stayed
+    above ``target`` seconds for ``interval`` seconds (CoDel).
+    """
+    __slots__ = ('max_in_flight', 'target', 'interval', 'in_flight', 'first_above_at', 'shed_in_flight',
+                 'shed_queue_delay')
+
+    def __init__(self, max_in_flight: Optional[int] = None, target: Optional[float] = None, interval: float = 0.1):
+        self.max_in_flight = max_in_flight
+        self.target = target
+        self.interval = interval
+
+        # requests admitted and not done, including the ones not started yet
+        self.in_flight = 0
+        # when the queue delay will have been above the target for an interval, 0 when it is below
+        self.first_above_at = 0
+        self.shed_in_flight = 0
+        self.shed_queue_delay = 0
+
+    def accept(self) -> Optional[InterstellarAbort]:
+        """
+        Decides when a stream is accepted, before any of the streams received with it
+        start, whether there is room for it.
+
+        :return: the abort to respond with if the request should not be handled,
+            otherwise the request is counted in flight until :meth:`done`
+        """
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            self.shed_in_flight += 1
+            return InterstellarAbort(200, Status.RESOURCE_EXHAUSTED, "Too many requests in flight.")
+
+        self.in_flight += 1
+        return None
+
+    def done(self, task=None) -> None:
+        self.in_flight -= 1
+
+    def admit(self, accepted_at: float) -> None:
+        """
+        Checks how long an accepted request waited for the event loop to start handling it.
+
+        :param accepted_at: when the request was accepted
+        :raises InterstellarAbort: with RESOURCE_EXHAUSTED if the request should not be handled
+        """
+        if self.target is None:
+            return
+
+        now = time.monotonic()
+
+        if now - accepted_at < self.target:
+            self.first_above_at = 0
+        elif not self.first_above_at:
+            self.first_above_at = now + self.interval
+        elif now >= self.first_above_at:
+            self.shed_queue_delay += 1
+            raise InterstellarAbort(200, Status.RESOURCE_EXHAUSTED, "Requests are waiting too long.")
+
+
+def get_shedder() -> Optional[LoadShedder]:
+    """
+    :return: the LoadShedder configured by ``INTERSTELLAR_SERVER_MAX_IN_FLIGHT`` and
+        ``INTERSTELLAR_SERVER_QUEUE_DELAY_TARGET``, None if neither is set
+    """
+    global shedder
+
+    if shedder is None:
+        max_in_flight = settings.INTERSTELLAR_SERVER_MAX_IN_FLIGHT
+        target = settings.INTERSTELLAR_SERVER_QUEUE_DELAY_TARGET
+
+        if max_in_flight is None and target is None:
+            shedder = False
+        else:
+            shedder = LoadShedder(max_in_flight, target, settings.INTERSTELLAR_SERVER_QUEUE_DELAY_INTERVAL)
+    return shedder or None
+
+
+def shedding_stats():
+    """
+    :return: dict with the requests in flight and the ones shed because of either limit
+    """
+    if not shedder:
+        return {"in_flight": 0, "shed_in_flight": 0, "shed_queue_delay": 0}
+    return {"in_flight": shedder.in_flight, "shed_in_flight": shedder.shed_in_flight,
+            "shed_queue_delay": shedder.shed_queue_delay}
+
+
+def reset():
+    global shedder
+    shedder = None
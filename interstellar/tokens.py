@@ -0,0 +1,99 @@
+import time
+
+from collections import OrderedDict
+
+import jwt
+
+from insanic.conf import settings
+
+# TokenVerifier of the server, made on first use
+verifier = None
+
+
+def encode_service_token(source: str, aud: str, lifetime: float, now: float = None):
+    """
+    Signs a token for calls from the source service to the aud service
+    with ``INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY``.
+
+    :param now: seconds since the epoch the lifetime starts at, ``time.time()`` if None
+    :return: (token, exp)
+    """
+    if now is None:
+        now = time.time()
+    exp = int(now + lifetime)
+    token = jwt.encode({"source": source, "aud": aud, "exp": exp}, settings.INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY,
+                       algorithm=settings.INTERSTELLAR_SERVICE_TOKEN_ALGORITHM)
+
+    if isinstance(token, bytes):
+        # PyJWT < 2
+        token = token.decode()
+    return token, exp
+
+
+class TokenVerifier:
+    """
+    Verifies service tokens, keeping the claims of the last ``max_entries`` verified
+    tokens until they expire so each token is only verified once.
+    """
+
+    def __init__(self, key, algorithm: str, audience: str, max_entries: int = 4096):
+        self.key = key
+        self.algorithm = algorithm
+        self.audience = audience
+        self.max_entries = max_entries
+        # token -> (exp, claims)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def verify(self, token: str) -> dict:
+        """
+        :return: the claims of the token
+        :raises jwt.InvalidTokenError: if the token is not valid
+        """
+        try:
+            exp, claims = self.entries[token]
+        except KeyError:
+            pass
+        else:
+            if exp > time.time():
+                self.entries.move_to_end(token)
+                self.hits += 1
+                return claims
+            del self.entries[token]
+
+        self.misses += 1
+        claims = jwt.decode(token, self.key, algorithms=[self.algorithm], audience=self.audience)
+
+        if "exp" not in claims:
+            raise jwt.MissingRequiredClaimError("exp")
+
+        if self.max_entries:
+            self.entries[token] = (claims["exp"], claims)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return claims
+
+
+def get_verifier() -> TokenVerifier:
+    global verifier
+
+    if verifier is None:
+        verifier = TokenVerifier(settings.INTERSTELLAR_SERVICE_TOKEN_VERIFYING_KEY,
+                                 settings.INTERSTELLAR_SERVICE_TOKEN_ALGORITHM, settings.SERVICE_NAME,
+                                 settings.INTERSTELLAR_SERVER_SERVICE_TOKEN_CACHE_SIZE)
+    return verifier
+
+
+def token_cache_stats():
+    """
+    :return: dict with the tokens kept, and the verifications that used them or had to verify the token
+    """
+    if verifier is None:
+        return {"entries": 0, "hits": 0, "misses": 0}
+    return {"entries": len(verifier.entries), "hits": verifier.hits, "misses": verifier.misses}
+
+
+def reset():
+    global verifier
+    verifier = None
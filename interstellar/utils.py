@@ -1,7 +1,41 @@
+import aiotask_context
+
 from importlib import import_module
 
+from insanic.conf import settings
+
 
 def load_class(kls):
     parts = kls.rsplit('.', 1)
     m = import_module(parts[0])
     return getattr(m, parts[-1])
+
+
+def get_context_deadline():
+    """
+    :return: the :class:`grpclib.metadata.Deadline` of the request being handled by the current task, if any
+    """
+    try:
+        return aiotask_context.get(settings.TASK_CONTEXT_DEADLINE, None)
+    except ValueError:
+        # not in a task
+        return None
+
+
+def set_context_deadline(deadline) -> None:
+    """
+    Sets the deadline of the request being handled by the current task, outbound calls made
+    while handling it have to complete before it.
+    """
+    aiotask_context.set(settings.TASK_CONTEXT_DEADLINE, deadline)
+
+
+def detach_context_deadline(task) -> None:
+    """
+    Gives a task made by the current task its own context without the deadline
+    of the request being handled, so calls it makes are not limited by it.
+    """
+    context = getattr(task, 'context', None)
+
+    if context is not None and context.get(settings.TASK_CONTEXT_DEADLINE) is not None:
+        task.context = {key: value for key, value in context.items() if key != settings.TASK_CONTEXT_DEADLINE}
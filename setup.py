@@ -18,7 +18,9 @@ requirements = [
     'grpclib==0.3.0',
     'grpcio-tools',
     'googleapis-common-protos',
-    'protobuf'
+    'protobuf',
+    'pyjwt',
+    'importlib_metadata; python_version < "3.8"',
 ]
 
 setup_requirements = ['pytest-runner', ]
@@ -32,12 +34,19 @@ test_requirements = [
     "pytest-sanic",
     "pytest-sugar",
     "pytest-xdist",
+    "numpy",
+    "cryptography",
 ]
 
 docs_requirements = ['sphinx', 'sphinx_rtd_theme']
 
 cli_requirements = ['Click>=6.0']
 
+columnar_requirements = ['numpy']
+
+# service tokens signed with RS256 or ES256
+tokens_requirements = ['pyjwt[crypto]']
+
 release_requirements = ['zest.releaser[recommended]', 'flake8']
 
 setup(
@@ -68,6 +77,8 @@ setup(
     extras_require={
         "development": test_requirements + docs_requirements + cli_requirements + release_requirements,
         "cli": cli_requirements,
+        "columnar": columnar_requirements,
+        "tokens": tokens_requirements,
         "docs": docs_requirements
     },
     test_suite='tests',
@@ -7,12 +7,14 @@ from insanic.exceptions import ImproperlyConfigured
 from insanic.services import Service
 
 from interstellar.client import InterstellarClient
+from interstellar.client import config as client_config
 
 
 class TestBindService:
 
     @pytest.fixture(autouse=True)
     def clean_service_class(self):
+        InterstellarClient._load_config(settings, client_config)
         yield
 
         InterstellarClient.unbind_grpc_interface()
@@ -52,6 +54,51 @@ class TestBindService:
             assert method
             assert isinstance(method, ServiceMethod)
 
+    def test_bound_stubs_are_reused(self):
+        service = Service('test')
+
+        InterstellarClient.bind_grpc_interface()
+        InterstellarClient.client_registration()
+
+        with service.grpc("monkey", "v1", "ApeService") as stub:
+            pass
+        with service.grpc("monkey", "v1", "ApeService") as same_stub:
+            pass
+        with service.grpc("monkey", "v1", "ApeService", message_mode="raw") as raw_stub:
+            pass
+
+        assert same_stub is stub
+        assert raw_stub is not stub
+        assert raw_stub.GetChimpanzee.channel.options == {"message_mode": "raw"}
+
+        # closed channels drop their stubs
+        stub.GetChimpanzee.channel.close()
+        assert stub.GetChimpanzee.channel.stubs == {}
+
+        with service.grpc("monkey", "v1", "ApeService") as new_stub:
+            pass
+        assert new_stub is not stub
+
+    def test_bind_with_attributes(self):
+        service = Service('test')
+
+        InterstellarClient.bind_grpc_interface()
+        InterstellarClient.client_registration()
+
+        method = service.grpc.monkey.v1.ApeService.GetChimpanzee
+
+        assert method is service.grpc.monkey.v1.ApeServiceStub.GetChimpanzee
+        # methods are bound to the service instance they were read from
+        other = Service('test')
+        assert other.grpc.monkey.v1.ApeService.GetChimpanzee.service is other
+        assert isinstance(method.get_method(), ServiceMethod)
+
+        with pytest.raises(ImproperlyConfigured):
+            service.grpc.monkey.v1.ApeService.GetOrangutan
+
+        with pytest.raises(ImproperlyConfigured):
+            service.grpc.monkey.v3.ApeService.GetChimpanzee
+
     def test_bind_error(self):
         service = Service('test')
 
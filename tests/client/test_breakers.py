@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+
+from grpclib.const import Cardinality, Status
+from grpclib.exceptions import GRPCError, StreamTerminatedError
+
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest, ApeResponse
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar import config as common_config
+from interstellar.client import InterstellarClient, breakers, config as client_config
+from interstellar.client.breakers import CircuitBreaker, breaker_stats, get_breaker, is_failure
+from interstellar.client.channels import InterstellarChannel
+from interstellar.exceptions import UnavailableError
+
+
+@pytest.fixture(autouse=True)
+def load_client_config():
+    InterstellarClient._load_config(settings, common_config)
+    InterstellarClient._load_config(settings, client_config)
+    breakers.reset()
+    yield
+    breakers.reset()
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(breakers.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(GRPCError(Status.UNAVAILABLE))
+
+
+def succeed(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(None)
+
+
+class TestIsFailure:
+
+    @pytest.mark.parametrize("error", [
+        GRPCError(Status.UNAVAILABLE),
+        GRPCError(Status.DEADLINE_EXCEEDED),
+        UnavailableError(),
+        asyncio.TimeoutError(),
+        ConnectionRefusedError(),
+        StreamTerminatedError(),
+    ])
+    def test_failures(self, error):
+        assert is_failure(error)
+
+    @pytest.mark.parametrize("error", [None, GRPCError(Status.NOT_FOUND), GRPCError(Status.INVALID_ARGUMENT)])
+    def test_answers(self, error):
+        assert not is_failure(error)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_failure_rate(self, clock):
+        breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4)
+
+        succeed(breaker, 2)
+        fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(UnavailableError):
+            breaker.before_call()
+        assert breaker.rejected == 1
+
+    def test_needs_min_calls(self, clock):
+        breaker = CircuitBreaker("test", min_calls=10)
+
+        fail(breaker, 9)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_old_calls_leave_the_window(self, clock):
+        breaker = CircuitBreaker("test", failure_rate=0.5, min_calls=4, window=10)
+
+        fail(breaker, 3)
+        clock[0] += 11
+        succeed(breaker, 3)
+        fail(breaker, 1)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert len(breaker.calls) == 4
+        assert breaker.failures == 1
+
+    def test_half_open_closes_after_probes(self, clock):
+        breaker = CircuitBreaker("test", min_calls=1, reset_timeout=30, half_open_calls=2)
+        fail(breaker, 1)
+
+        clock[0] += 31
+        breaker.before_call()
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        # only half_open_calls probes at a time
+        with pytest.raises(UnavailableError):
+            breaker.before_call()
+
+        breaker.record(None)
+        breaker.record(None)
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.before_call()
+
+    def test_half_open_reopens_on_failure(self, clock):
+        breaker = CircuitBreaker("test", min_calls=1, reset_timeout=30)
+        fail(breaker, 1)
+
+        clock[0] += 31
+        fail(breaker, 1)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(UnavailableError):
+            breaker.before_call()
+
+    def test_cancelled_probe_is_released(self, clock):
+        breaker = CircuitBreaker("test", min_calls=1, half_open_calls=1)
+        fail(breaker, 1)
+
+        clock[0] += 31
+        breaker.before_call()
+        breaker.record(asyncio.CancelledError())
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+class TestGetBreaker:
+
+    def test_disabled_by_default(self):
+        assert get_breaker("test") is None
+        assert breaker_stats() == {}
+
+    def test_per_service_options(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CIRCUIT_BREAKER_OPTIONS',
+                            {"test": {"enabled": True, "min_calls": 5}})
+
+        breaker = get_breaker("test")
+        assert breaker.min_calls == 5
+        assert breaker.failure_rate == settings.INTERSTELLAR_CLIENT_CIRCUIT_BREAKER['failure_rate']
+        assert get_breaker("test") is breaker
+        assert get_breaker("other") is None
+        assert breaker_stats() == {"test": {"state": "closed", "calls": 0, "failures": 0, "rejected": 0}}
+
+    def test_invalid_options(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CIRCUIT_BREAKER_OPTIONS',
+                            {"test": {"enabled": True, "threshold": 5}})
+
+        with pytest.raises(ImproperlyConfigured):
+            get_breaker("test")
+
+
+class TestChannelBreaker:
+
+    async def test_open_breaker_fails_fast(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CIRCUIT_BREAKER_OPTIONS',
+                            {"test": {"enabled": True, "min_calls": 1}})
+        channel = InterstellarChannel(host="127.0.0.1", port=1, service_name="test")
+
+        async def call():
+            async with channel.request("/test.v1.ApeService/GetChimpanzee", Cardinality.UNARY_UNARY,
+                                       ApeRequest, ApeResponse, timeout=1) as stream:
+                await stream.send_message(ApeRequest(id="1"), end=True)
+
+        # nothing is listening on the port
+        with pytest.raises(OSError):
+            await call()
+        assert channel.breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(UnavailableError):
+            await call()
+        assert channel.breaker.rejected == 1
+        channel.close()
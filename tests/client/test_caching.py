@@ -0,0 +1,111 @@
+import pytest
+
+from google.protobuf import timestamp_pb2
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.client import caching
+from interstellar.client.caching import ResponseCache, cache_stats, get_cache
+
+
+class TestResponseCache:
+
+    @pytest.fixture()
+    def now(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(caching.time, "monotonic", lambda: now[0])
+        return now
+
+    def test_hit_and_miss(self, now):
+        cache = ResponseCache(ttl=10)
+
+        assert cache.get("key") is None
+        cache.set("key", timestamp_pb2.Timestamp(seconds=5))
+
+        first = cache.get("key")
+        second = cache.get("key")
+
+        assert first == timestamp_pb2.Timestamp(seconds=5)
+        # every hit gets its own message
+        assert first is not second
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_expiration(self, now):
+        cache = ResponseCache(ttl=10)
+        cache.set("key", timestamp_pb2.Timestamp(seconds=5))
+
+        now[0] += 10
+
+        assert cache.get("key") is None
+        assert cache.expirations == 1
+        assert len(cache) == 0
+        assert cache.size == 0
+
+    def test_lru_eviction(self, now):
+        cache = ResponseCache(ttl=10, max_entries=2)
+
+        cache.set("a", timestamp_pb2.Timestamp(seconds=1))
+        cache.set("b", timestamp_pb2.Timestamp(seconds=2))
+        cache.get("a")
+        cache.set("c", timestamp_pb2.Timestamp(seconds=3))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.evictions == 1
+
+    def test_byte_budget(self, now):
+        reply = timestamp_pb2.Timestamp(seconds=1000, nanos=1000)
+        size = len(reply.SerializeToString())
+        cache = ResponseCache(ttl=10, max_bytes=size * 2)
+
+        for key in "abc":
+            cache.set(key, reply)
+
+        assert len(cache) == 2
+        assert cache.size == size * 2
+        assert cache.evictions == 1
+
+        # bigger than the whole budget
+        small = ResponseCache(ttl=10, max_bytes=1)
+        small.set("too big", reply)
+        assert len(small) == 0
+
+    def test_set_keeps_fresh_entry(self, now):
+        cache = ResponseCache(ttl=10)
+        cache.set("key", timestamp_pb2.Timestamp(seconds=1))
+        cache.set("key", timestamp_pb2.Timestamp(seconds=2))
+
+        assert cache.get("key").seconds == 1
+
+
+class TestGetCache:
+
+    @pytest.fixture(autouse=True)
+    def reset_caches(self):
+        caching.reset()
+        yield
+        caching.reset()
+
+    def test_get_cache(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CACHED_METHODS',
+                            {"test.monkey.v1.ApeService.GetChimpanzee": {"ttl": 5, "max_entries": 10}},
+                            raising=False)
+
+        cache = get_cache(("test", "monkey", "v1", "ApeServiceStub", "GetChimpanzee"))
+
+        assert cache.ttl == 5
+        assert cache.max_entries == 10
+        assert get_cache(("test", "monkey", "v1", "ApeServiceStub", "GetChimpanzee")) is cache
+        assert get_cache(("test", "monkey", "v1", "ApeServiceStub", "GetGorilla")) is None
+        assert cache_stats() == {"test.monkey.v1.ApeServiceStub.GetChimpanzee": {
+            "hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "entries": 0, "bytes": 0
+        }}
+
+    def test_bad_options(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CACHED_METHODS',
+                            {"test.monkey.v1.ApeService.GetChimpanzee": {"seconds": 5}}, raising=False)
+
+        with pytest.raises(ImproperlyConfigured):
+            get_cache(("test", "monkey", "v1", "ApeServiceStub", "GetChimpanzee"))
@@ -0,0 +1,288 @@
+import aiotask_context
+import pytest
+import socket
+
+from types import SimpleNamespace
+
+from grpclib.const import Cardinality
+from grpclib.metadata import Deadline
+
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest, ApeResponse
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar import config as common_config
+from interstellar.client import InterstellarClient, config as client_config
+from interstellar.client.app import set_request_deadline
+from interstellar.client.channels import ChannelPool, ChannelGroup, InterstellarChannel, select_least_in_flight, \
+    select_power_of_two, select_random
+from interstellar.exceptions import DeadlineExceededError
+from interstellar.utils import get_context_deadline, set_context_deadline
+
+
+@pytest.fixture(autouse=True)
+def load_client_config():
+    InterstellarClient._load_config(settings, common_config)
+    InterstellarClient._load_config(settings, client_config)
+
+
+ENDPOINT = ('test', '127.0.0.1', 8000)
+
+
+def fake_channels(*in_flight):
+    return [SimpleNamespace(in_flight=i) for i in in_flight]
+
+
+class TestChannelSelection:
+
+    def test_select_random(self):
+        channels = fake_channels(3, 0, 5)
+
+        for _ in range(20):
+            assert select_random(channels) in channels
+
+    def test_select_least_in_flight(self):
+        channels = fake_channels(3, 0, 5, 1)
+
+        assert select_least_in_flight(channels) is channels[1]
+
+    def test_select_power_of_two(self):
+        channels = fake_channels(1, 9)
+
+        for _ in range(20):
+            assert select_power_of_two(channels) is channels[0]
+
+    def test_select_power_of_two_single_channel(self):
+        channels = fake_channels(4)
+
+        assert select_power_of_two(channels) is channels[0]
+
+    @pytest.mark.parametrize("strategy", ("random", "least_in_flight", "power_of_two"))
+    def test_pool_uses_configured_strategy(self, monkeypatch, strategy):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_COUNT', 2, raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_MIN_COUNT', 2, raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_SELECTION', strategy, raising=False)
+
+        first = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        second = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+
+        first.in_flight = 10
+
+        chosen = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        assert chosen in (first, second)
+
+        if strategy != "random":
+            assert chosen is second
+
+    def test_pool_unknown_strategy(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_COUNT', 1, raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_SELECTION', 'round_robin', raising=False)
+
+        with pytest.raises(ImproperlyConfigured):
+            ChannelPool.get_channel('test', '127.0.0.1', 8000)
+
+
+class TestChannelGroupSizing:
+
+    @pytest.fixture()
+    def pool_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_COUNT', 3, raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_MIN_COUNT', 1, raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_STREAM_THRESHOLD', 2, raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_IDLE_TIMEOUT', 60, raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_POOL_OPTIONS', {}, raising=False)
+
+    def test_reuses_channel_below_threshold(self, pool_settings):
+        first = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        first.in_flight = 1
+
+        assert ChannelPool.get_channel('test', '127.0.0.1', 8000) is first
+        assert len(ChannelPool.channels[ENDPOINT]) == 1
+
+    def test_grows_when_saturated(self, pool_settings):
+        first = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        first.in_flight = 2
+
+        second = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        assert second is not first
+        assert len(ChannelPool.channels[ENDPOINT]) == 2
+
+    def test_does_not_grow_past_max(self, pool_settings):
+        for _ in range(3):
+            channel = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+            channel.in_flight = 5
+
+        assert len(ChannelPool.channels[ENDPOINT]) == 3
+
+        channel = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        assert channel in ChannelPool.channels[ENDPOINT].channels
+        assert len(ChannelPool.channels[ENDPOINT]) == 3
+
+    def test_excluded_channel(self, pool_settings):
+        first = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+
+        # another channel is opened rather than picking the excluded one
+        second = ChannelPool.get_channel('test', '127.0.0.1', 8000, exclude=first)
+        assert second is not first
+        assert ChannelPool.get_channel('test', '127.0.0.1', 8000, exclude=second) is first
+
+    def test_excluded_channel_at_max(self, pool_settings, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_COUNT', 1, raising=False)
+        first = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+
+        assert ChannelPool.get_channel('test', '127.0.0.1', 8000, exclude=first) is first
+
+    def test_sweep_closes_idle_channels(self, pool_settings):
+        group = ChannelGroup('test', '127.0.0.1', 8000)
+        busy, idle, recent = group.open_channel(), group.open_channel(), group.open_channel()
+
+        now = idle.last_used + 120
+        busy.in_flight = 1
+        busy.last_used = now - 120
+        recent.last_used = now - 1
+
+        group.sweep(now)
+
+        assert group.channels == [busy, recent]
+
+    def test_sweep_keeps_min_count(self, pool_settings, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_MIN_COUNT', 2, raising=False)
+
+        group = ChannelGroup('test', '127.0.0.1', 8000)
+        channels = [group.open_channel() for _ in range(3)]
+
+        group.sweep(max(c.last_used for c in channels) + 120)
+
+        assert len(group) == 2
+
+    def test_per_service_options(self, pool_settings, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_POOL_OPTIONS',
+                            {"test": {"min_count": 2, "max_count": 5}}, raising=False)
+
+        group = ChannelGroup('test', '127.0.0.1', 8000)
+        assert group.min_count == 2
+        assert group.max_count == 5
+        assert group.stream_threshold == 2
+
+        other = ChannelGroup('other', '127.0.0.1', 8000)
+        assert other.min_count == 1
+        assert other.max_count == 3
+
+    def test_invalid_options(self, pool_settings, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_POOL_OPTIONS',
+                            {"test": {"min_count": 4}}, raising=False)
+
+        with pytest.raises(ImproperlyConfigured):
+            ChannelGroup('test', '127.0.0.1', 8000)
+
+
+class TestChannelPoolEndpoints:
+
+    @pytest.fixture()
+    def addresses(self, monkeypatch):
+        resolved = {"test.local": ["10.0.0.1", "10.0.0.2"]}
+
+        def getaddrinfo(host, port, *args, **kwargs):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (a, port)) for a in resolved[host]]
+
+        monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+        return resolved
+
+    def test_spreads_across_addresses(self, addresses):
+        hosts = set()
+        for _ in range(50):
+            channel = ChannelPool.get_channel('test', 'test.local', 8000)
+            channel.in_flight += 1
+            hosts.add(channel._host)
+
+        assert hosts == {"10.0.0.1", "10.0.0.2"}
+        assert ('test', '10.0.0.1', 8000) in ChannelPool.channels
+        assert ('test', '10.0.0.2', 8000) in ChannelPool.channels
+
+    def test_excluded_channel_prefers_other_address(self, addresses):
+        first = ChannelPool.get_channel('test', 'test.local', 8000)
+
+        for _ in range(10):
+            assert ChannelPool.get_channel('test', 'test.local', 8000, exclude=first)._host != first._host
+
+    def test_port_change_retires_endpoint(self, addresses):
+        old = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        old.in_flight = 1
+
+        new = ChannelPool.get_channel('test', '127.0.0.1', 9000)
+
+        assert new is not old
+        assert new._port == 9000
+        assert ('test', '127.0.0.1', 8000) not in ChannelPool.channels
+        assert len(ChannelPool.retired) == 1
+
+        # still has a stream open, so it is kept until that finishes
+        ChannelPool.get_channel('test', '127.0.0.1', 9000)
+        assert len(ChannelPool.retired) == 1
+
+        old.in_flight = 0
+        ChannelPool.get_channel('test', '127.0.0.1', 9000)
+        assert ChannelPool.retired == []
+
+    def test_services_are_pooled_separately(self, addresses):
+        first = ChannelPool.get_channel('test', '127.0.0.1', 8000)
+        second = ChannelPool.get_channel('other', '127.0.0.1', 8000)
+
+        assert first is not second
+
+
+class TestDeadlinePropagation:
+
+    @pytest.fixture()
+    def run_in_task(self, loop):
+        loop.set_task_factory(aiotask_context.chainmap_task_factory)
+
+        def run(coroutine):
+            return loop.create_task(coroutine)
+        return run
+
+    def request(self, **kwargs):
+        channel = InterstellarChannel(host="127.0.0.1", port=8000)
+        return channel.request("/test.v1.ApeService/GetChimpanzee", Cardinality.UNARY_UNARY,
+                               ApeRequest, ApeResponse, **kwargs)
+
+    async def test_without_context_deadline(self, run_in_task):
+        async def call():
+            return self.request()._deadline
+
+        assert await run_in_task(call()) is None
+
+    async def test_context_deadline(self, run_in_task, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_DEADLINE_MARGIN', 1)
+
+        async def call():
+            set_context_deadline(Deadline.from_timeout(10))
+            return self.request()._deadline, self.request(timeout=2)._deadline, self.request(timeout=20)._deadline
+
+        propagated, explicit, longer = await run_in_task(call())
+
+        assert 8.5 < propagated.time_remaining() <= 9
+        assert explicit.time_remaining() <= 2
+        # the explicit timeout can not outlive the request being handled
+        assert longer.time_remaining() <= 9
+
+    async def test_exhausted_deadline(self, run_in_task, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_DEADLINE_MARGIN', 0.5)
+
+        async def call():
+            set_context_deadline(Deadline.from_timeout(0.1))
+            self.request()
+
+        with pytest.raises(DeadlineExceededError):
+            await run_in_task(call())
+
+    async def test_http_request_deadline(self, run_in_task, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_HTTP_DEADLINE', 3, raising=False)
+
+        async def handle():
+            await set_request_deadline(None)
+            return get_context_deadline()
+
+        deadline = await run_in_task(handle())
+        assert 2.5 < deadline.time_remaining() <= 3
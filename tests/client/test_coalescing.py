@@ -0,0 +1,149 @@
+import aiotask_context
+import asyncio
+import pytest
+
+from grpclib.metadata import Deadline
+
+from insanic.conf import settings
+
+from interstellar import config as common_config
+from interstellar.client import InterstellarClient, coalescing
+from interstellar.client.coalescing import SingleFlight, coalescing_stats, get_flight
+from interstellar.exceptions import DeadlineExceededError
+from interstellar.utils import get_context_deadline, set_context_deadline
+
+
+@pytest.fixture(autouse=True)
+def load_common_config():
+    InterstellarClient._load_config(settings, common_config)
+
+
+class TestSingleFlight:
+
+    async def test_concurrent_calls_are_shared(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        results = await asyncio.gather(*[flight.do("key", call) for _ in range(5)], flight.do("other", call))
+
+        assert len(set(results[:5])) == 1
+        assert len(calls) == 2
+        assert flight.started == 2
+        assert flight.coalesced == 4
+        assert flight.calls == {}
+
+    async def test_exceptions_are_shared(self):
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise ValueError("nope")
+
+        results = await asyncio.gather(flight.do("key", call), flight.do("key", call), return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.calls == {}
+
+    async def test_cancelled_caller_does_not_cancel_call(self):
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", call))
+        second = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+
+    async def test_caller_timeout(self):
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+
+        # a caller joining the call gives up after its own timeout
+        with pytest.raises(DeadlineExceededError):
+            await flight.do("key", call, timeout=0.01)
+
+        assert await first == "done"
+
+    async def test_call_is_not_limited_by_the_caller_that_made_it(self, loop):
+        loop.set_task_factory(aiotask_context.chainmap_task_factory)
+        flight = SingleFlight()
+        deadlines = []
+
+        async def call():
+            deadlines.append(get_context_deadline())
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def short_caller():
+            set_context_deadline(Deadline.from_timeout(0.01))
+            return await flight.do("key", call, timeout=0.01)
+
+        results = await asyncio.gather(short_caller(), flight.do("key", call, timeout=1), return_exceptions=True)
+
+        assert isinstance(results[0], DeadlineExceededError)
+        assert results[1] == "done"
+        assert deadlines == [None]
+
+    async def test_call_is_cancelled_when_every_caller_gave_up(self):
+        flight = SingleFlight()
+        cancelled = []
+
+        async def call():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        with pytest.raises(DeadlineExceededError):
+            await flight.do("key", call, timeout=0.01)
+        await asyncio.sleep(0)
+
+        assert cancelled == [1]
+        assert flight.calls == {}
+        assert flight.waiting == {}
+
+    async def test_caller_timeout_does_not_hide_call_errors(self):
+        flight = SingleFlight()
+
+        async def call():
+            raise asyncio.TimeoutError()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do("key", call, timeout=1)
+
+
+class TestGetFlight:
+
+    @pytest.fixture(autouse=True)
+    def reset_flights(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_COALESCED_METHODS',
+                            ["test.monkey.v1.ApeService.GetChimpanzee"], raising=False)
+        coalescing.reset()
+        yield
+        coalescing.reset()
+
+    def test_get_flight(self):
+        flight = get_flight(("test", "monkey", "v1", "ApeServiceStub", "GetChimpanzee"))
+
+        assert isinstance(flight, SingleFlight)
+        assert get_flight(("test", "monkey", "v1", "ApeServiceStub", "GetChimpanzee")) is flight
+        assert get_flight(("test", "monkey", "v1", "ApeServiceStub", "GetGorilla")) is None
+
+        assert coalescing_stats() == {"test.monkey.v1.ApeServiceStub.GetChimpanzee": {"started": 0,
+                                                                                     "coalesced": 0}}
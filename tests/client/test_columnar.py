@@ -0,0 +1,95 @@
+import array
+
+import numpy
+import pytest
+
+from google.protobuf import descriptor_pb2, empty_pb2, struct_pb2
+
+from interstellar.client import columnar
+from interstellar.client.columnar import ColumnarSchema, message_to_columns, schemas
+from interstellar.client.converters import message_to_dict
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    if request.param == "array":
+        monkeypatch.setattr(columnar, "numpy", None)
+    schemas.clear()
+    yield request.param
+    schemas.clear()
+
+
+def make_descriptor(rows=3):
+    return descriptor_pb2.DescriptorProto(
+        name="Ape",
+        reserved_range=[descriptor_pb2.DescriptorProto.ReservedRange(start=i, end=i * 2)
+                        for i in range(rows)],
+        reserved_name=[f"old-{i}" for i in range(rows)],
+        field=[descriptor_pb2.FieldDescriptorProto(name="id", number=1, type=5)],
+    )
+
+
+class TestMessageToColumns:
+
+    def test_not_a_message(self, backend):
+        assert message_to_columns(None) is None
+
+    def test_repeated_scalars_are_columns(self, backend):
+        message = descriptor_pb2.FileDescriptorProto(name="ape.proto", public_dependency=[1, 2, 3])
+
+        result = message_to_columns(message)
+
+        assert result['name'] == "ape.proto"
+        assert list(result['public_dependency']) == [1, 2, 3]
+        if backend == "numpy":
+            assert isinstance(result['public_dependency'], numpy.ndarray)
+            assert result['public_dependency'].dtype == numpy.int32
+        else:
+            assert isinstance(result['public_dependency'], array.array)
+            assert result['public_dependency'].typecode == 'i'
+
+    def test_repeated_flat_messages_are_tables(self, backend):
+        result = message_to_columns(make_descriptor())
+
+        assert list(result['reserved_range']['start']) == [0, 1, 2]
+        assert list(result['reserved_range']['end']) == [0, 2, 4]
+        assert list(result['reserved_name']) == ["old-0", "old-1", "old-2"]
+        if backend == "array":
+            # strings have no typecode
+            assert isinstance(result['reserved_name'], list)
+
+    def test_empty_table(self, backend):
+        result = message_to_columns(make_descriptor(rows=0))
+
+        assert len(result['reserved_range']['start']) == 0
+        assert len(result['reserved_range']['end']) == 0
+
+    def test_table_without_fields(self, backend):
+        convert = ColumnarSchema.table_converter(empty_pb2.Empty.DESCRIPTOR)
+
+        assert convert([empty_pb2.Empty(), empty_pb2.Empty()]) == {}
+        assert convert([]) == {}
+
+    def test_other_fields_are_converted_like_dicts(self, backend):
+        message = make_descriptor()
+        result = message_to_columns(message)
+
+        # field descriptors have nested options so are not a table
+        assert result['field'] == message_to_dict(message)['field']
+        # singular messages are converted with their own columns
+        assert result['options']['deprecated'] is False
+        assert len(result['options']['uninterpreted_option']) == 0
+
+    def test_recursive_message(self, backend):
+        message = struct_pb2.Struct()
+        message.update({"a": [1, {"b": 2}]})
+
+        assert message_to_columns(message) == message_to_dict(message)
+
+    def test_schema_is_compiled_once(self, backend):
+        message_to_columns(make_descriptor())
+        schema = schemas[descriptor_pb2.DescriptorProto.DESCRIPTOR]
+
+        message_to_columns(make_descriptor())
+
+        assert schemas[descriptor_pb2.DescriptorProto.DESCRIPTOR] is schema
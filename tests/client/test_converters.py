@@ -0,0 +1,135 @@
+import pytest
+
+from types import SimpleNamespace
+
+from google.protobuf import struct_pb2, timestamp_pb2, descriptor_pb2
+from google.protobuf.descriptor import FieldDescriptor
+
+from grpc_test_monkey_v1.monkey_pb2 import ApeResponse
+
+from interstellar.client.converters import MessageMapping, _is_repeated, converters, get_converter, \
+    message_to_dict, message_to_mapping
+
+
+class TestMessageToDict:
+
+    def test_flat_message(self):
+        assert message_to_dict(ApeResponse(id=1, extra="woo")) == {"id": 1, "extra": "woo"}
+
+    def test_defaults_are_included(self):
+        assert message_to_dict(timestamp_pb2.Timestamp(seconds=5)) == {"seconds": 5, "nanos": 0}
+
+    def test_not_a_message(self):
+        assert message_to_dict(None) is None
+        assert message_to_dict({"id": 1}) is None
+        # an empty message is not None
+        assert message_to_dict(struct_pb2.Struct()) == {"fields": {}}
+
+    def test_nested_repeated_enum(self):
+        message = descriptor_pb2.DescriptorProto(
+            name="Ape",
+            field=[descriptor_pb2.FieldDescriptorProto(name="id", number=1, type=5)],
+            reserved_name=["old"]
+        )
+
+        result = message_to_dict(message)
+
+        assert result['name'] == "Ape"
+        assert result['reserved_name'] == ["old"]
+        assert isinstance(result['reserved_name'], list)
+        assert result['field'][0]['name'] == "id"
+        # enums are their number
+        assert result['field'][0]['type'] == 5
+        # unset nested messages are a dict of defaults
+        assert result['options']['deprecated'] is False
+
+    def test_map_oneof_and_recursion(self):
+        message = struct_pb2.Struct()
+        message.update({"number": 1, "list": ["a", None], "nested": {"flag": True}})
+
+        assert message_to_dict(message) == {
+            "fields": {
+                "number": {"number_value": 1.0},
+                "list": {"list_value": {"values": [{"string_value": "a"}, {"null_value": 0}]}},
+                "nested": {"struct_value": {"fields": {"flag": {"bool_value": True}}}},
+            }
+        }
+
+    def test_unset_oneof_is_omitted(self):
+        assert message_to_dict(struct_pb2.Value()) == {}
+
+    def test_converter_is_cached(self):
+        converter = get_converter(ApeResponse.DESCRIPTOR)
+
+        assert converters[ApeResponse.DESCRIPTOR] is converter
+        assert get_converter(ApeResponse.DESCRIPTOR) is converter
+
+    @pytest.mark.parametrize("field, repeated", [
+        (SimpleNamespace(is_repeated=True), True),
+        (SimpleNamespace(is_repeated=False), False),
+        # protobuf releases without is_repeated
+        (SimpleNamespace(label=FieldDescriptor.LABEL_REPEATED), True),
+        (SimpleNamespace(label=FieldDescriptor.LABEL_OPTIONAL), False),
+    ])
+    def test_is_repeated(self, field, repeated):
+        assert _is_repeated(field) is repeated
+
+
+class TestMessageMapping:
+
+    def test_fields_are_converted_on_access(self):
+        message = descriptor_pb2.DescriptorProto(
+            name="Ape",
+            field=[descriptor_pb2.FieldDescriptorProto(name="id", number=1, type=5)],
+            reserved_name=["old"]
+        )
+
+        mapping = message_to_mapping(message)
+
+        assert isinstance(mapping, MessageMapping)
+        assert mapping.message is message
+        assert mapping['name'] == "Ape"
+        assert mapping['reserved_name'] == ["old"]
+        assert isinstance(mapping['field'][0], MessageMapping)
+        assert mapping['field'][0]['type'] == 5
+        assert mapping['options']['deprecated'] is False
+
+        # converted values are kept
+        assert mapping['reserved_name'] is mapping['reserved_name']
+
+    def test_mapping_matches_dict(self):
+        message = struct_pb2.Struct()
+        message.update({"number": 1, "nested": {"flag": True}})
+
+        mapping = message_to_mapping(message)
+
+        assert mapping.to_dict() == message_to_dict(message)
+        assert mapping['fields']['nested']['struct_value']['fields']['flag']['bool_value'] is True
+
+    def test_oneof(self):
+        mapping = message_to_mapping(struct_pb2.Value(string_value="a"))
+
+        assert list(mapping) == ["string_value"]
+        assert len(mapping) == 1
+        assert mapping['string_value'] == "a"
+
+        with pytest.raises(KeyError):
+            mapping['number_value']
+
+    def test_unknown_field(self):
+        mapping = message_to_mapping(ApeResponse(id=1))
+
+        with pytest.raises(KeyError):
+            mapping['monkey']
+
+        assert mapping.get('monkey') is None
+        assert dict(mapping) == {"id": 1, "extra": ""}
+
+    def test_read_only(self):
+        mapping = message_to_mapping(ApeResponse(id=1))
+
+        with pytest.raises(TypeError):
+            mapping['id'] = 2
+
+    def test_not_a_message(self):
+        assert message_to_mapping(None) is None
@@ -1,16 +1,31 @@
+import aiotask_context
+import asyncio
 import pytest
 
 from grpclib.const import Status
+from grpclib.metadata import Deadline
 
 from insanic import Insanic
 from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+from insanic.models import User
 from insanic.services import Service
 
-from interstellar.client import InterstellarClient
+from interstellar.client import InterstellarClient, caching, coalescing, hedging
+from interstellar.client.hedging import hedging_stats
+from interstellar.client.caching import cache_stats
+from interstellar.client.channels import ChannelPool
+from interstellar.client.coalescing import coalescing_stats
+from interstellar.client.converters import MessageMapping
+from interstellar.client.services import GRPCMethod
+from interstellar.exceptions import DeadlineExceededError, InterstellarError
 from interstellar.server import InterstellarServer
+from interstellar.utils import get_context_deadline, set_context_deadline
 
 from grpclib.exceptions import GRPCError
 
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest, ApeResponse
+
 class TestDispatch:
 
     @pytest.fixture()
@@ -58,6 +73,234 @@ class TestDispatch:
             assert reply
             assert reply['extra'] == "woo woo ahh ahh"
 
+    async def test_dispatch_with_attributes(self, insanic_application, monkeypatch, test_server):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test', 'second'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+
+        service = Service('test')
+        monkeypatch.setattr(service, 'host', test_server.host)
+        monkeypatch.setattr(service, 'port', test_server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+
+        method = service.grpc.monkey.v1.ApeService.GetChimpanzee
+        # the message types do not need a channel
+        with monkeypatch.context() as m:
+            m.setattr(ChannelPool, 'get_channel', None)
+            request = method.request_type(id="1", include="sound")
+            assert method.reply_type is ApeResponse
+
+        reply = await method(request)
+        assert reply['extra'] == "woo woo ahh ahh"
+
+        reply = await method(request, message_mode="raw")
+        assert reply.extra == "woo woo ahh ahh"
+
+        async with method.open() as stream:
+            await stream.send_message(request, end=True)
+            reply = await stream.recv_message()
+        assert reply['extra'] == "woo woo ahh ahh"
+
+    async def test_dispatch_with_message_mode(self, insanic_application, monkeypatch, test_server):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test', 'second'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+
+        service = Service('test')
+        monkeypatch.setattr(service, 'host', test_server.host)
+        monkeypatch.setattr(service, 'port', test_server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee', message_mode="raw") as method:
+            reply = await method(method.request_type(id="1", include="sound"))
+
+            assert isinstance(reply, method.reply_type)
+            assert reply.extra == "woo woo ahh ahh"
+
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee', message_mode="lazy") as method:
+            reply = await method(method.request_type(id="1", include="sound"))
+
+            assert isinstance(reply, MessageMapping)
+            assert reply['extra'] == "woo woo ahh ahh"
+
+        # the pooled channel keeps its own mode
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee') as method:
+            reply = await method(method.request_type(id="1", include="sound"))
+
+            assert reply == {"id": 1, "extra": "woo woo ahh ahh"}
+
+    async def test_dispatch_with_service_message_mode(self, insanic_application, monkeypatch, test_server):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test', 'second'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CHANNEL_POOL_OPTIONS', {"test": {"message_mode": "raw"}})
+
+        service = Service('test')
+        monkeypatch.setattr(service, 'host', test_server.host)
+        monkeypatch.setattr(service, 'port', test_server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee') as method:
+            reply = await method(method.request_type(id="1", include="sound"))
+
+            assert isinstance(reply, method.reply_type)
+
+    async def test_dispatch_coalesced(self, insanic_application, monkeypatch, test_server):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test', 'second'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_COALESCED_METHODS', ["test.monkey.v1.ApeService.GetChimpanzee"])
+        coalescing.reset()
+
+        service = Service('test')
+        monkeypatch.setattr(service, 'host', test_server.host)
+        monkeypatch.setattr(service, 'port', test_server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee') as method:
+            request = method.request_type(id="1", include="sound")
+            replies = await asyncio.gather(*[method(request) for _ in range(5)],
+                                           method(method.request_type(id="2", include="sound")))
+
+        assert replies[0] == {"id": 1, "extra": "woo woo ahh ahh"}
+        assert all(reply == replies[0] for reply in replies[:5])
+        # every caller gets its own dict
+        assert replies[0] is not replies[1]
+        assert replies[5]['id'] == 2
+
+        assert coalescing_stats() == {"test.monkey.v1.ApeServiceStub.GetChimpanzee": {"started": 2, "coalesced": 4}}
+
+        # calls after the first completed are not coalesced
+        await method(request)
+        assert coalescing_stats()["test.monkey.v1.ApeServiceStub.GetChimpanzee"]["started"] == 3
+
+        coalescing.reset()
+
+    async def test_dispatch_coalesced_with_different_timeouts(self, insanic_application, monkeypatch):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_COALESCED_METHODS', ["test.monkey.v1.ApeService.GetChimpanzee"])
+        coalescing.reset()
+
+        calls = []
+
+        async def slow_call(message, *, timeout=None, metadata=None):
+            calls.append((timeout, get_context_deadline()))
+            await asyncio.sleep(0.05)
+            return ApeResponse(id=1, extra="woo woo ahh ahh")
+
+        monkeypatch.setattr(GRPCMethod, 'get_method', lambda self, message_mode=None: slow_call)
+
+        with Service('test').grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee') as method:
+            request = method.request_type(id="1", include="sound")
+
+            async def short_caller():
+                set_context_deadline(Deadline.from_timeout(settings.INTERSTELLAR_CLIENT_DEADLINE_MARGIN + 0.01))
+                return await method(request, timeout=0.01)
+
+            # the caller that makes the call gives up first, the one that joined it still gets the reply
+            replies = await asyncio.gather(short_caller(), method(request, timeout=5), return_exceptions=True)
+
+        assert isinstance(replies[0], DeadlineExceededError)
+        assert replies[1] == {"id": 1, "extra": "woo woo ahh ahh"}
+        assert calls == [(None, None)]
+
+        coalescing.reset()
+
+    async def test_dispatch_cached(self, insanic_application, monkeypatch, test_server):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test', 'second'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CACHED_METHODS',
+                            {"test.monkey.v1.ApeService.GetChimpanzee": {"ttl": 60}})
+        caching.reset()
+
+        service = Service('test')
+        monkeypatch.setattr(service, 'host', test_server.host)
+        monkeypatch.setattr(service, 'port', test_server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee') as method:
+            reply = await method(ApeRequest(id="1", include="sound"))
+
+        assert reply == {"id": 1, "extra": "woo woo ahh ahh"}
+
+        async def call_as(user):
+            aiotask_context.set(settings.TASK_CONTEXT_REQUEST_USER, user)
+            return await method(ApeRequest(id="1", include="sound"))
+
+        # replies are not shared between users
+        assert await asyncio.ensure_future(call_as(User(id="2", level=1, is_authenticated=1))) == reply
+        assert cache_stats()["test.monkey.v1.ApeServiceStub.GetChimpanzee"]["misses"] == 2
+
+        def no_channel(*args, **kwargs):
+            raise AssertionError("cached replies should not need a channel")
+
+        monkeypatch.setattr(ChannelPool, 'get_channel', no_channel)
+
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee', message_mode="raw") as method:
+            cached = await method(ApeRequest(id="1", include="sound"))
+
+        assert cached == ApeResponse(id=1, extra="woo woo ahh ahh")
+        assert cache_stats()["test.monkey.v1.ApeServiceStub.GetChimpanzee"]["hits"] == 1
+
+        caching.reset()
+
+    async def test_dispatch_hedged(self, insanic_application, monkeypatch, test_server):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test', 'second'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_HEDGED_METHODS',
+                            {"test.monkey.v1.ApeService.GetChimpanzee": {"delay": 0, "budget": 1}})
+        hedging.reset()
+
+        service = Service('test')
+        monkeypatch.setattr(service, 'host', test_server.host)
+        monkeypatch.setattr(service, 'port', test_server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee') as method:
+            reply = await method(ApeRequest(id="1", include="sound"), timeout=10)
+
+        assert reply == {"id": 1, "extra": "woo woo ahh ahh"}
+        assert hedging_stats()["test.monkey.v1.ApeServiceStub.GetChimpanzee"]["hedged"] == 1
+
+        hedging.reset()
+
+    async def test_map(self, insanic_application, monkeypatch, test_server):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test', 'second'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+
+        service = Service('test')
+        monkeypatch.setattr(service, 'host', test_server.host)
+        monkeypatch.setattr(service, 'port', test_server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+
+        requests = [ApeRequest(id=str(i), include="sound") for i in range(10)]
+        # the server fails to convert the id to an int
+        requests[4] = ApeRequest(id="four", include="sound")
+
+        results = await service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee').map(requests, concurrency=3,
+                                                                                         timeout=10)
+
+        assert [result['id'] for i, result in enumerate(results) if i != 4] == [0, 1, 2, 3, 5, 6, 7, 8, 9]
+        assert isinstance(results[4], InterstellarError)
+
+        results = await service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee').map(requests, timeout=0)
+        assert all(isinstance(result, DeadlineExceededError) for result in results)
+
+        assert await service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee').map([]) == []
+
+        with pytest.raises(TypeError):
+            await service.grpc('monkey', 'v1', 'ApeService').map(requests)
+
+        for concurrency in (0, -1):
+            with pytest.raises(ValueError):
+                await service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee').map(requests, concurrency=concurrency)
+
+    def test_unknown_message_mode(self, insanic_application, monkeypatch):
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test'], raising=False)
+
+        InterstellarClient.init_app(insanic_application)
+
+        with pytest.raises(ImproperlyConfigured):
+            Service('test').grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee', message_mode="json")
+
     @pytest.mark.parametrize(
         "exception_type, expected_status",
         (
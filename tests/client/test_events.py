@@ -1,6 +1,8 @@
 import aiotask_context
 import asyncio
+import jwt
 import pytest
+import time
 import uuid
 
 from multidict import MultiDict
@@ -14,7 +16,7 @@ from insanic.services import Service
 from insanic.services.utils import context_user
 
 from interstellar.client import InterstellarClient
-from interstellar.client.events import interstellar_client_event_send_request
+from interstellar.client.events import OutboundMetadata, get_date_header, interstellar_client_event_send_request
 from interstellar.server import InterstellarServer
 
 
@@ -66,4 +68,86 @@ class TestClientEvents:
         assert "date" in event.metadata
         assert "ip" in event.metadata
 
+    async def test_send_request_with_template(self, loop, insanic_application):
+        InterstellarClient.init_app(insanic_application)
+
+        template = OutboundMetadata("some_service")
+        aiotask_context.set(settings.TASK_CONTEXT_REMOTE_ADDR, "1.2.3.4")
+
+        events = []
+        for correlation_id in ("first", "second"):
+            aiotask_context.set(settings.TASK_CONTEXT_CORRELATION_ID, correlation_id)
+            event = SendRequest(method_name="test", deadline=None, content_type="application/grpc+proto",
+                                metadata=MultiDict())
+            await interstellar_client_event_send_request(event, "some_service", template=template)
+            events.append(event)
+
+        expected = MultiDict()
+        await interstellar_client_event_send_request(
+            SendRequest(method_name="test", deadline=None, content_type="application/grpc+proto",
+                        metadata=expected),
+            "some_service"
+        )
+
+        service_header = settings.INTERNAL_REQUEST_SERVICE_HEADER.lower()
+        assert events[0].metadata[service_header] == expected[service_header]
+        assert events[0].metadata[settings.REQUEST_ID_HEADER_FIELD.lower()] == "first"
+        assert events[1].metadata[settings.REQUEST_ID_HEADER_FIELD.lower()] == "second"
+        assert events[1].metadata["ip"] == "1.2.3.4"
+
+    def test_date_header_is_cached_per_second(self, monkeypatch):
+        from interstellar.client import events
+
+        now = [1000.2]
+        monkeypatch.setattr(time, "time", lambda: now[0])
+        monkeypatch.setattr(events, "_date_header", (None, None))
+
+        assert get_date_header() == "Thu, 01 Jan 70 00:16:40 +0000"
+        assert events._date_header[0] == 1000
+
+        now[0] = 1000.9
+        assert get_date_header() == "Thu, 01 Jan 70 00:16:40 +0000"
+
+        now[0] = 1001.0
+        assert get_date_header() == "Thu, 01 Jan 70 00:16:41 +0000"
+
+    async def test_service_token(self, monkeypatch, insanic_application):
+        from interstellar.client import events
+
+        InterstellarClient.init_app(insanic_application)
+        monkeypatch.setattr(settings, "INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY", "secret")
+        monkeypatch.setattr(settings, "INTERSTELLAR_CLIENT_SERVICE_TOKEN_LIFETIME", 300)
+
+        template = OutboundMetadata("some_service")
+        authorization = template.render()["authorization"]
+        prefix, token = authorization.split(" ")
+
+        assert prefix == settings.JWT_SERVICE_AUTH['JWT_AUTH_HEADER_PREFIX']
+        assert jwt.decode(token, "secret", algorithms=["HS256"], audience="some_service")["source"] == \
+            settings.SERVICE_NAME
+        assert template.render()["authorization"] == authorization
+
+        signed = []
+        encode_service_token = events.encode_service_token
+
+        def counting_encode_service_token(*args):
+            signed.append(args)
+            return encode_service_token(*args)
+
+        monkeypatch.setattr(events, "encode_service_token", counting_encode_service_token)
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 150)
+        template.render()
+        assert signed == []
+
+        # signed again when a third of the lifetime is left
+        monkeypatch.setattr(time, "time", lambda: now + 201)
+        template.render()
+        assert signed == [(settings.SERVICE_NAME, "some_service", 300, now + 201)]
+        assert template.authorization_refresh_at == int(now + 201 + 300) - 100
+
+    async def test_no_service_token_without_key(self, insanic_application):
+        InterstellarClient.init_app(insanic_application)
 
+        assert "authorization" not in OutboundMetadata("some_service").render()
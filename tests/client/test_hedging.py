@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.client import hedging
+from interstellar.client.hedging import Hedge, get_hedge, hedging_stats
+
+
+def make_attempts(*delays, fail=()):
+    """
+    :return: function returning a call that takes the next delay and the calls that were started
+    """
+    delays = list(delays)
+    started = []
+
+    def attempt():
+        index = len(started)
+
+        async def call():
+            try:
+                await asyncio.sleep(delays[index])
+            except asyncio.CancelledError:
+                started[index] = "cancelled"
+                raise
+            if index in fail:
+                raise ValueError(index)
+            return index
+
+        started.append("started")
+        return call()
+
+    return attempt, started
+
+
+class TestHedge:
+
+    async def test_fast_reply_is_not_hedged(self):
+        hedge = Hedge(delay=0.05, budget=1)
+        attempt, started = make_attempts(0)
+
+        assert await hedge.call(attempt) == 0
+        assert len(started) == 1
+        assert hedge.hedged == 0
+
+    async def test_slow_reply_is_hedged(self):
+        hedge = Hedge(delay=0.01, budget=1)
+        attempt, started = make_attempts(1, 0)
+
+        assert await hedge.call(attempt) == 1
+        await asyncio.sleep(0)
+
+        assert started == ["cancelled", "started"]
+        assert (hedge.calls, hedge.hedged, hedge.hedge_wins) == (1, 1, 1)
+
+    async def test_records_first_attempt_latency(self):
+        hedge = Hedge(delay=0.01, budget=1)
+        recorded = hedge.latencies
+
+        # the hedge wins, the cancelled first attempt took at least as long as the call
+        attempt, started = make_attempts(1, 0)
+        await hedge.call(attempt)
+        await asyncio.sleep(0)
+        assert len(recorded) == 1
+        assert recorded[0] >= 0.01
+
+        # the first wins, its latency is recorded and not the hedge's
+        attempt, started = make_attempts(0.02, 1)
+        await hedge.call(attempt)
+        await asyncio.sleep(0)
+        assert len(recorded) == 2
+        assert recorded[1] >= 0.02
+
+    async def test_first_reply_can_still_win(self):
+        hedge = Hedge(delay=0.01, budget=1)
+        attempt, started = make_attempts(0.02, 1)
+
+        assert await hedge.call(attempt) == 0
+        await asyncio.sleep(0)
+
+        assert started == ["started", "cancelled"]
+        assert hedge.hedge_wins == 0
+
+    async def test_failed_attempt_waits_for_the_other(self):
+        hedge = Hedge(delay=0.01, budget=1)
+        attempt, started = make_attempts(0.02, 0.03, fail=(0,))
+
+        assert await hedge.call(attempt) == 1
+
+        attempt, started = make_attempts(0.02, 0.03, fail=(0, 1))
+        with pytest.raises(ValueError):
+            await hedge.call(attempt)
+
+    async def test_budget(self):
+        hedge = Hedge(delay=0, budget=0.5)
+
+        for _ in range(4):
+            attempt, started = make_attempts(0.01, 0.01)
+            await hedge.call(attempt)
+
+        assert hedge.calls == 4
+        assert hedge.hedged == 2
+
+    async def test_cancelled_call_cancels_attempts(self):
+        hedge = Hedge(delay=0, budget=1)
+        attempt, started = make_attempts(1, 1)
+
+        call = asyncio.ensure_future(hedge.call(attempt))
+        await asyncio.sleep(0.01)
+        call.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0)
+        assert started == ["cancelled", "cancelled"]
+
+    def test_observed_delay(self):
+        hedge = Hedge(percentile=90, min_samples=10)
+
+        for latency in range(9):
+            hedge.record(latency / 100)
+        assert hedge.get_delay() is None
+
+        hedge.record(0.09)
+        assert hedge.get_delay() == 0.09
+
+        # fixed delays are not replaced
+        fixed = Hedge(delay=0.5, min_samples=1)
+        fixed.record(1)
+        assert fixed.get_delay() == 0.5
+
+
+class TestGetHedge:
+
+    @pytest.fixture(autouse=True)
+    def reset_hedges(self):
+        hedging.reset()
+        yield
+        hedging.reset()
+
+    def test_get_hedge(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_HEDGED_METHODS',
+                            {"test.monkey.v1.ApeService.GetChimpanzee": {"delay": 0.1, "budget": 0.2}},
+                            raising=False)
+
+        hedge = get_hedge(("test", "monkey", "v1", "ApeServiceStub", "GetChimpanzee"))
+
+        assert (hedge.delay, hedge.budget) == (0.1, 0.2)
+        assert get_hedge(("test", "monkey", "v1", "ApeServiceStub", "GetGorilla")) is None
+        assert hedging_stats() == {"test.monkey.v1.ApeServiceStub.GetChimpanzee": {
+            "calls": 0, "hedged": 0, "hedge_wins": 0, "delay": 0.1
+        }}
+
+    def test_bad_options(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_HEDGED_METHODS',
+                            {"test.monkey.v1.ApeService.GetChimpanzee": {"after": 0.1}}, raising=False)
+
+        with pytest.raises(ImproperlyConfigured):
+            get_hedge(("test", "monkey", "v1", "ApeServiceStub", "GetChimpanzee"))
@@ -0,0 +1,150 @@
+import asyncio
+import pytest
+
+from grpclib.const import Cardinality, Status
+from grpclib.exceptions import GRPCError
+
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest, ApeResponse
+
+from insanic.conf import settings
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar import config as common_config
+from interstellar.client import InterstellarClient, config as client_config, limiting
+from interstellar.client.channels import InterstellarChannel
+from interstellar.client.limiting import AdaptiveLimiter, get_limiter, limiter_stats
+from interstellar.exceptions import DeadlineExceededError, ResourceExhaustedError
+
+
+@pytest.fixture(autouse=True)
+def load_client_config():
+    InterstellarClient._load_config(settings, common_config)
+    InterstellarClient._load_config(settings, client_config)
+    limiting.reset()
+    yield
+    limiting.reset()
+
+
+class TestAdaptiveLimiter:
+
+    async def test_acquires_below_limit(self):
+        limiter = AdaptiveLimiter("test", initial_limit=2)
+
+        await limiter.acquire()
+        await limiter.acquire()
+        assert limiter.in_flight == 2
+
+    async def test_waits_for_release(self, loop):
+        limiter = AdaptiveLimiter("test", initial_limit=1)
+        await limiter.acquire()
+
+        waiting = loop.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        assert len(limiter.waiters) == 1
+
+        limiter.release()
+        await waiting
+        assert limiter.in_flight == 1
+        assert not limiter.waiters
+
+    async def test_full_queue_fails_fast(self, loop):
+        limiter = AdaptiveLimiter("test", initial_limit=1, max_queue=1)
+        await limiter.acquire()
+
+        waiting = loop.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(ResourceExhaustedError):
+            await limiter.acquire()
+        assert limiter.rejected == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert not limiter.waiters
+
+    async def test_deadline_while_waiting(self):
+        limiter = AdaptiveLimiter("test", initial_limit=1)
+        await limiter.acquire()
+
+        with pytest.raises(DeadlineExceededError):
+            await limiter.acquire(timeout=0.01)
+        assert not limiter.waiters
+        assert limiter.in_flight == 1
+
+    def test_increases_on_fast_calls(self):
+        limiter = AdaptiveLimiter("test", initial_limit=10)
+
+        for _ in range(10):
+            limiter.in_flight += 1
+            limiter.release(0.01)
+
+        assert 10.9 < limiter.limit < 11
+
+    def test_decreases_on_slow_calls(self):
+        limiter = AdaptiveLimiter("test", initial_limit=10, backoff=0.5, latency_tolerance=2)
+
+        limiter.in_flight += 2
+        limiter.release(0.01)
+        limiter.release(0.05)
+
+        assert limiter.limit == pytest.approx((10 + 1 / 10) * 0.5)
+
+    def test_decreases_on_overload(self):
+        limiter = AdaptiveLimiter("test", initial_limit=10, min_limit=8, backoff=0.5)
+
+        limiter.in_flight += 2
+        limiter.release(0.01, GRPCError(Status.RESOURCE_EXHAUSTED))
+        assert limiter.limit == 8
+
+        # answers are not overload
+        limiter.release(0.01, GRPCError(Status.NOT_FOUND))
+        assert limiter.limit > 8
+
+    def test_invalid_options(self):
+        with pytest.raises(ValueError):
+            AdaptiveLimiter("test", initial_limit=1, min_limit=2)
+
+
+class TestGetLimiter:
+
+    def test_disabled_by_default(self):
+        assert get_limiter("test") is None
+        assert limiter_stats() == {}
+
+    async def test_stats(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT_OPTIONS',
+                            {"test": {"enabled": True, "initial_limit": 5}})
+
+        limiter = get_limiter("test")
+        assert get_limiter("test") is limiter
+        await limiter.acquire()
+
+        assert limiter_stats() == {"test": {"limit": 5, "in_flight": 1, "queued": 0, "rejected": 0}}
+
+    def test_invalid_options(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT_OPTIONS',
+                            {"test": {"enabled": True, "backoff": 2}})
+
+        with pytest.raises(ImproperlyConfigured):
+            get_limiter("test")
+
+
+class TestChannelLimiter:
+
+    async def test_failed_call_releases(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_CLIENT_CONCURRENCY_LIMIT_OPTIONS',
+                            {"test": {"enabled": True, "initial_limit": 1}})
+        channel = InterstellarChannel(host="127.0.0.1", port=1, service_name="test")
+
+        for _ in range(2):
+            # nothing is listening on the port
+            with pytest.raises(OSError):
+                async with channel.request("/test.v1.ApeService/GetChimpanzee", Cardinality.UNARY_UNARY,
+                                           ApeRequest, ApeResponse, timeout=1) as stream:
+                    await stream.send_message(ApeRequest(id="1"), end=True)
+
+        assert channel.limiter.in_flight == 0
+        assert channel.limiter.limit == 1
+        channel.close()
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+import socket
+
+from interstellar.client.resolver import Resolver
+
+
+class TestResolver:
+
+    @pytest.fixture()
+    def resolved(self, monkeypatch):
+        resolved = {"calls": 0, "test.local": ["10.0.0.1", "10.0.0.2", "10.0.0.1"]}
+
+        def getaddrinfo(host, port, *args, **kwargs):
+            resolved['calls'] += 1
+            if host not in resolved:
+                raise socket.gaierror("Name or service not known")
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (a, port)) for a in resolved[host]]
+
+        monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+        return resolved
+
+    def test_resolves_all_addresses(self, resolved):
+        resolver = Resolver(ttl=30)
+
+        assert resolver.resolve("test.local", 8000) == ("10.0.0.1", "10.0.0.2")
+
+    def test_caches_within_ttl(self, resolved):
+        resolver = Resolver(ttl=30)
+
+        first = resolver.resolve("test.local", 8000)
+        second = resolver.resolve("test.local", 8000)
+
+        assert first is second
+        assert resolved['calls'] == 1
+
+    def test_ip_address_is_not_resolved(self, resolved):
+        resolver = Resolver(ttl=30)
+
+        assert resolver.resolve("127.0.0.1", 8000) == ("127.0.0.1",)
+        assert resolved['calls'] == 0
+
+    def test_unresolvable_host(self, resolved):
+        resolver = Resolver(ttl=30)
+
+        assert resolver.resolve("nowhere.local", 8000) == ("nowhere.local",)
+
+    def test_refreshes_after_ttl(self, resolved):
+        resolver = Resolver(ttl=0)
+
+        first = resolver.resolve("test.local", 8000)
+        resolved['test.local'] = ["10.0.0.3"]
+
+        # expired entries are refreshed inline when there is no running loop
+        assert resolver.resolve("test.local", 8000) is first
+        assert resolver.resolve("test.local", 8000) == ("10.0.0.3",)
+
+    async def test_refreshes_in_background(self, resolved, loop, monkeypatch):
+        async def getaddrinfo(host, port, *args, **kwargs):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ("10.0.0.4", port))]
+
+        monkeypatch.setattr(loop, 'getaddrinfo', getaddrinfo)
+
+        resolver = Resolver(ttl=0)
+        first = resolver.resolve("test.local", 8000)
+
+        # stale addresses are served while the refresh runs
+        assert resolver.resolve("test.local", 8000) is first
+
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+        assert resolver.resolve("test.local", 8000) == ("10.0.0.4",)
+
+    async def test_first_resolution_does_not_block(self, resolved, loop, monkeypatch):
+        async def getaddrinfo(host, port, *args, **kwargs):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ("10.0.0.4", port))]
+
+        monkeypatch.setattr(loop, 'getaddrinfo', getaddrinfo)
+
+        resolver = Resolver(ttl=30)
+
+        # connected to by name until the addresses are resolved
+        assert resolver.resolve("test.local", 8000) == ("test.local",)
+        assert resolver.resolve("test.local", 8000) == ("test.local",)
+
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+        assert resolver.resolve("test.local", 8000) == ("10.0.0.4",)
+        assert resolved['calls'] == 0
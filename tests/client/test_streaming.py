@@ -0,0 +1,166 @@
+import asyncio
+import pytest
+
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest, ApeResponse
+
+from insanic import Insanic
+from insanic.conf import settings
+from insanic.loading import get_service
+
+from interstellar.client import InterstellarClient
+from interstellar.client.streaming import iterate_replies
+from interstellar.server import InterstellarServer
+
+
+class FakeStream:
+    """
+    sends the replies given to it, one per request for bidirectional calls
+    """
+
+    def __init__(self, replies=(), echo=False, error=None):
+        self.replies = list(replies)
+        self.echo = echo
+        self.error = error
+        self.sent = []
+        self.received = 0
+        self.ended = False
+        self.closed = None
+        self.requests = asyncio.Queue()
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.closed = exc_type
+
+    async def send_request(self):
+        pass
+
+    async def send_message(self, message, end=False):
+        self.sent.append(message)
+        await self.requests.put(message)
+        if end:
+            await self.end()
+
+    async def end(self):
+        self.ended = True
+        await self.requests.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.echo:
+            request = await self.requests.get()
+            if request is None:
+                raise StopAsyncIteration
+            return request * 10
+
+        if self.error is not None and self.received == len(self.replies):
+            raise self.error
+        if self.received == len(self.replies):
+            raise StopAsyncIteration
+        self.received += 1
+        return self.replies[self.received - 1]
+
+
+class TestIterateReplies:
+
+    async def test_replies(self):
+        stream = FakeStream(range(5))
+
+        replies = [reply async for reply in iterate_replies(stream, 1)]
+
+        assert replies == [0, 1, 2, 3, 4]
+        assert stream.sent == [1]
+        assert stream.ended
+
+    async def test_decode(self):
+        stream = FakeStream(range(3))
+
+        assert [r async for r in iterate_replies(stream, 1, decode=str)] == ["0", "1", "2"]
+
+    async def test_batches(self):
+        stream = FakeStream(range(5))
+
+        batches = [batch async for batch in iterate_replies(stream, 1, batch_size=2)]
+
+        assert batches == [[0, 1], [2, 3], [4]]
+
+    async def test_prefetch_is_bounded(self):
+        stream = FakeStream(range(100))
+        replies = iterate_replies(stream, 1, prefetch=3)
+
+        assert await replies.__anext__() == 0
+        await asyncio.sleep(0.01)
+
+        # the buffer is full, the rest are left on the stream
+        assert stream.received <= 5
+        await replies.aclose()
+        assert stream.closed is asyncio.CancelledError
+
+    async def test_error(self):
+        stream = FakeStream(range(2), error=ValueError("broken"))
+        replies = []
+
+        with pytest.raises(ValueError):
+            async for reply in iterate_replies(stream, 1):
+                replies.append(reply)
+        assert replies == [0, 1]
+
+    async def test_bidirectional(self):
+        stream = FakeStream(echo=True)
+
+        async def requests():
+            for i in range(3):
+                yield i
+
+        assert [r async for r in iterate_replies(stream, requests=requests())] == [0, 10, 20]
+        assert stream.sent == [0, 1, 2]
+        assert stream.ended
+
+    async def test_invalid_prefetch(self):
+        with pytest.raises(ValueError):
+            await iterate_replies(FakeStream(), 1, prefetch=0).__anext__()
+
+
+class TestIterate:
+
+    @pytest.fixture()
+    def service(self, insanic_application, test_server, loop, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVERS', ["tests.blackhole.PlanetOfTheApes"], raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_PORT_DELTA', 1, raising=False)
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test'], raising=False)
+
+        server = Insanic('test')
+        InterstellarServer.init_app(server)
+        server = loop.run_until_complete(test_server(server))
+
+        InterstellarClient.init_app(insanic_application)
+        service = get_service('test')
+        monkeypatch.setattr(service, 'host', server.host)
+        monkeypatch.setattr(service, 'port', server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+        yield service
+
+        InterstellarServer.reset()
+
+    async def test_iterate(self, service):
+        replies = [reply async for reply in
+                   service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee').iterate(
+                       ApeRequest(id="1", include="sound"), timeout=5)]
+
+        assert replies == [{"id": 1, "extra": "woo woo ahh ahh"}]
+
+    async def test_iterate_raw(self, service):
+        method = service.grpc.monkey.v1.ApeService.GetChimpanzee
+
+        replies = [reply async for reply in method.iterate(ApeRequest(id="1"), message_mode="raw")]
+
+        assert replies == [ApeResponse(id=1, extra="i don't know")]
+
+    def test_iterate_needs_method(self, service):
+        with pytest.raises(TypeError):
+            service.grpc('monkey', 'v1', 'ApeService').iterate(ApeRequest(id="1"))
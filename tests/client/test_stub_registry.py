@@ -1,6 +1,14 @@
+import json
+
+import pytest
+
 from grpclib.client import ServiceMethod
 
-from interstellar.client.registry import StubRegistry
+from insanic.exceptions import ImproperlyConfigured
+
+from interstellar.client import registry as registry_module
+from interstellar.client.registry import StubRegistry, normalize_package_name, parse_package_name, \
+    read_package_info
 
 
 class TestStubRegistry:
@@ -37,3 +45,148 @@ class TestStubRegistry:
 
         assert stub
         assert stub.__name__.endswith('Stub')
+
+    def test_get_stub_is_memoized(self):
+        registry = StubRegistry()
+        registry.register(['grpc-test-monkey-v1'])
+
+        stub = registry.get_stub('test', 'monkey', 'v1', 'ApeServiceStub', 'GetChimpanzee')
+
+        assert registry.resolved[('test', 'monkey', 'v1', 'ApeServiceStub', 'GetChimpanzee')] is stub
+        assert registry.get_stub('test', 'monkey', 'v1', 'ApeServiceStub', 'GetChimpanzee') is stub
+
+        registry.register(['grpc-test-monkey-v2'])
+        assert registry.resolved == {}
+
+    def test_scan_grpc_packages(self):
+        registry = StubRegistry()
+
+        assert set(registry.scan_grpc_packages('test')) == {'grpc-test-monkey-v1', 'grpc-test-monkey-v2'}
+        assert registry.scan_grpc_packages('primate') == []
+        assert {'grpc-test-monkey-v1', 'grpc-test-monkey-v2'} <= set(registry.scan_grpc_packages())
+        assert registry.packages['grpc-test-monkey-v1']
+
+    def test_scan_grpc_packages_once(self, monkeypatch):
+        scans = []
+        find_grpc_packages = registry_module.find_grpc_packages
+
+        def counting_find():
+            scans.append(1)
+            return find_grpc_packages()
+
+        monkeypatch.setattr(registry_module, 'find_grpc_packages', counting_find)
+        registry = StubRegistry()
+
+        for service_name in ('test', 'second', 'test', None):
+            registry.scan_grpc_packages(service_name)
+        assert len(scans) == 1
+
+        registry.rescan_grpc_packages('test')
+        assert len(scans) == 2
+
+    def test_normalize_package_name(self):
+        assert normalize_package_name('grpc_test_monkey_v1') == 'grpc-test-monkey-v1'
+        assert normalize_package_name('Grpc-Test.Monkey-v1') == 'grpc-test.monkey-v1'
+
+    def test_read_package_info(self):
+        class Distribution:
+            def __init__(self, files):
+                self.files = files
+
+            def read_text(self, filename):
+                return self.files.get(filename)
+
+        metadata = "Metadata-Version: 2.1\nName: grpc_test_monkey_v1\nVersion: 0.1.0\n\nName: not a header\n"
+
+        assert read_package_info(Distribution({"METADATA": metadata})) == ("grpc_test_monkey_v1", "0.1.0")
+        assert read_package_info(Distribution({"PKG-INFO": metadata})) == ("grpc_test_monkey_v1", "0.1.0")
+        assert read_package_info(Distribution({})) == (None, None)
+
+    def test_lazy_register(self, monkeypatch):
+        registry = StubRegistry()
+        registry.register(['grpc-test-monkey-v1', 'grpc-test-monkey-v2'], lazy=True)
+
+        assert registry.stubs == {}
+        assert registry.deferred == {('test', 'monkey', 'v1'): 'grpc-test-monkey-v1',
+                                     ('test', 'monkey', 'v2'): 'grpc-test-monkey-v2'}
+
+        stub = registry.get_stub('test', 'monkey', 'v1', 'ApeService', 'GetChimpanzee')
+
+        assert stub.__name__ == 'ApeServiceStub'
+        assert 'v1' in registry.stubs['test']['monkey']
+        assert 'v2' not in registry.stubs['test']['monkey']
+        assert registry.deferred == {('test', 'monkey', 'v2'): 'grpc-test-monkey-v2'}
+
+    def test_lazy_register_errors(self):
+        registry = StubRegistry()
+        registry.register(['grpc-test-monkey-v1'], lazy=True)
+
+        with pytest.raises(ImproperlyConfigured):
+            registry.get_stub('test', 'monkey', 'v3', 'ApeService')
+
+        with pytest.raises(ImproperlyConfigured):
+            registry.get_stub('test', 'monkey', 'v1', 'ApeService', 'GetOrangutan')
+
+    def test_parse_package_name(self):
+        assert parse_package_name('grpc-test-monkey-v1') == ('test', 'monkey', 'v1')
+        assert parse_package_name('grpc-test-v1') == ('test', 'test', 'v1')
+
+    def test_manifest(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "manifest.json")
+
+        registry = StubRegistry()
+        registry.register(['grpc-test-monkey-v1'])
+        registry.save_manifest(path)
+
+        with open(path) as f:
+            manifest = json.load(f)
+
+        entry = manifest['packages']['grpc-test-monkey-v1']
+        assert entry['module'] == 'grpc_test_monkey_v1.monkey_grpc'
+        assert entry['stubs']['ApeServiceStub']['GetChimpanzee'] == {
+            "name": "/test.v1.ApeService/GetChimpanzee",
+            "cardinality": "UNARY_UNARY",
+            "request_type": "grpc_test_monkey_v1.monkey_pb2:ApeRequest",
+            "reply_type": "grpc_test_monkey_v1.monkey_pb2:ApeResponse",
+        }
+
+        def no_introspection(StubClass):
+            raise AssertionError("stubs should be read from the manifest")
+
+        monkeypatch.setattr(registry_module, 'describe_stub', no_introspection)
+
+        registry = StubRegistry()
+        registry.load_manifest(path)
+        registry.register(['grpc-test-monkey-v1'])
+
+        stub = registry.get_stub('test', 'monkey', 'v1', 'ApeService', 'GetChimpanzee')
+        assert stub.__name__ == 'ApeServiceStub'
+        assert not registry.manifest_changed
+
+    def test_manifest_of_other_version_is_ignored(self, tmp_path):
+        path = str(tmp_path / "manifest.json")
+
+        registry = StubRegistry()
+        registry.register(['grpc-test-monkey-v1'])
+        registry.save_manifest(path)
+
+        registry = StubRegistry()
+        registry.load_manifest(path)
+        registry.scan_grpc_packages()
+        registry.packages['grpc-test-monkey-v1'] = "99.0.0"
+
+        assert registry.get_manifest_entry('grpc-test-monkey-v1') is None
+
+        registry.register(['grpc-test-monkey-v1'])
+        assert registry.manifest['grpc-test-monkey-v1']['distribution_version'] == "99.0.0"
+        assert registry.manifest_changed
+
+    def test_unreadable_manifest(self, tmp_path):
+        path = tmp_path / "manifest.json"
+        path.write_text("{not json")
+
+        registry = StubRegistry()
+        registry.load_manifest(str(path))
+        registry.load_manifest(str(tmp_path / "missing.json"))
+
+        assert registry.manifest == {}
@@ -28,9 +28,8 @@ def stop_queue_listener_handler():
 
     from interstellar.logging import interstellar_access_log
 
-    if hasattr(interstellar_access_log.handlers[0], '_listener'):
-        if interstellar_access_log.handlers[0]._listener._thread:
-            interstellar_access_log.handlers[0].stop()
+    if hasattr(interstellar_access_log.handlers[0], 'stop'):
+        interstellar_access_log.handlers[0].stop()
 
 
 @pytest.fixture(autouse=True)
@@ -0,0 +1,78 @@
+import pytest
+
+from grpclib.const import Status
+
+from insanic.conf import settings
+
+from interstellar.server import InterstellarServer, access_log, config as server_config
+from interstellar.server.access_log import TokenBucket, access_log_suppressed, allow_traceback, should_log
+
+METHOD = "/test.v1.ApeService/GetChimpanzee"
+
+
+@pytest.fixture(autouse=True)
+def load_server_config():
+    InterstellarServer._load_config(settings, server_config)
+    access_log.reset()
+    yield
+    access_log.reset()
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(access_log.time, 'monotonic', lambda: now[0])
+    return now
+
+
+class TestSampling:
+
+    def test_logs_everything_by_default(self):
+        assert all(should_log(Status.OK.value, 0) for _ in range(100))
+
+    def test_samples_successes(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_ACCESS_LOG_SAMPLE_RATE', 0.1)
+        monkeypatch.setattr(access_log.random, 'random', lambda: 0.5)
+
+        assert not should_log(Status.OK.value, 0)
+        assert access_log_suppressed() == {"sampled": 1, "tracebacks": 0}
+
+    def test_logs_all_errors(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_ACCESS_LOG_SAMPLE_RATE', 0)
+
+        assert should_log(Status.INTERNAL.value, 0)
+        assert should_log(Status.NOT_FOUND, 0)
+
+    def test_logs_slow_requests(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_ACCESS_LOG_SAMPLE_RATE', 0)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_ACCESS_LOG_SLOW_THRESHOLD', 1)
+
+        assert should_log(Status.OK.value, 1.5)
+        assert not should_log(Status.OK.value, 0.5)
+
+
+class TestTracebackRate:
+
+    def test_token_bucket(self, clock):
+        bucket = TokenBucket(rate=1, burst=2)
+
+        assert bucket.take()
+        assert bucket.take()
+        assert not bucket.take()
+
+        clock[0] += 1
+        assert bucket.take()
+        assert not bucket.take()
+
+    def test_unlimited_by_default(self):
+        assert all(allow_traceback(Status.INTERNAL.value, METHOD) for _ in range(100))
+
+    def test_limited_per_status_and_method(self, clock, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_ACCESS_LOG_TRACEBACK_RATE', {"rate": 1, "burst": 1})
+
+        assert allow_traceback(Status.INTERNAL.value, METHOD)
+        assert not allow_traceback(Status.INTERNAL.value, METHOD)
+        assert allow_traceback(Status.UNKNOWN.value, METHOD)
+        assert allow_traceback(Status.INTERNAL.value, "/test.v1.ApeService/GetGorilla")
+
+        assert access_log_suppressed() == {"sampled": 0, "tracebacks": 1}
@@ -0,0 +1,149 @@
+import pytest
+
+from grpclib.exceptions import GRPCError
+from multidict import MultiDict
+
+from insanic.conf import settings
+
+from interstellar import config as common_config, tokens
+from interstellar.server import InterstellarServer, authentication, config as server_config
+from interstellar.server.authentication import GRPCAuthentication, IdentityCache, identity_cache_stats
+from interstellar.tokens import encode_service_token, token_cache_stats
+
+USER = 'id=1;level=1;is_authenticated=1'
+SERVICE = "source=test;aud=test;source_ip=127.0.0.1;destination_version=0.0.1"
+
+
+@pytest.fixture(autouse=True)
+def init_config(monkeypatch):
+    InterstellarServer._load_config(settings, common_config)
+    InterstellarServer._load_config(settings, server_config)
+    monkeypatch.setattr(settings, 'SERVICE_NAME', 'test', raising=False)
+    authentication.reset()
+    tokens.reset()
+    yield
+    authentication.reset()
+    tokens.reset()
+
+
+def authenticate(user=USER, service=SERVICE, authorization=None):
+    metadata = MultiDict()
+    if authorization is not None:
+        metadata["authorization"] = authorization
+    if user is not None:
+        metadata[settings.INTERNAL_REQUEST_USER_HEADER] = user
+    if service is not None:
+        metadata[settings.INTERNAL_REQUEST_SERVICE_HEADER] = service
+    return GRPCAuthentication(metadata).authenticate()
+
+
+class TestIdentityCache:
+
+    def test_lru(self):
+        resolved = []
+
+        def resolve(value):
+            resolved.append(value)
+            return value.upper(), None
+
+        cache = IdentityCache(resolve, max_entries=2)
+        cache.get("a")
+        cache.get("b")
+        cache.get("a")
+        cache.get("c")
+
+        assert list(cache.entries) == ["a", "c"]
+        assert cache.get("a") == ("A", None)
+        assert resolved == ["a", "b", "c"]
+        assert (cache.hits, cache.misses) == (2, 3)
+
+    def test_disabled(self):
+        cache = IdentityCache(lambda value: (value, None), max_entries=0)
+        cache.get("a")
+
+        assert not cache.entries
+
+
+class TestAuthenticate:
+
+    def test_identities_are_cached(self):
+        user, service = authenticate()
+        user.id = "2"
+        cached_user, cached_service = authenticate()
+
+        # every request gets its own identity
+        assert user is not cached_user
+        assert service is not cached_service
+        assert cached_user.id == "1"
+        assert cached_service.source == "test"
+        assert identity_cache_stats() == {"user": {"entries": 1, "hits": 1, "misses": 1},
+                                          "service": {"entries": 1, "hits": 1, "misses": 1}}
+
+    def test_invalid_service_is_cached(self):
+        service = SERVICE.replace("aud=test", "aud=other")
+
+        for _ in range(2):
+            with pytest.raises(GRPCError) as e:
+                authenticate(service=service)
+            assert e.value.message == "Invalid request to test"
+
+        assert identity_cache_stats()["service"] == {"entries": 1, "hits": 1, "misses": 1}
+
+    def test_invalid_service_payload(self):
+        with pytest.raises(GRPCError) as e:
+            authenticate(service="source=test")
+        assert e.value.message == "Invalid service payload."
+
+    def test_invalid_user_payload_is_cached(self):
+        for _ in range(2):
+            with pytest.raises(GRPCError) as e:
+                authenticate(user="id=1;level")
+            assert e.value.message == "Invalid user payload."
+
+        assert identity_cache_stats()["user"] == {"entries": 1, "hits": 1, "misses": 1}
+
+    @pytest.mark.parametrize("user, service", [(None, SERVICE), (USER, None)])
+    def test_missing_headers(self, user, service):
+        with pytest.raises(GRPCError):
+            authenticate(user=user, service=service)
+
+
+class TestServiceToken:
+
+    @pytest.fixture(autouse=True)
+    def verify_tokens(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY', "secret")
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVICE_TOKEN_VERIFYING_KEY', "secret")
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_VERIFY_SERVICE_TOKEN', True)
+
+    def authorization(self, source="test", aud="test"):
+        token, _ = encode_service_token(source, aud, 60)
+        return f"{settings.JWT_SERVICE_AUTH['JWT_AUTH_HEADER_PREFIX']} {token}"
+
+    def test_verified_token(self):
+        authorization = self.authorization()
+
+        authenticate(authorization=authorization)
+        authenticate(authorization=authorization)
+
+        assert token_cache_stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    @pytest.mark.parametrize("authorization, message", [
+        (None, "Service token not found in request."),
+        ("Bearer token", "Service token not found in request."),
+        ("MSA not-a-token", "Invalid service token."),
+    ])
+    def test_missing_or_invalid_token(self, authorization, message):
+        with pytest.raises(GRPCError) as e:
+            authenticate(authorization=authorization)
+        assert e.value.message == message
+
+    def test_token_for_another_service(self):
+        with pytest.raises(GRPCError) as e:
+            authenticate(authorization=self.authorization(aud="other"))
+        assert e.value.message == "Invalid service token."
+
+    def test_token_of_another_caller(self):
+        with pytest.raises(GRPCError) as e:
+            authenticate(authorization=self.authorization(source="other"))
+        assert e.value.message == "Service token was not issued to the request service."
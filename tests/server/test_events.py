@@ -1,6 +1,8 @@
+import aiotask_context
 import pytest
 
 from grpclib.events import RecvRequest
+from grpclib.metadata import Deadline
 from multidict import MultiDict
 
 from insanic.conf import settings
@@ -10,6 +12,7 @@ from interstellar import config as common_config
 from interstellar.server import InterstellarServer, config
 from interstellar.server.authentication import GRPCAuthentication
 from interstellar.server.events import interstellar_server_event_recv_request
+from interstellar.utils import get_context_deadline
 
 
 class TestServerEvents:
@@ -48,3 +51,20 @@ class TestServerEvents:
 
         assert settings.INTERSTELLAR_SERVER_METADATA_SERVICE in event.metadata
         assert isinstance(event.metadata[settings.INTERSTELLAR_SERVER_METADATA_SERVICE], RequestService)
+
+    async def test_server_event_recv_request_sets_deadline(self, loop, monkeypatch, init_config):
+        loop.set_task_factory(aiotask_context.chainmap_task_factory)
+        deadline = Deadline.from_timeout(5)
+
+        async def handle():
+            event = RecvRequest(
+                content_type="application/grpc+proto",
+                deadline=deadline,
+                method_name="/test.v1.ApeService/GetChimpanzee",
+                method_func=None,
+                metadata=MultiDict()
+            )
+            await interstellar_server_event_recv_request(event)
+            return get_context_deadline()
+
+        assert await loop.create_task(handle()) is deadline
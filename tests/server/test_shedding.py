@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+
+from grpclib.const import Status
+from grpclib.encoding.proto import ProtoCodec
+from grpclib.events import _DispatchServerEvents
+
+from insanic import Insanic
+from insanic.conf import settings
+from insanic.loading import get_service
+
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest
+
+from interstellar.client import InterstellarClient
+from interstellar.exceptions import InterstellarError
+from interstellar.server import InterstellarServer, config as server_config, shedding
+from interstellar.server.exceptions import InterstellarAbort
+from interstellar.server.server import InterstellarHandler
+from interstellar.server.shedding import LoadShedder, get_shedder, shedding_stats
+
+
+@pytest.fixture(autouse=True)
+def reset_shedder():
+    InterstellarServer._load_config(settings, server_config)
+    shedding.reset()
+    yield
+    shedding.reset()
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(shedding.time, 'monotonic', lambda: now[0])
+    return now
+
+
+class TestLoadShedder:
+
+    def test_max_in_flight(self):
+        shedder = LoadShedder(max_in_flight=2)
+
+        assert shedder.accept() is None
+        assert shedder.accept() is None
+
+        shed = shedder.accept()
+        assert isinstance(shed, InterstellarAbort)
+        assert shed.status == Status.RESOURCE_EXHAUSTED
+        assert shedder.shed_in_flight == 1
+        assert shedder.in_flight == 2
+
+        shedder.done()
+        assert shedder.accept() is None
+
+    def test_queue_delay(self, clock):
+        shedder = LoadShedder(target=0.005, interval=0.1)
+
+        # above the target, but not for an interval yet
+        shedder.admit(clock[0] - 0.01)
+        clock[0] += 0.05
+        shedder.admit(clock[0] - 0.01)
+
+        clock[0] += 0.06
+        with pytest.raises(InterstellarAbort):
+            shedder.admit(clock[0] - 0.01)
+        assert shedder.shed_queue_delay == 1
+
+        # a request that did not wait long resets it
+        shedder.admit(clock[0])
+        shedder.admit(clock[0] - 0.01)
+
+    def test_not_configured(self):
+        assert get_shedder() is None
+        assert shedding_stats() == {"in_flight": 0, "shed_in_flight": 0, "shed_queue_delay": 0}
+
+
+class _Stream:
+    closable = False
+
+    def __init__(self, stream_id):
+        self.id = stream_id
+        self.grpc_status = None
+
+    async def send_headers(self, headers, end_stream=False):
+        self.grpc_status = dict(headers).get('grpc-status')
+
+
+class TestAcceptBurst:
+
+    async def test_admits_max_in_flight_of_a_burst(self, loop, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_MAX_IN_FLIGHT', 3)
+        handler = InterstellarHandler({}, ProtoCodec(), _DispatchServerEvents(), loop=loop)
+        streams = [_Stream(i) for i in range(5)]
+
+        # all the streams of one read are accepted before any of their tasks run
+        for stream in streams:
+            handler.accept(stream, [], lambda: None)
+
+        assert shedding_stats() == {"in_flight": 3, "shed_in_flight": 2, "shed_queue_delay": 0}
+
+        await asyncio.gather(*handler._tasks.values())
+
+        shed = [s for s in streams if s.grpc_status == str(Status.RESOURCE_EXHAUSTED.value)]
+        assert len(shed) == 2
+        assert shedding_stats()["in_flight"] == 0
+
+
+class TestServerShedding:
+
+    @pytest.fixture()
+    def service(self, insanic_application, test_server, loop, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVERS', ["tests.blackhole.PlanetOfTheApes"], raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_PORT_DELTA', 1, raising=False)
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test'], raising=False)
+
+        server = Insanic('test')
+        InterstellarServer.init_app(server)
+        server = loop.run_until_complete(test_server(server))
+
+        InterstellarClient.init_app(insanic_application)
+        service = get_service('test')
+        monkeypatch.setattr(service, 'host', server.host)
+        monkeypatch.setattr(service, 'port', server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+        return service
+
+    async def test_sheds_over_max_in_flight(self, service, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_MAX_IN_FLIGHT', 0)
+
+        with pytest.raises(InterstellarError) as e:
+            await service.grpc.monkey.v1.ApeService.GetChimpanzee(ApeRequest(id="1"))
+
+        assert e.value.status == Status.RESOURCE_EXHAUSTED
+        assert shedding_stats() == {"in_flight": 0, "shed_in_flight": 1, "shed_queue_delay": 0}
+
+    async def test_admits_under_max_in_flight(self, service, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_MAX_IN_FLIGHT', 10)
+
+        reply = await service.grpc.monkey.v1.ApeService.GetChimpanzee(ApeRequest(id="1", include="sound"))
+
+        assert reply["extra"] == "woo woo ahh ahh"
+        assert shedding_stats()["shed_in_flight"] == 0
@@ -0,0 +1,162 @@
+import pytest
+import struct
+import zlib
+
+from types import SimpleNamespace
+
+from grpclib.const import Status
+from grpclib.encoding.proto import ProtoCodec
+
+from grpc_test_monkey_v1.monkey_pb2 import ApeRequest, ApeResponse
+
+from insanic import Insanic
+from insanic.conf import settings
+from insanic.loading import get_service
+
+from interstellar import compression, config as common_config
+from interstellar.client import InterstellarClient
+from interstellar.compression import accepts, gzip_compress, gzip_decompress, get_threshold, recv_message, \
+    run_sized
+from interstellar.exceptions import InterstellarError
+from interstellar.server import InterstellarServer
+
+METHOD = "/test.v1.ApeService/GetChimpanzee"
+
+
+@pytest.fixture(autouse=True)
+def load_common_config():
+    InterstellarClient._load_config(settings, common_config)
+    compression.reset()
+    yield
+    compression.reset()
+
+
+@pytest.fixture()
+def calls(monkeypatch):
+    """
+    what was compressed and decompressed
+    """
+    calls = {"compress": 0, "decompress": 0}
+
+    def count(name, func):
+        def counted(data):
+            calls[name] += 1
+            return func(data)
+        return counted
+
+    monkeypatch.setattr(compression, 'gzip_compress', count("compress", gzip_compress))
+    monkeypatch.setattr(compression, 'gzip_decompress', count("decompress", gzip_decompress))
+    return calls
+
+
+class TestCompression:
+
+    def test_round_trip(self):
+        data = ApeResponse(id=1, extra="ahh" * 1000).SerializeToString()
+        compressed = gzip_compress(data)
+
+        assert len(compressed) < len(data)
+        assert gzip_decompress(compressed) == data
+
+    def test_max_message_size(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_COMPRESSION_MAX_MESSAGE_SIZE', 1000)
+
+        assert gzip_decompress(gzip_compress(b"a" * 1000)) == b"a" * 1000
+
+        # a few kilobytes that would decompress to megabytes
+        bomb = gzip_compress(b"\0" * 10 * 1024 * 1024)
+        for data in (gzip_compress(b"a" * 1001), bomb):
+            with pytest.raises(InterstellarError) as e:
+                gzip_decompress(data)
+            assert e.value.status == Status.RESOURCE_EXHAUSTED
+
+        monkeypatch.setattr(settings, 'INTERSTELLAR_COMPRESSION_MAX_MESSAGE_SIZE', None)
+        assert len(gzip_decompress(bomb)) == 10 * 1024 * 1024
+
+    def test_incomplete_data(self):
+        with pytest.raises(zlib.error):
+            gzip_decompress(gzip_compress(b"ahh" * 1000)[:-10])
+
+    async def test_large_data_in_executor(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_COMPRESSION_EXECUTOR_THRESHOLD', 10)
+        data = b"ahh" * 1000
+
+        assert gzip_decompress(await run_sized(gzip_compress, data)) == data
+
+    @pytest.mark.parametrize("value, expected", [
+        (None, False),
+        ("identity", False),
+        ("gzip", True),
+        ("identity, gzip", True),
+        ("deflate,gzip,identity", True),
+    ])
+    def test_accepts(self, value, expected):
+        assert accepts(value) is expected
+
+    async def test_unsupported_encoding(self):
+        data = gzip_compress(ApeResponse(id=1).SerializeToString())
+        stream = SimpleNamespace(received=struct.pack('>?I', True, len(data)) + data)
+
+        async def recv_data(size):
+            received, stream.received = stream.received[:size], stream.received[size:]
+            return received
+
+        stream.recv_data = recv_data
+
+        with pytest.raises(InterstellarError) as e:
+            await recv_message(stream, ProtoCodec(), ApeResponse, "deflate")
+        assert e.value.status == Status.UNIMPLEMENTED
+
+    def test_threshold(self, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_COMPRESSED_METHODS', {METHOD: 100})
+
+        assert get_threshold(METHOD) == 100
+        assert get_threshold("/test.v1.ApeService/GetGorilla") is None
+
+
+class TestCompressedCalls:
+
+    @pytest.fixture()
+    def service(self, insanic_application, test_server, loop, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVERS', ["tests.blackhole.PlanetOfTheApes"], raising=False)
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVER_PORT_DELTA', 1, raising=False)
+        monkeypatch.setattr(settings, 'SERVICE_CONNECTIONS', ['test'], raising=False)
+
+        server = Insanic('test')
+        InterstellarServer.init_app(server)
+        server = loop.run_until_complete(test_server(server))
+
+        InterstellarClient.init_app(insanic_application)
+        service = get_service('test')
+        monkeypatch.setattr(service, 'host', server.host)
+        monkeypatch.setattr(service, 'port', server.port + settings.INTERSTELLAR_SERVER_PORT_DELTA)
+        yield service
+
+        InterstellarServer.reset()
+
+    async def call(self, service, include):
+        with service.grpc('monkey', 'v1', 'ApeService', 'GetChimpanzee', message_mode="raw") as method:
+            return await method(ApeRequest(id="1", include=include))
+
+    async def test_compressed_both_ways(self, service, calls, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_COMPRESSED_METHODS', {METHOD: 10})
+
+        reply = await self.call(service, "sound" + " " * 1000)
+
+        assert reply.extra == "i don't know"
+        # the request by the client and the reply by the server
+        assert calls == {"compress": 2, "decompress": 2}
+
+    async def test_below_threshold(self, service, calls, monkeypatch):
+        monkeypatch.setattr(settings, 'INTERSTELLAR_COMPRESSED_METHODS', {METHOD: 1000})
+
+        reply = await self.call(service, "sound")
+
+        assert reply.extra == "woo woo ahh ahh"
+        assert calls == {"compress": 0, "decompress": 0}
+
+    async def test_not_configured(self, service, calls):
+        reply = await self.call(service, "sound" * 1000)
+
+        assert reply.extra == "i don't know"
+        assert calls == {"compress": 0, "decompress": 0}
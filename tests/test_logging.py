@@ -0,0 +1,78 @@
+import io
+import logging
+import sys
+
+from interstellar.logging import BatchingStreamHandler, access_log_stats
+
+
+def make_record(message):
+    return logging.LogRecord("interstellar.access", logging.INFO, __file__, 1, message, None, None)
+
+
+class TestBatchingStreamHandler:
+
+    def test_writes_in_background(self):
+        stream = io.StringIO()
+        handler = BatchingStreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        for i in range(5):
+            handler.handle(make_record(f"message {i}"))
+        assert handler.thread is not None
+
+        handler.stop()
+        assert stream.getvalue() == "".join(f"message {i}\n" for i in range(5))
+        assert handler.thread is None
+
+    def test_prepares_records(self):
+        stream = io.StringIO()
+        handler = BatchingStreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler.thread = object()
+        arguments = ["first"]
+
+        try:
+            raise ValueError("nope")
+        except ValueError:
+            record = logging.LogRecord("interstellar.access", logging.ERROR, __file__, 1, "message %s",
+                                       (arguments,), sys.exc_info())
+        handler.handle(record)
+        arguments.append("second")
+
+        queued = handler.queue.get_nowait()
+        assert queued.getMessage() == "message ['first']"
+        assert queued.args is None
+        assert queued.exc_info is None
+        assert "ValueError: nope" in queued.exc_text
+        # other handlers still get the record as it was logged
+        assert record.exc_info is not None
+        handler.thread = None
+
+    def test_batches(self):
+        stream = io.StringIO()
+        handler = BatchingStreamHandler(stream, batch_size=2)
+        writes = []
+        handler.write = writes.append
+
+        for i in range(5):
+            handler.queue.put(make_record(f"message {i}"))
+        handler.queue.put(handler.STOP)
+        handler.write_batches()
+
+        assert [len(batch) for batch in writes] == [2, 2, 2]
+
+    def test_drops_when_full(self):
+        stream = io.StringIO()
+        handler = BatchingStreamHandler(stream, max_queue=2)
+        # not started, nothing takes records from the queue
+        handler.thread = object()
+
+        for i in range(5):
+            handler.handle(make_record(f"message {i}"))
+
+        assert handler.dropped == 3
+        assert handler.queue.qsize() == 2
+        handler.thread = None
+
+    def test_stats(self):
+        assert set(access_log_stats()) == {"queued", "dropped"}
@@ -0,0 +1,117 @@
+import time
+
+import jwt
+import pytest
+
+from insanic.conf import settings
+
+from interstellar import config as common_config, tokens
+from interstellar.client import InterstellarClient
+from interstellar.server import config as server_config
+from interstellar.tokens import TokenVerifier, encode_service_token, get_verifier, token_cache_stats
+
+KEY = "secret"
+
+
+@pytest.fixture(autouse=True)
+def token_settings(monkeypatch):
+    InterstellarClient._load_config(settings, common_config)
+    InterstellarClient._load_config(settings, server_config)
+    monkeypatch.setattr(settings, 'INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY', KEY)
+    monkeypatch.setattr(settings, 'INTERSTELLAR_SERVICE_TOKEN_VERIFYING_KEY', KEY)
+    monkeypatch.setattr(settings, 'SERVICE_NAME', 'test', raising=False)
+    tokens.reset()
+    yield
+    tokens.reset()
+
+
+def make_verifier(**kwargs):
+    return TokenVerifier(KEY, "HS256", "test", **kwargs)
+
+
+@pytest.fixture()
+def decoded(monkeypatch):
+    """
+    tokens verified with jwt.decode
+    """
+    decoded = []
+    decode = jwt.decode
+
+    def counted(token, *args, **kwargs):
+        decoded.append(token)
+        return decode(token, *args, **kwargs)
+
+    monkeypatch.setattr(tokens.jwt, 'decode', counted)
+    return decoded
+
+
+class TestTokenVerifier:
+
+    def test_verifies_once(self, decoded):
+        token, exp = encode_service_token("caller", "test", 60)
+        verifier = make_verifier()
+
+        claims = verifier.verify(token)
+        assert verifier.verify(token) is claims
+        assert claims == {"source": "caller", "aud": "test", "exp": exp}
+        assert len(decoded) == 1
+        assert (verifier.hits, verifier.misses) == (1, 1)
+
+    def test_expires_at_exp(self, decoded, monkeypatch):
+        token, exp = encode_service_token("caller", "test", 60)
+        verifier = make_verifier()
+        verifier.verify(token)
+
+        monkeypatch.setattr(tokens.time, 'time', lambda: exp)
+        # verified again, and rejected by jwt once it is past exp
+        verifier.verify(token)
+        assert decoded == [token, token]
+
+    def test_bounded(self):
+        verifier = make_verifier(max_entries=2)
+
+        for source in ("a", "b", "c"):
+            verifier.verify(encode_service_token(source, "test", 60)[0])
+
+        assert [claims["source"] for _, claims in verifier.entries.values()] == ["b", "c"]
+
+    @pytest.mark.parametrize("token", [
+        jwt.encode({"source": "caller", "aud": "test", "exp": int(time.time()) + 60}, "other"),
+        jwt.encode({"source": "caller", "aud": "other", "exp": int(time.time()) + 60}, KEY),
+        jwt.encode({"source": "caller", "aud": "test"}, KEY),
+        "not a token",
+    ])
+    def test_invalid_tokens(self, token):
+        if isinstance(token, bytes):
+            token = token.decode()
+        verifier = make_verifier()
+
+        with pytest.raises(jwt.InvalidTokenError):
+            verifier.verify(token)
+        assert not verifier.entries
+
+    def test_get_verifier(self):
+        assert token_cache_stats() == {"entries": 0, "hits": 0, "misses": 0}
+
+        verifier = get_verifier()
+        assert get_verifier() is verifier
+        assert verifier.audience == "test"
+        assert verifier.max_entries == settings.INTERSTELLAR_SERVER_SERVICE_TOKEN_CACHE_SIZE
+
+    def test_asymmetric_keys(self, monkeypatch):
+        rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+        serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_key = private_key.public_key()
+
+        # a service that both calls and serves signs with its private key and verifies with the public key
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVICE_TOKEN_ALGORITHM', "RS256")
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVICE_TOKEN_SIGNING_KEY', private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        monkeypatch.setattr(settings, 'INTERSTELLAR_SERVICE_TOKEN_VERIFYING_KEY', public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+
+        token, exp = encode_service_token("caller", "test", 60)
+
+        assert get_verifier().verify(token) == {"source": "caller", "aud": "test", "exp": exp}